@@ -0,0 +1,357 @@
+"""
+Run tournament rounds on worker processes spread over several machines.
+
+A coordinator owns the list of matches of a round (the same `MatchJob`s
+that `tournament.play_round` plays) and hands them out over TCP to any
+number of workers. Workers rebuild the tournament agents locally, play the
+matches they are given and report the scores back. While a match is being
+played the worker sends heartbeats; when a worker disconnects or stays
+silent for longer than the heartbeat timeout its match is handed to another
+worker. Once every match is done the coordinator prints and returns the
+same summary as `play_round`.
+
+Messages are JSON objects, one per line:
+
+    worker -> coordinator  {"type": "ready"}
+                           {"type": "heartbeat"}
+                           {"type": "result", "round": r, "job": id,
+                            "scores": [s1, s2]}
+    coordinator -> worker  {"type": "job", "round": r, "job": id,
+                            "first": name, "second": name,
+                            "opening": moves, "seed": seed}
+                           {"type": "wait"}
+                           {"type": "done"}
+
+Example (one coordinator, workers on any machine that can reach it):
+
+    python distributed.py coordinator --port 5555
+    python distributed.py worker --host coordinator.example --port 5555
+"""
+
+import argparse
+import collections
+import itertools
+import json
+import socket
+import socketserver
+import threading
+import time
+
+import tournament
+
+from tournament import MatchJob
+
+DEFAULT_PORT = 5555
+HEARTBEAT_INTERVAL = 1.  # seconds between heartbeats sent by a busy worker
+HEARTBEAT_TIMEOUT = 10.  # seconds of silence before a match is reassigned
+WAIT_INTERVAL = 0.5  # seconds an idle worker waits before asking again
+
+
+def send_message(sock, message, lock=None):
+    """Send one JSON message terminated by a newline."""
+    data = (json.dumps(message) + "\n").encode()
+    if lock is None:
+        sock.sendall(data)
+    else:
+        with lock:
+            sock.sendall(data)
+
+
+class Coordinator(object):
+    """
+    Serve match jobs to remote workers and collect their results.
+
+    Parameters
+    ----------
+    address : (str, int) (optional)
+        Host and port to listen on; port 0 picks a free port (see
+        `server_address`).
+
+    heartbeat_timeout : float (optional)
+        Seconds a worker may stay silent while holding a match before the
+        match is handed to another worker.
+    """
+
+    def __init__(self, address=("", DEFAULT_PORT), heartbeat_timeout=HEARTBEAT_TIMEOUT):
+        self.heartbeat_timeout = heartbeat_timeout
+        self.lock = threading.Condition()
+        self.jobs = []
+        self.pending = collections.deque()
+        self.assigned = {}  # job id -> (connection id, time of last message)
+        self.results = {}
+        self.closed = False
+        self.round = 0
+        self._on_result = None
+        self._connections = itertools.count(1)
+
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                coordinator._serve_worker(self.rfile, self.request)
+
+        self.server = socketserver.ThreadingTCPServer(address, Handler, bind_and_activate=False)
+        self.server.daemon_threads = True
+        self.server.allow_reuse_address = True
+        self.server.server_bind()
+        self.server.server_activate()
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def server_address(self):
+        """The (host, port) pair the coordinator listens on."""
+        return self.server.server_address
+
+    def run(self, jobs, on_result=None):
+        """
+        Hand out `jobs` (a list of `MatchJob`) and block until every one of
+        them has a result. `on_result(job_id, scores)` is called for each
+        result as it arrives. Returns the scores in job order.
+        """
+        with self.lock:
+            self.round += 1
+            self.jobs = list(jobs)
+            self.results = {}
+            self.assigned = {}
+            self.pending = collections.deque(range(len(self.jobs)))
+            self._on_result = on_result
+            while len(self.results) < len(self.jobs):
+                self._reassign_silent_jobs()
+                self.lock.wait(timeout=1.)
+            return [self.results[i] for i in range(len(self.jobs))]
+
+    def close(self):
+        """Tell the workers to stop and shut the server down."""
+        with self.lock:
+            self.closed = True
+            self.lock.notify_all()
+        # give idle workers the chance to receive "done"
+        time.sleep(WAIT_INTERVAL * 2)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _reassign_silent_jobs(self):
+        now = time.time()
+        for job_id, (_, last_seen) in list(self.assigned.items()):
+            if now - last_seen > self.heartbeat_timeout:
+                self._requeue(job_id)
+
+    def _requeue(self, job_id):
+        if job_id in self.assigned and job_id not in self.results:
+            del self.assigned[job_id]
+            self.pending.appendleft(job_id)
+            self.lock.notify_all()
+
+    def _next_message(self, connection):
+        """Return the next message for a worker asking for work."""
+        if self.pending:
+            job_id = self.pending.popleft()
+            self.assigned[job_id] = (connection, time.time())
+            job = self.jobs[job_id]
+            return {"type": "job", "round": self.round, "job": job_id, "first": job.first,
+                    "second": job.second, "opening": job.opening, "seed": job.seed}
+        if self.closed:
+            return {"type": "done"}
+        return {"type": "wait"}
+
+    def _serve_worker(self, rfile, sock):
+        with self.lock:
+            connection = next(self._connections)
+        try:
+            for line in rfile:
+                message = json.loads(line.decode())
+                with self.lock:
+                    if message["type"] == "heartbeat":
+                        for job_id, (owner, _) in self.assigned.items():
+                            if owner == connection:
+                                self.assigned[job_id] = (owner, time.time())
+                        continue
+                    if message["type"] == "result":
+                        job_id = message["job"]
+                        # a reassigned match may be finished twice; keep the first
+                        if message["round"] == self.round and job_id not in self.results:
+                            self.results[job_id] = tuple(message["scores"])
+                            self.assigned.pop(job_id, None)
+                            if self._on_result is not None:
+                                self._on_result(job_id, self.results[job_id])
+                            self.lock.notify_all()
+                    reply = self._next_message(connection)
+                send_message(sock, reply)
+                if reply["type"] == "done":
+                    return
+        except (OSError, ValueError):
+            pass
+        finally:
+            # the worker is gone: hand its matches to somebody else
+            with self.lock:
+                for job_id, (owner, _) in list(self.assigned.items()):
+                    if owner == connection:
+                        self._requeue(job_id)
+
+
+def play_round(coordinator, agents, num_matches, openings=None, log=None, seed=0):
+    """
+    Distributed counterpart of `tournament.play_round`: build the matches
+    of every pairing, run them on the workers connected to `coordinator`
+    and print and return the same summary. SPRT early stopping is not
+    supported, since all matches are dispatched at once.
+    """
+    agent_1 = agents[-1]
+    jobs = []
+    for agent_2 in agents[:-1]:
+        jobs.append(tournament.pairing_jobs(agent_1, agent_2, num_matches, openings, seed))
+
+    # matches already in the log are not dispatched again
+    flat = [job for pairing in jobs for job in pairing]
+    keys = [tournament.ResultsLog.key([job.first, job.second], job.opening, job.seed)
+            for job in flat]
+    scores = [log.lookup(key) if log is not None else None for key in keys]
+    todo = [i for i, s in enumerate(scores) if s is None]
+
+    def record(job_id, result):
+        if log is not None:
+            log.record(keys[todo[job_id]], result)
+
+    for job_id, result in zip(todo, coordinator.run([flat[i] for i in todo], record)):
+        scores[job_id] = result
+
+    wins = 0.
+    total = 0.
+    print("\nPlaying Matches:")
+    print("----------")
+    results = iter(scores)
+    for idx, (agent_2, pairing) in enumerate(zip(agents[:-1], jobs)):
+        counts = {agent_1.name: 0., agent_2.name: 0.}
+        for job in pairing:
+            score_1, score_2 = next(results)
+            counts[job.first] += score_1
+            counts[job.second] += score_2
+            total += score_1 + score_2
+        wins += counts[agent_1.name]
+        print("  Match {}: {!s:^11} vs {!s:^11}".format(idx + 1, agent_1.name, agent_2.name), end=' ')
+        tournament.print_result(counts[agent_1.name], counts[agent_2.name])
+
+    return 100. * wins / total
+
+
+def run_worker(address, agents=None, cache=None, node_limit=None, pruning=False,
+               mcts=False):
+    """
+    Connect to a coordinator and play matches until it says it is done or
+    the connection is closed. `agents` defaults to every agent built by
+    `tournament.build_agents(node_limit, pruning, mcts)`. Returns the number
+    of matches played.
+    """
+    if agents is None:
+        opponents, test_agents = tournament.build_agents(node_limit, pruning, mcts)
+        agents = opponents + test_agents
+    players = {agent.name: agent.player for agent in agents}
+
+    played = 0
+    sock = socket.create_connection(address)
+    lock = threading.Lock()
+    try:
+        rfile = sock.makefile("rb")
+        send_message(sock, {"type": "ready"}, lock)
+        for line in rfile:
+            message = json.loads(line.decode())
+            if message["type"] == "done":
+                break
+            if message["type"] == "wait":
+                time.sleep(WAIT_INTERVAL)
+                send_message(sock, {"type": "ready"}, lock)
+                continue
+
+            job = MatchJob(message["first"], message["second"],
+                           [tuple(move) for move in message["opening"]], message["seed"])
+            busy = threading.Event()
+            heartbeat = threading.Thread(target=_heartbeat, args=(sock, lock, busy), daemon=True)
+            heartbeat.start()
+            try:
+                scores = tournament.run_job(job, players, cache)
+            finally:
+                busy.set()
+                heartbeat.join()
+            played += 1
+            send_message(sock, {"type": "result", "round": message["round"],
+                                "job": message["job"], "scores": list(scores)}, lock)
+    except OSError:
+        pass
+    finally:
+        sock.close()
+    return played
+
+
+def _heartbeat(sock, lock, done):
+    """Send heartbeats until `done` is set."""
+    while not done.wait(HEARTBEAT_INTERVAL):
+        try:
+            send_message(sock, {"type": "heartbeat"}, lock)
+        except OSError:
+            return
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command")
+
+    coordinator = commands.add_parser("coordinator", help="hand out matches")
+    coordinator.add_argument("--host", default="")
+    coordinator.add_argument("--port", type=int, default=DEFAULT_PORT)
+    coordinator.add_argument("--matches", type=int, default=tournament.NUM_MATCHES)
+    coordinator.add_argument("--openings", default=tournament.OPENINGS_FILE)
+    coordinator.add_argument("--random-openings", action="store_true")
+    coordinator.add_argument("--log", default=None)
+    coordinator.add_argument("--resume", action="store_true")
+    coordinator.add_argument("--seed", type=int, default=0)
+    coordinator.add_argument("--heartbeat-timeout", type=float, default=HEARTBEAT_TIMEOUT)
+    coordinator.add_argument("--node-limit", type=int, default=None)
+    coordinator.add_argument("--pruning", action="store_true")
+    coordinator.add_argument("--mcts", action="store_true")
+
+    worker = commands.add_parser("worker", help="play matches for a coordinator")
+    worker.add_argument("--host", default="localhost")
+    worker.add_argument("--port", type=int, default=DEFAULT_PORT)
+    worker.add_argument("--cache", default=tournament.RESULT_CACHE)
+    worker.add_argument("--no-cache", action="store_true")
+    worker.add_argument("--node-limit", type=int, default=None,
+                        help="must match the coordinator's --node-limit")
+    worker.add_argument("--pruning", action="store_true",
+                        help="must match the coordinator's --pruning")
+    worker.add_argument("--mcts", action="store_true",
+                        help="must match the coordinator's --mcts")
+
+    args = parser.parse_args()
+    if args.command == "worker":
+        cache = None if args.no_cache else tournament.ResultCache(args.cache)
+        played = run_worker((args.host, args.port), cache=cache, node_limit=args.node_limit,
+                            pruning=args.pruning, mcts=args.mcts)
+        print("Played {} matches".format(played))
+    elif args.command == "coordinator":
+        openings = None if args.random_openings else tournament.load_openings(args.openings)
+        log = None if args.log is None else tournament.ResultsLog(args.log, args.resume)
+        server = Coordinator((args.host, args.port), args.heartbeat_timeout)
+        opponents, test_agents = tournament.build_agents(args.node_limit, args.pruning,
+                                                         args.mcts)
+
+        print(tournament.DESCRIPTION)
+        for agentUT in test_agents:
+            print("")
+            print("*************************")
+            print("{:^25}".format("Evaluating: " + agentUT.name))
+            print("*************************")
+
+            win_ratio = play_round(server, opponents + [agentUT], args.matches,
+                                   openings, log, args.seed)
+
+            print("\n\nResults:")
+            print("----------")
+            print("{!s:<15}{:>10.2f}%".format(agentUT.name, win_ratio))
+        server.close()
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Per-position features shared by the heuristics.
+
+The heuristics in `game_agent.py` and `heuristics.py` ask a `Board` for the
+same facts over and over: utility, locations, legal moves of both players,
+blank cells. A `PositionFeatures` reads them once for a position and a
+player; cheap facts are read when it is created and the others on first
+use, so that a combined heuristic that delegates to others pays for each of
+them once per leaf.
+
+Heuristics written against features take a single `PositionFeatures`
+argument; `score_function()` turns them into functions with the standard
+`(game, player)` signature.
+"""
+
+
+class PositionFeatures(object):
+    """
+    Facts about a game position from the point of view of one player.
+
+    Parameters
+    ----------
+    game : `isolation.Board`
+        The position.
+
+    player : object
+        A player registered in the game.
+
+    Attributes
+    ----------
+    opponent : object
+        The other player.
+
+    is_active : bool
+        True when `player` is the player to move.
+
+    utility : float
+        `game.utility(player)`: +inf or -inf once the game is won or lost,
+        0 otherwise.
+
+    blank_count : int
+        Number of blank cells.
+
+    free_part : float
+        Share of the board that is still blank.
+
+    location, opponent_location : (int, int)
+        Locations of the players (None before their first move).
+
+    own_mobility, opponent_mobility : int
+        Number of legal moves of the players.
+    """
+
+    __slots__ = ("game", "player", "opponent", "is_active", "utility", "blank_count",
+                 "free_part", "location", "opponent_location", "own_mobility",
+                 "opponent_mobility", "_own_moves", "_opponent_moves", "_common_moves",
+                 "_blanks")
+
+    def __init__(self, game, player):
+        self.game = game
+        self.player = player
+        self.opponent = game.get_opponent(player)
+        self.is_active = player == game.active_player
+        self.utility = game.utility(player)
+        self.blank_count = game.blank_count()
+        self.free_part = self.blank_count / (game.width * game.height)
+        self.location = game.get_player_location(player)
+        self.opponent_location = game.get_player_location(self.opponent)
+        self.own_mobility = game.mobility(player)
+        self.opponent_mobility = game.mobility(self.opponent)
+        self._own_moves = None
+        self._opponent_moves = None
+        self._common_moves = None
+        self._blanks = None
+
+    @property
+    def is_terminal(self):
+        """True when the game is over."""
+        return self.utility != 0
+
+    @property
+    def own_moves(self):
+        """Legal moves of the player (shared with the board's cache, so it
+        must not be modified)."""
+        if self._own_moves is None:
+            self._own_moves = self.game.get_legal_moves(self.player)
+        return self._own_moves
+
+    @property
+    def opponent_moves(self):
+        """Legal moves of the opponent (not to be modified)."""
+        if self._opponent_moves is None:
+            self._opponent_moves = self.game.get_legal_moves(self.opponent)
+        return self._opponent_moves
+
+    @property
+    def common_moves(self):
+        """Number of cells both players can move to next."""
+        if self._common_moves is None:
+            opponent_moves = self.opponent_moves
+            self._common_moves = sum(1 for move in self.own_moves if move in opponent_moves)
+        return self._common_moves
+
+    @property
+    def blanks(self):
+        """Set of the blank cells (not to be modified)."""
+        if self._blanks is None:
+            self._blanks = set(self.game.iter_blanks())
+        return self._blanks
+
+
+def score_function(value_fn, name=None):
+    """Wrap a heuristic taking a `PositionFeatures` into a score function
+    with the `(game, player)` signature used by `CustomPlayer`.
+
+    The score function is named `name`, by default the name of `value_fn`
+    with "_value" replaced by "_score" (e.g. `territory_value` gives
+    `territory_score`), so that agent fingerprints and labels keep naming
+    the score function.
+    """
+    def score(game, player):
+        return value_fn(PositionFeatures(game, player))
+    score.__name__ = score.__qualname__ = name or value_fn.__name__.replace("_value", "_score")
+    score.__module__ = value_fn.__module__
+    score.__doc__ = value_fn.__doc__
+    score.__wrapped__ = value_fn
+    return score
@@ -0,0 +1,73 @@
+"""
+Test cases for the shared per-position features.
+"""
+import random
+import unittest
+
+import isolation
+import game_agent
+import heuristics
+
+from features import PositionFeatures
+from features import score_function
+
+
+class PositionFeaturesTest(unittest.TestCase):
+
+    def test_features_match_board(self):
+        """ Every feature equals the corresponding board query, for both
+        players, until the end of a game """
+        rng = random.Random(0)
+        game = isolation.Board('p1', 'p2', 6, 6)
+        while True:
+            for player in ('p1', 'p2'):
+                f = PositionFeatures(game, player)
+                opponent = game.get_opponent(player)
+                self.assertEqual(f.is_active, player == game.active_player)
+                self.assertEqual(f.utility, game.utility(player))
+                self.assertEqual(f.is_terminal, game.is_terminal())
+                self.assertEqual(f.blank_count, len(game.get_blank_spaces()))
+                self.assertEqual((f.location, f.opponent_location),
+                                 (game.get_player_location(player), game.get_player_location(opponent)))
+                self.assertEqual(f.own_moves, game.get_legal_moves(player))
+                self.assertEqual(f.opponent_moves, game.get_legal_moves(opponent))
+                self.assertEqual((f.own_mobility, f.opponent_mobility),
+                                 (len(f.own_moves), len(f.opponent_moves)))
+                self.assertEqual(f.common_moves, len(set(f.own_moves) & set(f.opponent_moves)))
+                self.assertEqual(f.blanks, set(game.get_blank_spaces()))
+            if game.is_terminal():
+                break
+            game.apply_move(rng.choice(game.get_legal_moves()))
+
+    def test_score_function_wrapper(self):
+        """ Wrapped heuristics are named *_score and take (game, player);
+        the built-in heuristics agree with their feature versions """
+        def example_value(f):
+            """Mobility difference."""
+            return float(f.own_mobility - f.opponent_mobility)
+        example_score = score_function(example_value)
+        self.assertEqual((example_score.__qualname__, example_score.__doc__),
+                         ("example_score", "Mobility difference."))
+        for score in heuristics.SCORE_FUNCTIONS.values():
+            self.assertIn("_score", score.__qualname__)
+        self.assertEqual(heuristics.longest_path_score.__qualname__, "longest_path_score")
+
+        game = isolation.Board('p1', 'p2')
+        game.apply_move((3, 3))
+        game.apply_move((0, 0))
+        self.assertEqual(example_score(game, 'p1'), 6.)
+        f = PositionFeatures(game, 'p1')
+        self.assertEqual(game_agent.custom_score(game, 'p1'), game_agent.custom_value(f))
+        self.assertEqual(heuristics.openmove_div_score(game, 'p2'),
+                         heuristics.openmove_div_value(PositionFeatures(game, 'p2')))
+
+        # late positions use the drilldown heuristic
+        rng = random.Random(3)
+        while game.blank_count() > 20 and game.get_legal_moves():
+            game.apply_move(rng.choice(game.get_legal_moves()))
+        self.assertEqual(heuristics.combined_score_v1(game, 'p1'),
+                         heuristics.drilldown_score(game, 'p1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,10 +7,124 @@ You must test your agent's strength against a set of agents with known
 relative strength using tournament.py and include the results in your report.
 """
 
+import hashlib
+import types
+
+from collections import OrderedDict
+
+from features import PositionFeatures
+from isolation import Board
+from isolation.bitboard import greedy_path
+from isolation.bitboard import iter_bits
+from isolation.bitboard import knight_tables
+from isolation.bitboard import popcount
+from isolation.bitboard import reachable
+
+# late move reductions are only applied this many plies above the horizon
+LMR_MIN_DEPTH = 3
+
+# most nodes expanded between two reads of the clock with poll_interval='auto',
+# whatever the measured speed (a slow subtree after a fast one would otherwise
+# run far past the deadline)
+MAX_POLL_INTERVAL = 512
+
+# Finished games are scored +/-(WIN_SCORE - move count), so the search prefers
+# the fastest win and the slowest loss. Heuristic values are clamped to
+# +/-HEURISTIC_LIMIT; any search score beyond it is a proven result.
+WIN_SCORE = 1e6
+HEURISTIC_LIMIT = WIN_SCORE / 2
+
+# bound types of the entries in the proven-position cache
+EXACT, LOWER, UPPER = 0, 1, 2
+
+def _hash_code(sha, code):
+    """Add the bytecode and constants of a code object and of the code
+    objects nested in it to a hash."""
+    sha.update(code.co_code)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _hash_code(sha, const)
+        elif isinstance(const, frozenset):
+            # set iteration order changes with string hashing
+            sha.update(repr(sorted(map(repr, const))).encode())
+        else:
+            sha.update(repr(const).encode())
+
+def _global_names(code):
+    """Yield the global names used by a code object and its nested code."""
+    yield from code.co_names
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _global_names(const)
+
+def code_digest(fn):
+    """Return a short hash of the code of a function and of the functions
+    it reaches: the function it wraps, functions held in its closure and
+    module-level functions it calls by name. Editing any of them (e.g. a
+    heuristic and the helpers it uses) changes the digest.
+    """
+    sha = hashlib.sha1()
+    seen = set()
+    stack = [fn]
+    while stack:
+        f = stack.pop()
+        # bound methods hash the code of their function
+        f = getattr(f, '__func__', f)
+        code = getattr(f, '__code__', None)
+        if code is None or code in seen:
+            continue
+        seen.add(code)
+        _hash_code(sha, code)
+        if hasattr(f, '__wrapped__'):
+            stack.append(f.__wrapped__)
+        for cell in f.__closure__ or ():
+            try:
+                contents = cell.cell_contents
+            except ValueError:
+                continue
+            if callable(contents):
+                stack.append(contents)
+            elif isinstance(contents, (int, float, str, tuple, list)):
+                # e.g. the weights of a generated score function
+                sha.update(repr(contents).encode())
+        module = f.__globals__
+        stack.extend(module[name] for name in _global_names(code)
+                     if isinstance(module.get(name), types.FunctionType))
+    return sha.hexdigest()[:12]
+
+# class -> class_digest(); code does not change while the program runs
+_class_digests = {}
+
+def class_digest(cls):
+    """Return a short hash of the code of the methods of a class and of its
+    base classes, including the module-level functions they reach (see
+    `code_digest`). Editing the search of an agent or the `Board` changes
+    the digest.
+    """
+    if cls not in _class_digests:
+        sha = hashlib.sha1()
+        for klass in cls.__mro__:
+            if klass is object:
+                continue
+            for name, member in sorted(vars(klass).items()):
+                if isinstance(member, property):
+                    member = member.fget
+                # static and class methods hash the function they wrap
+                member = getattr(member, '__func__', member)
+                if isinstance(member, types.FunctionType):
+                    sha.update(name.encode())
+                    sha.update(code_digest(member).encode())
+        _class_digests[cls] = sha.hexdigest()[:12]
+    return _class_digests[cls]
+
 class Timeout(Exception):
     """Subclass base exception for code clarity."""
     pass
 
+class NodeBudgetExceeded(Timeout):
+    """Raised when the search has expanded its node budget for the move."""
+    pass
+
 def openmove_div_score(game, player):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
@@ -33,18 +147,20 @@ def openmove_div_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
+    return openmove_div_value(PositionFeatures(game, player))
+
+def openmove_div_value(features):
+    """`openmove_div_score` of a `features.PositionFeatures`."""
     # return immediate result if the game is in terminal state
-    if game.utility(player) != 0:
-        return game.utility(player)
+    if features.utility != 0:
+        return features.utility
     # calculate score
-    my_moves = game.get_legal_moves(player)
-    opponent_moves = game.get_legal_moves(game.get_opponent(player))
-    if len(opponent_moves) == 0:
+    if features.opponent_mobility == 0:
         return float("+inf")
-    result = len(my_moves)/len(opponent_moves)
+    result = features.own_mobility/features.opponent_mobility
     # reduce score for passive player if needed
-    if player != game.active_player and len([m for m in my_moves if m in opponent_moves]) > 0:
-        result -= 1/len(opponent_moves)
+    if not features.is_active and features.common_moves > 0:
+        result -= 1/features.opponent_mobility
         
     return float(result)
 
@@ -57,8 +173,8 @@ def get_drill_value(loc, blanks, is_active_player, opp_moves, maxdepth, depth =
     loc : (<int>,<int>) 
         Some location at he game board
         
-    blanks: [(<int>,<int>)]
-        A list of non-occupied locations at the board
+    blanks: set((<int>,<int>))
+        A set of non-occupied locations at the board
         
     is_active_player: boolean
         If value is calculated for active player or not
@@ -96,8 +212,7 @@ def get_drill_value(loc, blanks, is_active_player, opp_moves, maxdepth, depth =
     # recursuvely calculate the value of current location
     result = 0
     for move in moves:
-        newblanks = blanks[:]
-        newblanks.remove(move)
+        newblanks = blanks - {move}
         # if some blank field can be occupied by active opponent at the next ply, reduce its value
         reductor = 1 if common_moves_count == 0 else (common_moves_count-1)/common_moves_count
         result = result + reductor*(depth + get_drill_value(move,newblanks,False,[],maxdepth-1, depth+1))
@@ -108,19 +223,22 @@ def drilldown_score(game, player):
     Value is calculated as a rate bitween player's drill value 
     and opponent's drill value
     """
-    
-    if game.utility(player) != 0:
-        return game.utility(player)
-    blanks = game.get_blank_spaces()
-    my_drill = get_drill_value(game.get_player_location(player)
+    return drilldown_value(PositionFeatures(game, player))
+
+def drilldown_value(features):
+    """`drilldown_score` of a `features.PositionFeatures`."""
+    if features.utility != 0:
+        return features.utility
+    blanks = features.blanks
+    my_drill = get_drill_value(features.location
                               ,blanks
-                              ,player == game.active_player
-                              ,game.get_legal_moves(game.get_opponent(player))
+                              ,features.is_active
+                              ,features.opponent_moves
                               ,5)
-    opp_drill = get_drill_value(game.get_player_location(game.get_opponent(player))
+    opp_drill = get_drill_value(features.opponent_location
                                ,blanks
-                               ,player != game.active_player
-                               ,game.get_legal_moves(player)
+                               ,not features.is_active
+                               ,features.own_moves
                                ,5)
     if opp_drill != 0:
         return float(my_drill/opp_drill)
@@ -149,11 +267,15 @@ def custom_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    free_board_part = len(game.get_blank_spaces())/(game.width*game.height)
-    if free_board_part >= 0.6:
-        return openmove_div_score(game, player)
+    return custom_value(PositionFeatures(game, player))
+
+def custom_value(features):
+    """`custom_score` of a `features.PositionFeatures`, computed once for
+    whichever evaluator is used."""
+    if features.free_part >= 0.6:
+        return openmove_div_value(features)
     else:
-        return drilldown_score(game, player)
+        return drilldown_value(features)
 
 
 
@@ -185,10 +307,85 @@ class CustomPlayer:
         Time remaining (in milliseconds) when search is aborted. Should be a
         positive value large enough to allow the function to return before the
         timer expires.
+
+    node_limit : int (optional)
+        Maximum number of nodes to expand per move. When set (or when
+        depth_limit is set) the search ignores the clock entirely, so the
+        chosen moves are reproducible on any hardware; the budget must be
+        small enough for the search to finish within the game time limit.
+
+    depth_limit : int (optional)
+        Maximum depth reached by iterative deepening. Like node_limit, it
+        makes the search ignore the clock; a fixed-depth search with a
+        depth_limit is therefore clock-free too.
+
+    poll_interval : int or 'auto' (optional)
+        Number of nodes expanded between two reads of the clock. 'auto'
+        calibrates the interval from the measured nodes per millisecond so
+        that the clock is expected to be read every max_overshoot
+        milliseconds, and at least twice before the remaining time drops
+        below the timeout even at the slowest node cost seen in the move.
+        The speed is measured afresh for every move, the interval at most
+        doubles between two reads and never exceeds MAX_POLL_INTERVAL
+        nodes.
+
+    max_overshoot : float (optional)
+        Expected time (in milliseconds) between two reads of the clock when
+        poll_interval is 'auto'. It is only a bound while the search speed
+        stays close to the measured one: a subtree much slower than the
+        nodes before it reads the clock later.
+
+    eval_cache_size : int (optional)
+        Maximum number of evaluations kept in a least-recently-used cache
+        shared by all get_move() calls of a game, so that positions searched
+        again on later turns are not evaluated twice; 0 disables the cache.
+        The cache is cleared when a new game starts, and assumes that the
+        score function depends only on the position.
+
+    order_moves : boolean (optional)
+        Search the moves of every alphabeta node in order of increasing
+        mobility left to the opponent (ties: more onward moves first).
+
+    late_move_reduction : int (optional)
+        Number of moves of an alphabeta node searched to full depth; the
+        remaining moves are searched one ply shallower and searched again to
+        full depth only if they improve the bound. Implies order_moves.
+        None disables the reductions.
+
+    futility_margin : float (optional)
+        Alphabeta nodes one ply above the horizon are not expanded when the
+        difference between the agent's and the opponent's legal move counts
+        lies more than this margin outside the (alpha, beta) window. The
+        estimate costs two table lookups instead of an evaluation, but it
+        is in moves: the margin only fits heuristics on that scale (e.g.
+        improved_score) and has to be scaled for others. None disables the
+        pruning.
+
+    proven_cache : boolean (optional)
+        Remember positions whose search score is a proven win or loss for
+        the rest of the game, and reuse them in later searches instead of
+        searching them again. Cleared with the evaluation cache.
+
+    tablebase : `tablebase.Tablebase` (optional)
+        Endgame table for the board size. Once the players can no longer
+        reach a common cell and both regions are in the table, the search
+        returns the exact result of the game instead of searching on.
+
+    move_bounds : boolean (optional)
+        Once the players are separated, stop searching positions whose
+        winner follows from `Board.move_bounds()`: the player to move wins
+        when it can surely make more moves than the other player can at
+        most, and loses when it can make at most as many as the other player
+        surely can. The result is proven; the distance to the end of the
+        game is estimated from the upper bounds.
     """
 
     def __init__(self, search_depth=3, score_fn=custom_score,
-                 iterative=True, method='minimax', timeout=10.):
+                 iterative=True, method='minimax', timeout=10.,
+                 node_limit=None, depth_limit=None, poll_interval=1,
+                 max_overshoot=1., eval_cache_size=0, order_moves=False,
+                 late_move_reduction=None, futility_margin=None, proven_cache=False,
+                 tablebase=None, move_bounds=False):
         self.search_depth = search_depth
         self.iterative = iterative
         self.score = score_fn
@@ -197,7 +394,306 @@ class CustomPlayer:
         self.TIMER_THRESHOLD = timeout
         assert self.method in ['minimax','alphabeta'], 'Invalid search method {0}'.format(self.method)
         self.search_function = self.minimax if self.method == 'minimax' else self.alphabeta
-        
+        self.node_limit = node_limit
+        self.depth_limit = depth_limit
+        # node budget checked instead of the clock; None means use the clock
+        if node_limit is not None:
+            self._node_budget = node_limit
+        elif depth_limit is not None:
+            self._node_budget = float("inf")
+        else:
+            self._node_budget = None
+        # number of nodes expanded during the last call to get_move()
+        self.nodes = 0
+        assert poll_interval == 'auto' or poll_interval >= 1, 'Invalid poll interval {0}'.format(poll_interval)
+        self.poll_interval = poll_interval
+        self.max_overshoot = max_overshoot
+        # node count at which the clock is read next, and the state used to
+        # calibrate the interval ('auto' mode), reset for every search
+        self._next_poll = 0
+        self._reset_poll_calibration()
+        # number of searches aborted by the timer; a fixed-depth agent is only
+        # deterministic while this counter does not change
+        self.search_timeouts = 0
+        # depth of the last search completed by get_move() (0 if none)
+        self.completed_depth = 0
+        # evaluation cache: (score_fn, position key, player to move) -> score,
+        # in least-recently-used order; the hit, miss and eviction counters
+        # cover the whole lifetime of the agent
+        assert eval_cache_size >= 0, 'Invalid eval cache size {0}'.format(eval_cache_size)
+        self.eval_cache_size = eval_cache_size
+        self.eval_cache = OrderedDict() if eval_cache_size else None
+        self.eval_cache_hits = 0
+        self.eval_cache_misses = 0
+        self.eval_cache_evictions = 0
+        # (position key, player to move) -> (score, bound type, best move)
+        self.proven_cache = {} if proven_cache else None
+        self.proven_cache_hits = 0
+        self.tablebase = tablebase
+        self.tablebase_hits = 0
+        self.move_bounds = move_bounds
+        self.bounds_cutoffs = 0
+        # the game the caches belong to: the opponent and the last move count
+        self._cache_opponent = None
+        self._cache_move_count = -1
+        self.late_move_reduction = late_move_reduction
+        self.order_moves = order_moves or late_move_reduction is not None
+        self.futility_margin = futility_margin
+        # index of the first reduced move; no move is reduced by default
+        self._reduce_after = float("inf") if late_move_reduction is None else late_move_reduction
+
+    @property
+    def is_deterministic(self):
+        """True when get_move() depends only on the game position: the
+        search is limited by node_limit or depth_limit instead of the clock
+        and the score function is not random (see `heuristics.random_score`).
+        A fixed-depth search on the clock is not, since whether the timer
+        aborts it depends on the machine.
+        """
+        return self._node_budget is not None and getattr(self.score, 'deterministic', True)
+
+    @staticmethod
+    def is_proven(score):
+        """True when a search score is a proven win or loss."""
+        return score > HEURISTIC_LIMIT or score < -HEURISTIC_LIMIT
+
+    def fingerprint(self):
+        """Return a string identifying the search configuration of the agent.
+        Deterministic agents with equal fingerprints choose the same moves.
+        """
+        # the code digest keeps results of an edited heuristic apart
+        score_name = '{0}.{1}@{2}'.format(getattr(self.score, '__module__', ''),
+                                          getattr(self.score, '__qualname__', repr(self.score)),
+                                          code_digest(self.score))
+        # the search, the board and the features the heuristics read
+        search = '{0}+{1}+{2}'.format(class_digest(type(self)), class_digest(Board),
+                                      class_digest(PositionFeatures))
+        # a different table, or the same file regenerated, can change moves
+        table = None
+        if self.tablebase is not None:
+            table = '{0}:{1}@{2}'.format(self.tablebase.path, self.tablebase.max_cells,
+                                         self.tablebase.digest())
+        return ('{0}(method={1}, depth={2}, iterative={3}, score={4}, node_limit={5}, depth_limit={6}, '
+                'order_moves={7}, late_move_reduction={8}, futility_margin={9}, move_bounds={10}, '
+                'proven_cache={11}, tablebase={12}, code={13})').format(
+            type(self).__name__, self.method, self.search_depth, self.iterative, score_name,
+            self.node_limit, self.depth_limit, self.order_moves, self.late_move_reduction,
+            self.futility_margin, self.move_bounds, self.proven_cache is not None, table, search)
+
+    def _reset_poll_calibration(self):
+        """Forget the measured search speed. The cost of a node changes
+        from move to move (e.g. custom_score switches to a far more
+        expensive evaluator as the board fills), so a speed measured on
+        cheaper nodes must not be reused.
+        """
+        self._last_poll_nodes = 0
+        self._last_poll_time = None
+        self._last_poll_interval = 1
+        self._nodes_per_ms = None
+        # slowest mean node cost over a polling interval of this search
+        self._max_ms_per_node = 0.
+
+    def _poll_clock(self):
+        """Raise Timeout if the search is out of time, and schedule the next
+        read of the clock.
+        """
+        time_left = self.time_left()
+        if time_left < self.TIMER_THRESHOLD:
+            raise Timeout()
+
+        if self.poll_interval != 'auto':
+            self._next_poll = self.nodes + self.poll_interval
+            return
+
+        # measure the search speed since the previous read of the clock
+        if self._last_poll_time is not None:
+            elapsed = self._last_poll_time - time_left
+            nodes = self.nodes - self._last_poll_nodes
+            if elapsed > 0 and nodes > 0:
+                rate = nodes / elapsed
+                self._nodes_per_ms = rate if self._nodes_per_ms is None else \
+                    0.5 * self._nodes_per_ms + 0.5 * rate
+                self._max_ms_per_node = max(self._max_ms_per_node, elapsed / nodes)
+        self._last_poll_time = time_left
+        self._last_poll_nodes = self.nodes
+
+        # read the clock again after about max_overshoot ms at the measured
+        # speed, and at least twice before the remaining time reaches the
+        # threshold even if every node costs as much as the slowest seen;
+        # the interval at most doubles from one read to the next, so nodes
+        # getting dearer are noticed before the interval has grown far
+        interval = 1
+        if self._nodes_per_ms is not None:
+            margin = (time_left - self.TIMER_THRESHOLD) / 2
+            interval = min(MAX_POLL_INTERVAL, 2 * self._last_poll_interval,
+                           int(self._nodes_per_ms * min(self.max_overshoot, margin)),
+                           int(margin / self._max_ms_per_node))
+            interval = max(1, interval)
+        self._last_poll_interval = interval
+        self._next_poll = self.nodes + interval
+
+    def _cached_score(self, game):
+        """Return self.score(game, self), looking it up in the evaluation
+        cache first.
+        """
+        key = (self.score, game.hash_key(), game.active_player is self)
+        cache = self.eval_cache
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+            self.eval_cache_hits += 1
+            return value
+        self.eval_cache_misses += 1
+        value = self.score(game, self)
+        cache[key] = value
+        if len(cache) > self.eval_cache_size:
+            cache.popitem(last=False)
+            self.eval_cache_evictions += 1
+        return value
+
+    def _evaluate(self, game):
+        """Return the heuristic score of a position that is not finished,
+        clamped to +/-HEURISTIC_LIMIT so that it is never mistaken for a
+        proven result.
+        """
+        value = self._cached_score(game) if self.eval_cache is not None else self.score(game, self)
+        if value > HEURISTIC_LIMIT:
+            return HEURISTIC_LIMIT
+        if value < -HEURISTIC_LIMIT:
+            return -HEURISTIC_LIMIT
+        return value
+
+    def _terminal_score(self, game):
+        """Return the score of a finished game: the active player has lost."""
+        distance = WIN_SCORE - game.move_count
+        return -distance if game.active_player is self else distance
+
+    def _probe_tablebase(self, game):
+        """Return the exact (score, move) of a position in which the players
+        are separated and both regions are in the tablebase, or None.
+
+        With separated regions each player just follows its longest path:
+        the player to move loses after a moves each if a <= b, where a and b
+        are the longest paths of the player to move and of the other one,
+        and wins after b + 1 of its moves otherwise.
+        """
+        table = self.tablebase
+        if game.width != table.width or game.height != table.height:
+            return None
+        active_loc = game.get_player_location(game.active_player)
+        inactive_loc = game.get_player_location(game.inactive_player)
+        if active_loc is None or inactive_loc is None:
+            return None
+        tables = table.tables
+        masks, shift = tables.neighbor_masks, len(tables.cells)
+        blanks = game.blank_mask()
+        a_cell, b_cell = tables.index[active_loc], tables.index[inactive_loc]
+        a_region = reachable(masks, blanks, a_cell, table.max_cells)
+        if a_region is None:
+            return None
+        b_region = reachable(masks, blanks, b_cell, table.max_cells)
+        if b_region is None or a_region & b_region:
+            return None
+
+        # first step of the longest path of the player to move
+        a, best_step = 0, None
+        for step in iter_bits(masks[a_cell] & a_region):
+            rest = reachable(masks, a_region & ~(1 << step), step)
+            length = 1 + (table.lookup(step << shift | rest) if rest else 0)
+            if length > a:
+                a, best_step = length, step
+        b = table.lookup(b_cell << shift | b_region) if b_region else 0
+        if best_step is None or b is None:
+            return None
+
+        self.tablebase_hits += 1
+        if a <= b:
+            end, active_wins = game.move_count + 2 * a, False
+        else:
+            end, active_wins = game.move_count + 2 * b + 1, True
+        distance = WIN_SCORE - end
+        score = distance if active_wins == (game.active_player is self) else -distance
+        return score, tables.cells[best_step]
+
+    def _bounds_cutoff(self, game):
+        """Return a proven (score, move) of a position in which the players
+        are separated and the move bounds decide the winner, or None.
+
+        The move is the first step of the greedy path of the player to move,
+        which realizes its lower bound.
+
+        The winner is certain, but the game ends at the latest at the
+        returned distance and may end sooner: the score is a lower bound of
+        a win and an upper bound of a loss (see `_proven_bound()`).
+        """
+        if not game.is_separated():
+            return None
+        a_lower, a_upper = game.move_bounds(game.active_player)
+        b_lower, b_upper = game.move_bounds(game.inactive_player)
+        if a_lower > b_upper:
+            end, active_wins = game.move_count + 2 * b_upper + 1, True
+        elif a_upper <= b_lower:
+            end, active_wins = game.move_count + 2 * a_upper, False
+        else:
+            return None
+
+        self.bounds_cutoffs += 1
+        tables = knight_tables(game.width, game.height)
+        cell = tables.index[game.get_player_location(game.active_player)]
+        step = greedy_path(tables.neighbor_masks, game.blank_mask(), cell)[0]
+        distance = WIN_SCORE - end
+        score = distance if active_wins == (game.active_player is self) else -distance
+        return score, tables.cells[step]
+
+    @staticmethod
+    def _proven_bound(score, window_bound, estimated):
+        """Return the bound type under which a proven score is cached, or
+        None if it cannot be cached.
+
+        `window_bound` is the type the search window gives the score.
+        Scores resting on `_bounds_cutoff()` (`estimated`) are lower bounds
+        of wins and upper bounds of losses, since the game may end sooner
+        than the cutoffs say; they cannot be cached when the window gives
+        the other bound.
+        """
+        if not estimated:
+            return window_bound
+        bound = LOWER if score > 0 else UPPER
+        return bound if window_bound in (EXACT, bound) else None
+
+    def _ordered_moves(self, game):
+        """Return the legal moves of the active player sorted by the number
+        of replies left to the opponent, then by the number of onward moves
+        from the target cell (descending). Counts come from the bitboard, so
+        no child board is built.
+        """
+        tables = knight_tables(game.width, game.height)
+        blanks = game.blank_mask()
+        opponent_loc = game.get_player_location(game.inactive_player)
+        opponent_mask = 0
+        if opponent_loc is not None:
+            opponent_mask = tables.neighbor_masks[tables.index[opponent_loc]] & blanks
+
+        def key(move):
+            i = tables.index[move]
+            bit = 1 << i
+            return (popcount(opponent_mask & ~bit),
+                    -popcount(tables.neighbor_masks[i] & blanks & ~bit))
+
+        return sorted(game.get_legal_moves(), key=key)
+
+    def _start_cached_game(self, game):
+        """Clear the evaluation and proven-position caches when `game` is not
+        a continuation of the game seen by the previous call to get_move().
+        """
+        opponent = game.get_opponent(self)
+        if opponent is not self._cache_opponent or game.move_count <= self._cache_move_count:
+            if self.eval_cache is not None:
+                self.eval_cache.clear()
+            if self.proven_cache is not None:
+                self.proven_cache.clear()
+            self._cache_opponent = opponent
+        self._cache_move_count = game.move_count
 
     def get_move(self, game, legal_moves, time_left):
         """Search for the best move from the available legal moves and return a
@@ -236,6 +732,12 @@ class CustomPlayer:
         """
 
         self.time_left = time_left
+        self.nodes = 0
+        self._next_poll = 0
+        self._reset_poll_calibration()
+        self.completed_depth = 0
+        if self.eval_cache is not None or self.proven_cache is not None:
+            self._start_cached_game(game)
         best_move = (-1,-1)
         # exit if there are no legal moves
         if len(legal_moves) == 0:
@@ -245,14 +747,27 @@ class CustomPlayer:
         try:
             if self.iterative:
                 # TODO: invent better iterative deepening exit condition?
-                while current_depth <= len(game.get_blank_spaces()):
-                    _, best_move = self.search_function(game, current_depth)
+                max_depth = game.blank_count()
+                if self.depth_limit is not None:
+                    max_depth = min(max_depth, self.depth_limit)
+                while current_depth <= max_depth:
+                    score, best_move = self.search_function(game, current_depth)
+                    self.completed_depth = current_depth
+                    # a proven result does not change with depth
+                    if self.is_proven(score):
+                        break
                     current_depth += 1
             else:
                 _, best_move = self.search_function(game, self.search_depth)
+                self.completed_depth = self.search_depth
+        except NodeBudgetExceeded:
+            # the budget is part of the configuration, so the result does not
+            # depend on the machine; return the best move found
+            pass
         except Timeout:
             # No actions currently, we just return the best move found
-            #print('Blanks = {0}, timeout depth = {1}'.format(len(game.get_blank_spaces()),current_depth))
+            self.search_timeouts += 1
+            #print('Blanks = {0}, timeout depth = {1}'.format(game.blank_count(),current_depth))
             pass
 
         # Return the best move from the last completed search iteration
@@ -289,21 +804,45 @@ class CustomPlayer:
                 to pass the project unit tests; you cannot call any other
                 evaluation function directly.
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise Timeout()
-            
+        self.nodes += 1
+        if self._node_budget is None:
+            if self.nodes >= self._next_poll:
+                self._poll_clock()
+        elif self.nodes > self._node_budget:
+            raise NodeBudgetExceeded()
        
-        # if max. depth is reached or this is a leaf node - return score
-        if depth == 0 or len(game.get_legal_moves()) == 0:
-            return self.score(game, self), (-1,-1) # we are not looking for move here, so returning (-1,-1)
+        # finished games get a proven score, other leaves a heuristic one
+        if len(game.get_legal_moves()) == 0:
+            return self._terminal_score(game), (-1,-1)
+        if self.tablebase is not None:
+            solved = self._probe_tablebase(game)
+            if solved is not None:
+                return solved
+        if self.move_bounds:
+            solved = self._bounds_cutoff(game)
+            if solved is not None:
+                return solved
+        if depth == 0:
+            return self._evaluate(game), (-1,-1) # we are not looking for move here, so returning (-1,-1)
+        if self.proven_cache is not None:
+            key = (game.hash_key(), game.active_player is self)
+            entry = self.proven_cache.get(key)
+            if entry is not None and entry[1] == EXACT:
+                self.proven_cache_hits += 1
+                return entry[0], entry[2]
         # get scores for all child states
+        cutoffs = self.bounds_cutoffs
         best_score = float("-inf") if maximizing_player else float("inf")
         best_move = (-1,-1)
         for move in game.get_legal_moves():
             score, _ = self.minimax(game.forecast_move(move), depth-1, not maximizing_player)
             if (maximizing_player and score > best_score) or (not maximizing_player and score < best_score):
                 best_score, best_move = score, move
-             
+
+        if self.proven_cache is not None and self.is_proven(best_score):
+            bound = self._proven_bound(best_score, EXACT, self.bounds_cutoffs != cutoffs)
+            if bound is not None:
+                self.proven_cache[key] = (best_score, bound, best_move)
         return best_score, best_move
     
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf"), maximizing_player=True):
@@ -344,19 +883,64 @@ class CustomPlayer:
                 to pass the project unit tests; you cannot call any other
                 evaluation function directly.
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise Timeout()
+        self.nodes += 1
+        if self._node_budget is None:
+            if self.nodes >= self._next_poll:
+                self._poll_clock()
+        elif self.nodes > self._node_budget:
+            raise NodeBudgetExceeded()
             
-         # if max. depth is reached or this is a leaf node - return score
-        if depth == 0 or len(game.get_legal_moves()) == 0:
-            return self.score(game, self), (-1,-1) # we are not looking for move here, so returning (-1,-1)
+        # finished games get a proven score, other leaves a heuristic one
+        if len(game.get_legal_moves()) == 0:
+            return self._terminal_score(game), (-1,-1)
+        if self.tablebase is not None:
+            solved = self._probe_tablebase(game)
+            if solved is not None:
+                return solved
+        if self.move_bounds:
+            solved = self._bounds_cutoff(game)
+            if solved is not None:
+                return solved
+        if depth == 0:
+            return self._evaluate(game), (-1,-1) # we are not looking for move here, so returning (-1,-1)
+
+        # a proven score from an earlier search is reused when it is exact or
+        # a bound that already falls outside the window
+        if self.proven_cache is not None:
+            key = (game.hash_key(), game.active_player is self)
+            entry = self.proven_cache.get(key)
+            if entry is not None:
+                value, bound, move = entry
+                if bound == EXACT or (bound == LOWER and value >= beta) or \
+                        (bound == UPPER and value <= alpha):
+                    self.proven_cache_hits += 1
+                    return value, move
             
+        # futility pruning: a frontier node whose mobility difference cannot
+        # reach the window even with futility_margin to spare is not expanded
+        if depth == 1 and self.futility_margin is not None:
+            static = game.mobility(self) - game.mobility(game.get_opponent(self))
+            if maximizing_player and alpha > float("-inf") and static + self.futility_margin <= alpha:
+                return alpha, game.get_legal_moves()[0]
+            if not maximizing_player and beta < float("inf") and static - self.futility_margin >= beta:
+                return beta, game.get_legal_moves()[0]
+
         # get scores for all child states
+        cutoffs = self.bounds_cutoffs
         best_score = float("-inf") if maximizing_player else float("inf")
         best_move = (-1,-1)
         new_alpha, new_beta = alpha, beta
-        for move in game.get_legal_moves():
-            score, _ = self.alphabeta(game.forecast_move(move), depth-1, new_alpha, new_beta,not maximizing_player)
+        moves = self._ordered_moves(game) if self.order_moves else game.get_legal_moves()
+        for i, move in enumerate(moves):
+            child = game.forecast_move(move)
+            if i >= self._reduce_after and depth >= LMR_MIN_DEPTH:
+                # late move: try a shallower search first, and search again to
+                # full depth only if the move would raise the bound
+                score, _ = self.alphabeta(child, depth-2, new_alpha, new_beta, not maximizing_player)
+                if (maximizing_player and score > new_alpha) or (not maximizing_player and score < new_beta):
+                    score, _ = self.alphabeta(child, depth-1, new_alpha, new_beta, not maximizing_player)
+            else:
+                score, _ = self.alphabeta(child, depth-1, new_alpha, new_beta, not maximizing_player)
             if (maximizing_player and score > best_score) or (not maximizing_player and score < best_score):
                 best_score, best_move = score, move
                 # set new alpha or beta value
@@ -366,6 +950,17 @@ class CustomPlayer:
                     new_beta = best_score
             # alpha-beta pruning
             if (maximizing_player and score >= beta) or (not maximizing_player and score <= alpha):
-                break 
-             
+                break
+
+        if self.proven_cache is not None and self.is_proven(best_score):
+            # a score outside the window is only a bound on the true value
+            if best_score >= beta:
+                bound = LOWER
+            elif best_score <= alpha:
+                bound = UPPER
+            else:
+                bound = EXACT
+            bound = self._proven_bound(best_score, bound, self.bounds_cutoffs != cutoffs)
+            if bound is not None:
+                self.proven_cache[key] = (best_score, bound, best_move)
         return best_score, best_move
@@ -6,22 +6,37 @@ Created on Sun Mar  5 13:03:48 2017
 """
 import random
 
+from features import score_function
+from isolation.bitboard import greedy_path
+from isolation.bitboard import knight_spread
+from isolation.bitboard import knight_tables
+from isolation.bitboard import path_upper_bound
+from isolation.bitboard import popcount
+from isolation.chambers import chamber_bound
+from isolation.chambers import chamber_sizes
+from isolation.chambers import find_chambers
+from tablebase import load_tablebase
+
 def random_score(game, player):
     return random.random()
 
-def utility_score(game, player):
-    return game.utility(player)
+# agents using it must not be cached as deterministic
+random_score.deterministic = False
 
-def openmove_div_score(game, player):
-    if game.utility(player) != 0:
-        return game.utility(player)
-    my_moves = game.get_legal_moves(player)
-    opponent_moves = game.get_legal_moves(game.get_opponent(player))
-    if len(opponent_moves) == 0:
+# The heuristics below take a `features.PositionFeatures`; the `*_score`
+# functions wrapping them have the usual (game, player) signature.
+
+def utility_value(f):
+    return f.utility
+
+def openmove_div_value(f):
+    if f.utility != 0:
+        return f.utility
+    if f.opponent_mobility == 0:
         return float("+inf")
-    result = len(my_moves)/len(opponent_moves)
-    if player != game.active_player and len([m for m in my_moves if m in opponent_moves]) > 0:
-        result -= 1/len(opponent_moves)
+    result = f.own_mobility/f.opponent_mobility
+    if not f.is_active and f.common_moves > 0:
+        result -= 1/f.opponent_mobility
     return float(result)
 
 
@@ -37,25 +52,23 @@ def get_drill_value(loc, blanks, is_active_player, opp_moves, maxdepth, depth =
     else:
         common_moves_count = 0
     for move in moves:
-        newblanks = blanks[:]
-        newblanks.remove(move)
+        newblanks = blanks - {move}
         reductor = 1 if common_moves_count == 0 else (common_moves_count-1)/common_moves_count
         result = result + reductor*(depth + get_drill_value(move,newblanks,False,[],maxdepth-1, depth+1))
     return float(result)
     
-def drilldown_score(game, player):
-    if game.utility(player) != 0:
-        return game.utility(player)
-    blanks = game.get_blank_spaces()
-    my_drill = get_drill_value(game.get_player_location(player)
-                              ,blanks
-                              ,player == game.active_player
-                              ,game.get_legal_moves(game.get_opponent(player))
+def drilldown_value(f):
+    if f.utility != 0:
+        return f.utility
+    my_drill = get_drill_value(f.location
+                              ,f.blanks
+                              ,f.is_active
+                              ,f.opponent_moves
                               ,5)
-    opp_drill = get_drill_value(game.get_player_location(game.get_opponent(player))
-                               ,blanks
-                               ,player != game.active_player
-                               ,game.get_legal_moves(player)
+    opp_drill = get_drill_value(f.opponent_location
+                               ,f.blanks
+                               ,not f.is_active
+                               ,f.own_moves
                                ,5)
     if opp_drill != 0:
         return float(my_drill/opp_drill)
@@ -63,60 +76,82 @@ def drilldown_score(game, player):
         return float("+inf")
     #return float(my_drill - opp_drill)
 
-def centroid_score(game, player):
-    if game.utility(player) != 0:
-        return game.utility(player)
-    my_loc = game.get_player_location(player)
-    return float(abs(my_loc[0]-game.height/2) + abs(my_loc[1]-game.width/2))
+def centroid_value(f):
+    if f.utility != 0:
+        return f.utility
+    my_loc = f.location
+    return float(abs(my_loc[0]-f.game.height/2) + abs(my_loc[1]-f.game.width/2))
     
 
 def longest_path_value(loc, blanks):
+    # exact answer from the endgame tablebase once the region is small
+    table = load_tablebase()
+    if table is not None:
+        value = table.longest_path(loc, blanks)
+        if value is not None:
+            return float(value)
     if len(blanks) == 0:
         return 0
     directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2),  (1, 2), (2, -1),  (2, 1)]
     # get all blanks reachable from current location
     moves = [(loc[0] + dr, loc[1] + dc) for dr,dc in directions if (loc[0] + dr, loc[1] + dc) in blanks]
-    max_result = float("-inf")
+    max_result = 0
     for move in moves:
-        newblanks = blanks[:]
-        newblanks.remove(move)
+        newblanks = blanks - {move}
         result = 1 + longest_path_value(move,newblanks)
         if result > max_result:
             max_result = result
     return float(max_result)
 
-def longest_path_score(game, player):
-    my_path = longest_path_value(game.get_player_location(player),game.get_blank_spaces())
-    opp_path = longest_path_value(game.get_player_location(game.get_opponent(player)),game.get_blank_spaces())
+def bounded_longest_path(game, loc, blanks):
+    # a greedy path that reaches the upper bound is a longest path, so the
+    # exhaustive search is only run when the bounds differ
+    tables = knight_tables(game.width, game.height)
+    cell = tables.index[loc]
+    mask = game.blank_mask()
+    lower = len(greedy_path(tables.neighbor_masks, mask, cell))
+    upper = path_upper_bound(tables, mask, cell)
+    if lower < upper:
+        upper = min(upper, chamber_bound(find_chambers(tables.neighbor_masks, mask, cell)))
+    if lower == upper:
+        return float(lower)
+    return longest_path_value(loc, blanks)
+
+def path_difference_value(f):
+    my_path = bounded_longest_path(f.game, f.location, f.blanks)
+    opp_path = bounded_longest_path(f.game, f.opponent_location, f.blanks)
     return float(my_path-opp_path)
 
-def combined_score_v1(game, player):
-    free_board_part = len(game.get_blank_spaces())/(game.width*game.height)
-    if free_board_part >= 0.6:
-        return openmove_div_score(game, player)
+def combined_value_v1(f):
+    # drilldown_with_opponent_score was never defined; drilldown_value is the
+    # drilldown heuristic that discounts cells the opponent can take next
+    if f.free_part >= 0.6:
+        return openmove_div_value(f)
     else:
-        return drilldown_with_opponent_score(game, player)
+        return drilldown_value(f)
     
-def combined_score_v2(game, player):
-    free_board_part = len(game.get_blank_spaces())/(game.width*game.height)
-    if free_board_part >= 0.5:
-        return openmove_div_score(game, player)
+def combined_value_v2(f):
+    if f.free_part >= 0.5:
+        return openmove_div_value(f)
     else:
-        return longest_path_score(game, player)
+        return path_difference_value(f)
 
 
-def agressive_score(game, player):
-    moves = game.get_legal_moves()
-    side_coef = 1 if player == game.active_player else -1
+def active_mobility(f):
+    return f.own_mobility if f.is_active else f.opponent_mobility
+
+def agressive_value(f):
+    moves = active_mobility(f)
+    side_coef = 1 if f.is_active else -1
     
-    if len(moves) == 0:
+    if moves == 0:
         result = float("-inf")
     else:
-        result = len(moves)
+        result = moves
         
     directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2),  (1, 2), (2, -1),  (2, 1)]
-    player_pos = game.get_player_location(player)
-    opponent_pos = game.get_player_location(game.get_opponent(player))
+    player_pos = f.location
+    opponent_pos = f.opponent_location
     if player_pos in [(opponent_pos[0]+dr,opponent_pos[1]+dc) for dr, dc in directions]:
         result -= 0.5
     else:
@@ -124,6 +159,7 @@ def agressive_score(game, player):
 
     return float(result*side_coef)
 
+# unfinished draft, kept out of the code (and not converted to features)
 '''
 def width_and_depth_score(game, player):
     if game.utility(player) != 0:
@@ -138,7 +174,7 @@ def width_and_depth_score(game, player):
  
 
 
-def open_positions_score(game, player):
+def open_positions_value(f):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
 
@@ -160,15 +196,118 @@ def open_positions_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    moves = game.get_legal_moves()
-    side_coef = 1 if player == game.active_player else -1
+    moves = active_mobility(f)
+    side_coef = 1 if f.is_active else -1
     
-    if len(moves) == 0:
+    if moves == 0:
         result = float("-inf")
     else:
-        result = len(moves)
+        result = moves
         
     
     return float(result*side_coef)
 
-custom_score = drilldown_score
\ No newline at end of file
+def territory_counts(game):
+    """Count the blank cells the active and the inactive player reach first.
+
+    The knight-distance layers of both players are grown at once with
+    bitmask shifts (`bitboard.knight_spread`), one layer per move; a cell
+    goes to the player whose layer reaches it first, and to the active
+    player, who moves first, on a tie. A player that has not moved yet
+    reaches every blank cell in its first move.
+    """
+    tables = knight_tables(game.width, game.height)
+    shifts, index = tables.shifts, tables.index
+    blanks = game.blank_mask()
+    unclaimed = blanks
+    counts = []
+    frontiers, seen = [], []
+    for player in (game.active_player, game.inactive_player):
+        loc = game.get_player_location(player)
+        frontiers.append(None if loc is None else 1 << index[loc])
+        seen.append(0)
+        counts.append(0)
+    while unclaimed and (frontiers[0] != 0 or frontiers[1] != 0):
+        for i in (0, 1):
+            if frontiers[i] is None:
+                layer = blanks
+            else:
+                layer = knight_spread(shifts, frontiers[i]) & blanks & ~seen[i]
+            seen[i] |= layer
+            frontiers[i] = layer
+            counts[i] += popcount(layer & unclaimed)
+            unclaimed &= ~layer
+    return counts[0], counts[1]
+
+def territory_value(f):
+    """Voronoi territory: the blank cells the player reaches before its
+    opponent, minus those the opponent reaches first."""
+    if f.utility != 0:
+        return f.utility
+    active_cells, inactive_cells = territory_counts(f.game)
+    if f.is_active:
+        return float(active_cells - inactive_cells)
+    return float(inactive_cells - active_cells)
+
+def chamber_features(game, player):
+    """Return (chamber bound, largest chamber) of a player: the bound on the
+    moves it can still make given the chambers of its region (see
+    `isolation.chambers`), and the number of cells of the largest chamber
+    at its location. Both are 0 for a player that has not moved yet."""
+    loc = game.get_player_location(player)
+    if loc is None:
+        return 0, 0
+    tables = knight_tables(game.width, game.height)
+    chambers = find_chambers(tables.neighbor_masks, game.blank_mask(), tables.index[loc])
+    sizes = chamber_sizes(chambers)
+    return chamber_bound(chambers), sizes[0] if sizes else 0
+
+def chamber_value(f):
+    """Difference of the chamber bounds of the player and its opponent,
+    with the Voronoi territory to break ties while the players share a
+    region."""
+    if f.utility != 0:
+        return f.utility
+    if None in (f.location, f.opponent_location):
+        return territory_value(f)
+    mine, _ = chamber_features(f.game, f.player)
+    theirs, _ = chamber_features(f.game, f.opponent)
+    return float(mine - theirs) + territory_value(f) / (f.game.width * f.game.height + 1)
+
+def walk_count_score(game, player):
+    """`drilldown_score` computed from walk counts with NumPy (see
+    `pathcount`)."""
+    # NumPy is only needed when this heuristic is used
+    from pathcount import walk_score
+    return walk_score(game, player)
+
+utility_score = score_function(utility_value)
+openmove_div_score = score_function(openmove_div_value)
+drilldown_score = score_function(drilldown_value)
+centroid_score = score_function(centroid_value)
+longest_path_score = score_function(path_difference_value, "longest_path_score")
+combined_score_v1 = score_function(combined_value_v1)
+combined_score_v2 = score_function(combined_value_v2)
+agressive_score = score_function(agressive_value)
+open_positions_score = score_function(open_positions_value)
+territory_score = score_function(territory_value)
+chamber_score = score_function(chamber_value)
+
+custom_score = drilldown_score
+
+# score functions by name, for command line tools and experiments
+SCORE_FUNCTIONS = {
+    "random": random_score,
+    "utility": utility_score,
+    "openmove_div": openmove_div_score,
+    "drilldown": drilldown_score,
+    "centroid": centroid_score,
+    "longest_path": longest_path_score,
+    "combined_v1": combined_score_v1,
+    "combined_v2": combined_score_v2,
+    "agressive": agressive_score,
+    "open_positions": open_positions_score,
+    "territory": territory_score,
+    "chamber": chamber_score,
+    "walk_count": walk_count_score,
+}
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""
+Test cases for the heuristics in heuristics.py.
+"""
+import random
+import unittest
+
+from collections import deque
+
+import isolation
+import heuristics
+
+from isolation.bitboard import DIRECTIONS
+from isolation.bitboard import iter_bits
+from isolation.bitboard import knight_spread
+from isolation.bitboard import knight_tables
+
+
+def distances(game, player):
+    """Reference implementation: knight distances of the blank cells from a
+    player, by breadth-first search over (row, col) pairs."""
+    blanks = set(game.iter_blanks())
+    loc = game.get_player_location(player)
+    if loc is None:
+        return {cell: 1 for cell in blanks}
+    found, queue = {}, deque([loc])
+    while queue:
+        cell = queue.popleft()
+        for dr, dc in DIRECTIONS:
+            step = (cell[0] + dr, cell[1] + dc)
+            if step in blanks and step not in found:
+                found[step] = found.get(cell, 0) + 1
+                queue.append(step)
+    return found
+
+
+class TerritoryTest(unittest.TestCase):
+
+    def test_knight_spread_matches_neighbor_masks(self):
+        """ Shifted sets equal the union of the neighbors of their cells """
+        rng = random.Random(0)
+        for width, height in ((7, 7), (5, 8), (4, 6)):
+            tables = knight_tables(width, height)
+            for _ in range(100):
+                mask = rng.getrandbits(width * height)
+                expected = 0
+                for i in iter_bits(mask):
+                    expected |= tables.neighbor_masks[i]
+                self.assertEqual(knight_spread(tables.shifts, mask), expected)
+
+    def test_territory_matches_breadth_first_search(self):
+        """ Cells are counted for the player at the smaller distance, ties
+        for the active player, from the first move to the endgame """
+        for seed in range(100):
+            rng = random.Random(seed)
+            game = isolation.Board("p1", "p2", 7, 6)
+            for _ in range(rng.randrange(30)):
+                if not game.get_legal_moves():
+                    break
+                game.apply_move(rng.choice(game.get_legal_moves()))
+            mine = distances(game, game.active_player)
+            theirs = distances(game, game.inactive_player)
+            expected = (sum(1 for c in mine if c not in theirs or mine[c] <= theirs[c]),
+                        sum(1 for c in theirs if c not in mine or theirs[c] < mine[c]))
+            self.assertEqual(heuristics.territory_counts(game), expected)
+            if not game.is_terminal():
+                self.assertEqual(heuristics.territory_score(game, game.active_player),
+                                 expected[0] - expected[1])
+                self.assertEqual(heuristics.territory_score(game, game.inactive_player),
+                                 expected[1] - expected[0])
+
+    def test_registry(self):
+        """ The registered score functions share the standard signature """
+        self.assertIs(heuristics.SCORE_FUNCTIONS["territory"], heuristics.territory_score)
+        game = isolation.Board("p1", "p2", 5, 5)
+        game.apply_move((2, 2))
+        game.apply_move((0, 0))
+        for name, score_fn in heuristics.SCORE_FUNCTIONS.items():
+            self.assertIsInstance(score_fn(game, "p1"), float, name)
+        # every score function of the module can be picked by name
+        registered = list(heuristics.SCORE_FUNCTIONS.values())
+        for name, value in vars(heuristics).items():
+            if "_score" in name and callable(value):
+                self.assertIn(value, registered, name)
+
+
+if __name__ == '__main__':
+    unittest.main()
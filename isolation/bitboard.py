@@ -0,0 +1,158 @@
+"""
+Precomputed knight-move tables for bitmask representations of the board.
+
+A set of cells is encoded as an integer in which bit `col * height + row`
+stands for the cell (row, col). Iterating the set bits in ascending order
+therefore visits cells in the same column-major order as
+`Board.get_blank_spaces()`.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+DIRECTIONS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+              (1, -2),  (1, 2), (2, -1),  (2, 1)]
+
+KnightTables = namedtuple("KnightTables", ["width", "height", "cells", "index",
+                                           "neighbors", "neighbor_masks", "full_mask",
+                                           "light_mask", "shifts"])
+KnightTables.__doc__ = """
+Knight-move tables for one board size.
+
+cells : list<(int, int)>
+    The (row, col) pair of every bit index.
+
+index : dict<(int, int), int>
+    The bit index of every (row, col) pair.
+
+neighbors : list<tuple<int>>
+    Bit indices reachable with one knight move from every bit index.
+
+neighbor_masks : list<int>
+    The same neighbors as a bitmask, for every bit index.
+
+full_mask : int
+    Bitmask with every cell of the board set.
+
+light_mask : int
+    Bitmask of the cells with an even row + col; a knight move always goes
+    from a light cell to a dark one or back.
+
+shifts : list<(int, int)>
+    For every knight move direction, the change of bit index and the
+    bitmask of the cells from which the move stays on the board, so that
+    the cells reachable from a whole set are found with eight shifts (see
+    `knight_spread()`).
+"""
+
+
+@lru_cache(maxsize=None)
+def knight_tables(width, height):
+    """Return the `KnightTables` for a board of the given size."""
+    cells = [(r, c) for c in range(width) for r in range(height)]
+    index = {cell: i for i, cell in enumerate(cells)}
+    neighbors = []
+    for r, c in cells:
+        neighbors.append(tuple(index[(r + dr, c + dc)] for dr, dc in DIRECTIONS
+                               if 0 <= r + dr < height and 0 <= c + dc < width))
+    neighbor_masks = [sum(1 << n for n in nbrs) for nbrs in neighbors]
+    light_mask = sum(1 << i for i, (r, c) in enumerate(cells) if (r + c) % 2 == 0)
+    shifts = [(dc * height + dr,
+               sum(1 << index[(r, c)] for r, c in cells
+                   if 0 <= r + dr < height and 0 <= c + dc < width))
+              for dr, dc in DIRECTIONS]
+    return KnightTables(width, height, cells, index, neighbors, neighbor_masks,
+                        (1 << len(cells)) - 1, light_mask, shifts)
+
+
+def iter_bits(mask):
+    """Yield the indices of the set bits of `mask` in ascending order."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def popcount(mask):
+    """Return the number of set bits of `mask`."""
+    return bin(mask).count("1")
+
+
+def knight_spread(shifts, mask):
+    """Return the bitmask of the cells one knight move away from any cell of
+    `mask`, using the `shifts` of `KnightTables`."""
+    spread = 0
+    for shift, sources in shifts:
+        if shift >= 0:
+            spread |= (mask & sources) << shift
+        else:
+            spread |= (mask & sources) >> -shift
+    return spread
+
+
+def reachable(neighbor_masks, blanks, cell, limit=None):
+    """Return the bitmask of the cells of `blanks` a knight standing on
+    `cell` can reach (without passing through any other cell). With
+    `limit`, the search stops as soon as more than `limit` cells are found
+    and returns None.
+    """
+    region = 0
+    frontier = neighbor_masks[cell] & blanks
+    while frontier:
+        region |= frontier
+        if limit is not None and popcount(region) > limit:
+            return None
+        grown = 0
+        for i in iter_bits(frontier):
+            grown |= neighbor_masks[i]
+        frontier = grown & blanks & ~region
+    return region
+
+
+def greedy_path(neighbor_masks, blanks, cell):
+    """Return a knight path from `cell` through `blanks` as a list of bit
+    indices, always stepping to the cell with the fewest onward moves
+    (Warnsdorff's rule). Its length is a lower bound on the longest path.
+    """
+    path = []
+    options = neighbor_masks[cell] & blanks
+    while options:
+        best, best_count = None, None
+        for i in iter_bits(options):
+            count = popcount(neighbor_masks[i] & blanks)
+            if best is None or count < best_count:
+                best, best_count = i, count
+        path.append(best)
+        blanks &= ~(1 << best)
+        options = neighbor_masks[best] & blanks
+    return path
+
+
+def path_upper_bound(tables, blanks, cell, region=None):
+    """Return an upper bound on the number of moves of a knight path from
+    `cell` through `blanks`.
+
+    The path stays in the region reachable from `cell` (`region`, computed
+    when not given) and alternates between light and dark cells, so it
+    uses as many cells of the colour of its first step as of the other
+    colour, or one more. A region cell with at most one neighbor
+    in the region or at `cell` can only end the path, so all such dead
+    ends but one are left out.
+    """
+    masks = tables.neighbor_masks
+    if region is None:
+        region = reachable(masks, blanks, cell)
+    size = popcount(region)
+    if tables.light_mask >> cell & 1:
+        first = region & ~tables.light_mask
+    else:
+        first = region & tables.light_mask
+    a = popcount(first)
+    b = size - a
+    parity = 2 * b + 1 if a > b else 2 * a
+    around = region | 1 << cell
+    dead_ends = 0
+    for i in iter_bits(region):
+        if popcount(masks[i] & around) <= 1:
+            dead_ends += 1
+    return min(parity, size - max(0, dead_ends - 1))
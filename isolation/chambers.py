@@ -0,0 +1,122 @@
+"""
+Articulation points and chambers of the knight graph of the blank cells.
+
+Late in a game the blank cells a player can reach often form chambers (the
+biconnected components of the knight graph) joined by single cells, the
+articulation points. A knight path that leaves a chamber through an
+articulation point can never come back, so the cells a player can still
+visit are bounded by the largest sum of chamber sizes along one branch of
+the tree of chambers, which is often much smaller than the whole region.
+
+Cells are bit indices and sets of cells bitmasks in the layout of
+`isolation.bitboard`.
+"""
+
+from collections import namedtuple
+
+from .bitboard import iter_bits
+from .bitboard import popcount
+from .bitboard import reachable
+
+Chambers = namedtuple("Chambers", ["cell", "region", "articulation", "blocks"])
+Chambers.__doc__ = """
+Chamber decomposition of the cells reachable from one cell.
+
+cell : int
+    The cell the analysis starts from (e.g. a player's location).
+
+region : int
+    Bitmask of the blank cells reachable from `cell`.
+
+articulation : int
+    Bitmask of the cells of `region` and `cell` whose removal disconnects
+    the others.
+
+blocks : list<int>
+    The chambers (biconnected components) of the knight graph on
+    `region` and `cell`, as bitmasks. Neighboring chambers share an
+    articulation point.
+"""
+
+
+def find_chambers(neighbor_masks, blanks, cell):
+    """Return the `Chambers` of the blank cells reachable from `cell`.
+
+    Uses Tarjan's depth-first search for biconnected components, without
+    recursion so that large regions do not hit the recursion limit.
+    """
+    region = reachable(neighbor_masks, blanks, cell)
+    nodes = region | 1 << cell
+    disc, low = {cell: 0}, {cell: 0}
+    articulation, blocks = 0, []
+    root_children = 0
+    visited = [cell]
+    # (vertex, parent, neighbors left to visit)
+    stack = [(cell, -1, neighbor_masks[cell] & nodes)]
+    while stack:
+        u, parent, pending = stack[-1]
+        if pending:
+            low_bit = pending & -pending
+            stack[-1] = (u, parent, pending ^ low_bit)
+            v = low_bit.bit_length() - 1
+            if v not in disc:
+                disc[v] = low[v] = len(disc)
+                visited.append(v)
+                stack.append((v, u, neighbor_masks[v] & nodes))
+            elif v != parent and disc[v] < low[u]:
+                low[u] = disc[v]
+            continue
+        stack.pop()
+        if parent < 0:
+            continue
+        if low[u] < low[parent]:
+            low[parent] = low[u]
+        if low[u] >= disc[parent]:
+            # u's subtree (the vertices visited since u) and the parent form
+            # a chamber
+            block = 1 << parent
+            while True:
+                w = visited.pop()
+                block |= 1 << w
+                if w == u:
+                    break
+            blocks.append(block)
+            if parent == cell:
+                root_children += 1
+            else:
+                articulation |= 1 << parent
+    if root_children > 1:
+        articulation |= 1 << cell
+    return Chambers(cell, region, articulation, blocks)
+
+
+def chamber_bound(chambers):
+    """Return an upper bound on the number of moves of a knight path from
+    the starting cell of a `Chambers`: the path enters each chamber through
+    one articulation point and visits at most its other cells before it
+    leaves through another one, never to return.
+    """
+    if not chambers.blocks:
+        return 0
+    blocks_at = {}
+    for block in chambers.blocks:
+        for cut in iter_bits(block & chambers.articulation):
+            blocks_at.setdefault(cut, []).append(block)
+
+    def value(block, entry):
+        best = 0
+        for cut in iter_bits(block & chambers.articulation & ~(1 << entry)):
+            for child in blocks_at[cut]:
+                if child != block:
+                    best = max(best, value(child, cut))
+        return popcount(block) - 1 + best
+
+    return max(value(block, chambers.cell) for block in chambers.blocks
+               if block >> chambers.cell & 1)
+
+
+def chamber_sizes(chambers):
+    """Return the number of cells of the chambers that contain the starting
+    cell, largest first, not counting the starting cell."""
+    return sorted((popcount(block) - 1 for block in chambers.blocks
+                   if block >> chambers.cell & 1), reverse=True)
@@ -10,9 +10,17 @@ be available to project reviewers.
 
 import timeit
 
-from copy import deepcopy
 from copy import copy
 
+from .bitboard import greedy_path
+from .bitboard import iter_bits
+from .bitboard import knight_tables
+from .bitboard import path_upper_bound
+from .bitboard import popcount
+from .bitboard import reachable
+from .chambers import chamber_bound
+from .chambers import find_chambers
+
 
 TIME_LIMIT_MILLIS = 200
 
@@ -52,6 +60,29 @@ class Board(object):
         self.__board_state__ = [[Board.BLANK for i in range(width)] for j in range(height)]
         self.__last_player_move__ = {player_1: Board.NOT_MOVED, player_2: Board.NOT_MOVED}
         self.__player_symbols__ = {Board.BLANK: Board.BLANK, player_1: 1, player_2: 2}
+        # blank cells as a bitmask (see isolation.bitboard) and their count,
+        # maintained by apply_move(); __synced_state__ is the grid they were
+        # computed from, so a grid assigned from outside triggers a rebuild
+        self.__tables__ = knight_tables(width, height)
+        self.__blank_mask__ = self.__tables__.full_mask
+        self.__blank_count__ = width * height
+        self.__synced_state__ = self.__board_state__
+        self.__synced_locations__ = self.__last_player_move__
+        # number of blank knight neighbors of every cell (by bit index), so
+        # that the mobility of a player is a lookup at its location; updated
+        # for the at most 8 neighbors of every move
+        self.__open_counts__ = [len(n) for n in self.__tables__.neighbors]
+        # (move, previous location of the mover, previous grid value) of the
+        # moves applied since the board was created or copied, for undo_move()
+        self.__history__ = []
+        # facts derived from the current position, computed on first use and
+        # discarded by apply_move(): legal moves and utility per player,
+        # whether the game is over (None while unknown) and the region of
+        # blank cells each player can reach (None while unknown)
+        self.__moves_cache__ = {}
+        self.__utility_cache__ = {}
+        self.__terminal__ = None
+        self.__regions__ = None
 
     @property
     def active_player(self):
@@ -93,15 +124,64 @@ class Board(object):
 
     def copy(self):
         """ Return a deep copy of the current board. """
-        new_board = Board(self.__player_1__, self.__player_2__, width=self.width, height=self.height)
+        self.__sync__()
+        new_board = Board.__new__(Board)
+        new_board.width = self.width
+        new_board.height = self.height
         new_board.move_count = self.move_count
+        new_board.__player_1__ = self.__player_1__
+        new_board.__player_2__ = self.__player_2__
         new_board.__active_player__ = self.__active_player__
         new_board.__inactive_player__ = self.__inactive_player__
         new_board.__last_player_move__ = copy(self.__last_player_move__)
         new_board.__player_symbols__ = copy(self.__player_symbols__)
-        new_board.__board_state__ = deepcopy(self.__board_state__)
+        # rows hold immutable ints, so copying each row is a deep copy
+        new_board.__board_state__ = [row[:] for row in self.__board_state__]
+        new_board.__tables__ = self.__tables__
+        new_board.__blank_mask__ = self.__blank_mask__
+        new_board.__blank_count__ = self.__blank_count__
+        new_board.__synced_state__ = new_board.__board_state__
+        new_board.__synced_locations__ = new_board.__last_player_move__
+        new_board.__open_counts__ = self.__open_counts__[:]
+        new_board.__history__ = []
+        # each copy owns its move lists: a caller modifying the list of one
+        # board must not change the legal moves of another
+        new_board.__moves_cache__ = {player: moves[:] for player, moves in self.__moves_cache__.items()}
+        new_board.__utility_cache__ = copy(self.__utility_cache__)
+        new_board.__terminal__ = self.__terminal__
+        new_board.__regions__ = self.__regions__
         return new_board
 
+    def __sync__(self):
+        """
+        Rebuild the incrementally maintained state if the grid or the player
+        locations were replaced from outside the class (e.g. by a subclass
+        copying the board).
+        """
+        if self.__synced_state__ is self.__board_state__ and \
+                self.__synced_locations__ is self.__last_player_move__:
+            return
+        self.__moves_cache__ = {}
+        self.__utility_cache__ = {}
+        self.__terminal__ = None
+        self.__regions__ = None
+        self.__synced_locations__ = self.__last_player_move__
+        state = self.__board_state__
+        mask = 0
+        for i, (r, c) in enumerate(self.__tables__.cells):
+            if state[r][c] == Board.BLANK:
+                mask |= 1 << i
+        self.__blank_mask__ = mask
+        self.__blank_count__ = bin(mask).count("1")
+        neighbors = self.__tables__.neighbors
+        counts = [len(n) for n in neighbors]
+        for i in iter_bits(self.__tables__.full_mask & ~mask):
+            for j in neighbors[i]:
+                counts[j] -= 1
+        self.__open_counts__ = counts
+        self.__history__ = []
+        self.__synced_state__ = state
+
     def forecast_move(self, move):
         """
         Return a deep copy of the current game with an input move applied to
@@ -146,8 +226,46 @@ class Board(object):
         """
         Return a list of the locations that are still available on the board.
         """
-        return [(i, j) for j in range(self.width) for i in range(self.height)
-            if self.__board_state__[i][j] == Board.BLANK]
+        return list(self.iter_blanks())
+
+    def iter_blanks(self):
+        """
+        Iterate over the locations that are still available on the board, in
+        the same (column-major) order as get_blank_spaces(), without scanning
+        the grid.
+        """
+        self.__sync__()
+        cells = self.__tables__.cells
+        return (cells[i] for i in iter_bits(self.__blank_mask__))
+
+    def blank_count(self):
+        """
+        Return the number of locations that are still available on the board
+        in constant time.
+        """
+        self.__sync__()
+        return self.__blank_count__
+
+    def blank_mask(self):
+        """
+        Return the locations that are still available on the board as a
+        bitmask (see `isolation.bitboard` for the bit layout).
+        """
+        self.__sync__()
+        return self.__blank_mask__
+
+    def hash_key(self):
+        """
+        Return a hashable key identifying the current position: the blank
+        cells, the player locations and the player holding initiative. Two
+        boards of the same game with equal keys have the same legal moves and
+        outcome.
+        """
+        self.__sync__()
+        return (self.__blank_mask__,
+                self.__last_player_move__[self.__active_player__],
+                self.__last_player_move__[self.__inactive_player__],
+                self.__active_player__ is self.__player_1__)
 
     def get_player_location(self, player):
         """
@@ -179,11 +297,100 @@ class Board(object):
         ----------
         list<(int, int)>
             The list of coordinate pairs (row, column) of all legal moves
-            for the player constrained by the current game state.
+            for the player constrained by the current game state. The list
+            is cached until the next move is applied, so callers must not
+            modify it.
         """
         if player is None:
-            player = self.active_player
-        return self.__get_moves__(self.__last_player_move__[player])
+            player = self.__active_player__
+        self.__sync__()
+        moves = self.__moves_cache__.get(player)
+        if moves is None:
+            moves = self.__get_moves__(self.__last_player_move__[player])
+            self.__moves_cache__[player] = moves
+        return moves
+
+    def is_terminal(self):
+        """
+        Test whether the game is over, i.e. the active player has no legal
+        moves. The answer is cached until the next move is applied.
+        """
+        self.__sync__()
+        if self.__terminal__ is None:
+            self.__terminal__ = self.mobility(self.__active_player__) == 0
+        return self.__terminal__
+
+    def __player_regions__(self):
+        """
+        Return the bitmask of the blank cells each player can reach, as a
+        dict keyed by player (every blank cell for a player that has not
+        moved yet). Cached until the next move is applied.
+        """
+        self.__sync__()
+        if self.__regions__ is None:
+            tables, blanks = self.__tables__, self.__blank_mask__
+            regions = {}
+            for player, loc in self.__last_player_move__.items():
+                if loc is Board.NOT_MOVED:
+                    regions[player] = blanks
+                else:
+                    regions[player] = reachable(tables.neighbor_masks, blanks, tables.index[loc])
+            self.__regions__ = regions
+        return self.__regions__
+
+    def is_separated(self):
+        """
+        Test whether both players have moved and no blank cell can be reached
+        by both of them, so that neither can take a cell from the other for
+        the rest of the game.
+        """
+        if Board.NOT_MOVED in self.__last_player_move__.values():
+            return False
+        regions = self.__player_regions__()
+        return not regions[self.__player_1__] & regions[self.__player_2__]
+
+    def move_bounds(self, player):
+        """
+        Return bounds on the number of moves the specified player can still
+        make before getting stuck, whatever its opponent does.
+
+        The upper bound counts the cells the player can reach, reduced by
+        the alternation of light and dark cells along a knight path and by
+        the dead ends of the region (see `bitboard.path_upper_bound`), or
+        by the chambers the path must choose between at articulation points
+        (see `chambers.chamber_bound`), whichever is smaller. Once
+        the players are separated the lower bound is the length of a greedy
+        path through the region; before that the opponent may cut the
+        player off, and the lower bound is 1 only when the player is sure
+        to make its next move.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        ----------
+        (int, int)
+            The lower and upper bounds.
+        """
+        region = self.__player_regions__()[player]
+        loc = self.__last_player_move__[player]
+        if loc is Board.NOT_MOVED:
+            upper = popcount(region)
+        else:
+            cell = self.__tables__.index[loc]
+            masks = self.__tables__.neighbor_masks
+            upper = min(path_upper_bound(self.__tables__, self.__blank_mask__, cell, region),
+                        chamber_bound(find_chambers(masks, self.__blank_mask__, cell)))
+            if self.is_separated():
+                lower = len(greedy_path(masks, self.__blank_mask__, cell))
+                return lower, upper
+        # the active player moves next; the waiting one loses at most one of
+        # its moves to the opponent's next move
+        moves = len(self.get_legal_moves(player))
+        lower = 1 if moves > (0 if player is self.__active_player__ else 1) else 0
+        return lower, upper
 
     def apply_move(self, move):
         """
@@ -199,19 +406,75 @@ class Board(object):
         ----------
         None
         """
+        self.__sync__()
         row, col = move
+        self.__history__.append((move, self.__last_player_move__[self.active_player],
+                                 self.__board_state__[row][col]))
         self.__last_player_move__[self.active_player] = move
         self.__board_state__[row][col] = self.__player_symbols__[self.active_player]
+        index = col * self.height + row
+        bit = 1 << index
+        if self.__blank_mask__ & bit:
+            self.__blank_mask__ ^= bit
+            self.__blank_count__ -= 1
+            counts = self.__open_counts__
+            for i in self.__tables__.neighbors[index]:
+                counts[i] -= 1
+        self.__moves_cache__ = {}
+        self.__utility_cache__ = {}
+        self.__terminal__ = None
+        self.__regions__ = None
         self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
         self.move_count += 1
 
+    def undo_move(self):
+        """
+        Take back the last move applied to this board with apply_move(),
+        restoring the position before it. Moves applied before the board
+        was copied (e.g. by forecast_move()) cannot be taken back.
+        """
+        self.__sync__()
+        if not self.__history__:
+            raise RuntimeError("No move to undo")
+        move, previous, value = self.__history__.pop()
+        self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
+        self.move_count -= 1
+        row, col = move
+        self.__last_player_move__[self.__active_player__] = previous
+        self.__board_state__[row][col] = value
+        index = col * self.height + row
+        if value == Board.BLANK:
+            self.__blank_mask__ |= 1 << index
+            self.__blank_count__ += 1
+            counts = self.__open_counts__
+            for i in self.__tables__.neighbors[index]:
+                counts[i] += 1
+        self.__moves_cache__ = {}
+        self.__utility_cache__ = {}
+        self.__terminal__ = None
+        self.__regions__ = None
+
+    def mobility(self, player=None):
+        """
+        Return the number of legal moves of the specified player (the active
+        player if None) in constant time; equal to
+        len(get_legal_moves(player)).
+        """
+        if player is None:
+            player = self.__active_player__
+        self.__sync__()
+        loc = self.__last_player_move__[player]
+        if loc is Board.NOT_MOVED:
+            return self.__blank_count__
+        return self.__open_counts__[loc[1] * self.height + loc[0]]
+
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
-        return player == self.inactive_player and not self.get_legal_moves(self.active_player)
+        return player == self.inactive_player and self.is_terminal()
 
     def is_loser(self, player):
         """ Test whether the specified player has lost the game. """
-        return player == self.active_player and not self.get_legal_moves(self.active_player)
+        return player == self.active_player and self.is_terminal()
 
     def utility(self, player):
         """
@@ -237,15 +500,20 @@ class Board(object):
             otherwise.
         """
 
-        if not self.get_legal_moves(self.active_player):
+        self.__sync__()
+        value = self.__utility_cache__.get(player)
+        if value is None:
+            value = 0.
+            if self.is_terminal():
 
-            if player == self.inactive_player:
-                return float("inf")
+                if player == self.inactive_player:
+                    value = float("inf")
 
-            if player == self.active_player:
-                return float("-inf")
+                elif player == self.active_player:
+                    value = float("-inf")
 
-        return 0.
+            self.__utility_cache__[player] = value
+        return value
 
     def __get_moves__(self, move):
         """
@@ -319,17 +587,20 @@ class Board(object):
         """
         move_history = []
 
-        curr_time_millis = lambda: 1000 * timeit.default_timer()
+        timer = timeit.default_timer
 
         while True:
 
             legal_player_moves = self.get_legal_moves()
 
+            # the agent gets lists of its own, so it cannot change the moves
+            # its answer is checked against
             game_copy = self.copy()
 
-            move_start = curr_time_millis()
-            time_left = lambda : time_limit - (curr_time_millis() - move_start)
-            curr_move = self.active_player.get_move(game_copy, legal_player_moves, time_left)
+            # single closure over the deadline; agents may call this often
+            deadline = 1000 * timer() + time_limit
+            time_left = lambda: deadline - 1000 * timer()
+            curr_move = self.active_player.get_move(game_copy, legal_player_moves[:], time_left)
             move_end = time_left()
 
             # print move_end
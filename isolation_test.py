@@ -0,0 +1,215 @@
+"""
+Test cases for the incrementally maintained state of `isolation.Board`.
+"""
+import random
+import unittest
+
+from copy import copy
+from copy import deepcopy
+
+import isolation
+import isolation.bitboard
+import isolation.chambers
+
+
+def scan_blanks(board):
+    """Reference implementation: scan the grid for blank cells."""
+    return [(i, j) for j in range(board.width) for i in range(board.height)
+            if board.__board_state__[i][j] == isolation.Board.BLANK]
+
+
+def random_board(seed, plies, width=7, height=7):
+    """Play `plies` random moves (or until the game ends) on a new board."""
+    rng = random.Random(seed)
+    board = isolation.Board("p1", "p2", width, height)
+    for _ in range(plies):
+        moves = board.get_legal_moves()
+        if not moves:
+            break
+        board.apply_move(rng.choice(moves))
+    return board
+
+
+def longest_path(board, player):
+    """Reference implementation: exhaustive search of the longest knight
+    path of a player through the blank cells."""
+    def search(loc, blanks):
+        best = 0
+        for dr, dc in isolation.bitboard.DIRECTIONS:
+            step = (loc[0] + dr, loc[1] + dc)
+            if step in blanks:
+                best = max(best, 1 + search(step, blanks - {step}))
+        return best
+    return search(board.get_player_location(player), set(board.get_blank_spaces()))
+
+
+class BoardStateTest(unittest.TestCase):
+
+    def test_blanks_follow_moves(self):
+        """ blank_count(), iter_blanks() and get_blank_spaces() agree with a
+        scan of the grid after every move, on square and rectangular boards """
+        for width, height in ((7, 7), (5, 8)):
+            board = isolation.Board("p1", "p2", width, height)
+            rng = random.Random(width)
+            while True:
+                expected = scan_blanks(board)
+                self.assertEqual(board.get_blank_spaces(), expected)
+                self.assertEqual(list(board.iter_blanks()), expected)
+                self.assertEqual(board.blank_count(), len(expected))
+                moves = board.get_legal_moves()
+                if not moves:
+                    break
+                board.apply_move(rng.choice(moves))
+
+    def test_copy_is_independent(self):
+        """ Moves applied to a copy do not leak into the original """
+        board = random_board(1, 6)
+        count = board.blank_count()
+        child = board.forecast_move(board.get_legal_moves()[0])
+        self.assertEqual(board.blank_count(), count)
+        self.assertEqual(child.blank_count(), count - 1)
+        self.assertEqual(board.get_blank_spaces(), scan_blanks(board))
+
+    def test_agents_cannot_change_legal_moves(self):
+        """ A move an agent adds to its move lists is still illegal """
+        class Cheater:
+            def get_move(self, game, legal_moves, time_left):
+                legal_moves.append((9, 9))
+                game.get_legal_moves().append((9, 9))
+                return (9, 9)
+
+        cheater = Cheater()
+        board = isolation.Board(cheater, "p2")
+        board.get_legal_moves()
+        winner, _, reason = board.play()
+        self.assertEqual(winner, "p2")
+        self.assertEqual(reason, "illegal move")
+        self.assertNotIn((9, 9), board.copy().get_legal_moves(cheater))
+
+    def test_replaced_grid_is_resynchronized(self):
+        """ Subclasses that copy the grid by hand (like the CounterBoard in
+        agent_test.py) still get consistent blank counts """
+        board = random_board(2, 10)
+        other = isolation.Board("p1", "p2")
+        other.__board_state__ = deepcopy(board.__board_state__)
+        other.__last_player_move__ = copy(board.__last_player_move__)
+        self.assertEqual(other.blank_count(), board.blank_count())
+        self.assertEqual(other.get_blank_spaces(), board.get_blank_spaces())
+
+    def test_derived_facts_are_cached_per_position(self):
+        """ Legal moves, terminal flag and utility are computed once per
+        position and recomputed after a move """
+        board = random_board(3, 4)
+        moves = board.get_legal_moves()
+        self.assertIs(board.get_legal_moves(), moves)
+        self.assertIs(board.get_legal_moves(board.active_player), moves)
+
+        rng = random.Random(3)
+        while not board.is_terminal():
+            active, inactive = board.active_player, board.inactive_player
+            self.assertEqual(board.utility(active), 0.)
+            board.apply_move(rng.choice(board.get_legal_moves()))
+            location = board.get_player_location(inactive)
+            expected = [(location[0] + dr, location[1] + dc)
+                        for dr, dc in isolation.bitboard.DIRECTIONS
+                        if board.move_is_legal((location[0] + dr, location[1] + dc))]
+            self.assertEqual(board.get_legal_moves(), expected)
+        self.assertEqual(board.utility(board.active_player), float("-inf"))
+        self.assertEqual(board.utility(board.inactive_player), float("inf"))
+        self.assertTrue(board.is_loser(board.active_player))
+
+    def test_mobility_follows_moves_and_undo(self):
+        """ mobility() equals the number of legal moves after every move and
+        every undo, and undoing all moves restores the starting position """
+        for width, height in ((7, 7), (5, 8)):
+            board = isolation.Board("p1", "p2", width, height)
+            board.apply_move((0, 0))
+            start = (board.hash_key(), board.move_count, deepcopy(board.__board_state__))
+            rng = random.Random(width)
+            played = 0
+            while board.get_legal_moves():
+                board.apply_move(rng.choice(board.get_legal_moves()))
+                played += 1
+                for player in ("p1", "p2"):
+                    self.assertEqual(board.mobility(player), len(board.get_legal_moves(player)))
+            self.assertTrue(board.is_terminal())
+            for _ in range(played):
+                board.undo_move()
+                for player in ("p1", "p2"):
+                    self.assertEqual(board.mobility(player), len(board.get_legal_moves(player)))
+                self.assertEqual(board.get_blank_spaces(), scan_blanks(board))
+            self.assertEqual((board.hash_key(), board.move_count, board.__board_state__), start)
+            board.undo_move()
+            self.assertEqual(board.mobility("p1"), width * height)
+            with self.assertRaises(RuntimeError):
+                board.undo_move()
+
+        # a copy starts a new history, and a replaced grid is recounted
+        board = random_board(4, 10)
+        child = board.forecast_move(board.get_legal_moves()[0])
+        child.undo_move()
+        with self.assertRaises(RuntimeError):
+            child.undo_move()
+        other = isolation.Board("p1", "p2")
+        other.__board_state__ = deepcopy(child.__board_state__)
+        other.__last_player_move__ = copy(child.__last_player_move__)
+        for player in ("p1", "p2"):
+            self.assertEqual(other.mobility(player), len(child.get_legal_moves(player)))
+
+    def test_move_bounds_contain_longest_path(self):
+        """ The upper bound is never below the longest path, and once the
+        players are separated the lower bound is a path that exists """
+        separated = 0
+        for seed in range(200):
+            board = random_board(seed, 12, 5, 5)
+            if board.is_terminal():
+                continue
+            separated += board.is_separated()
+            for player in (board.active_player, board.inactive_player):
+                lower, upper = board.move_bounds(player)
+                exact = longest_path(board, player)
+                self.assertLessEqual(upper, board.blank_count())
+                self.assertLessEqual(lower, exact)
+                self.assertLessEqual(exact, upper)
+                if board.is_separated() and exact:
+                    self.assertGreaterEqual(lower, 1)
+        self.assertGreater(separated, 0)
+        board = isolation.Board("p1", "p2", 5, 5)
+        self.assertFalse(board.is_separated())
+        self.assertEqual(board.move_bounds("p1"), (1, 25))
+
+    def test_chambers_match_brute_force(self):
+        """ Articulation points are exactly the cells whose removal
+        disconnects the region, and the chamber bound is never below the
+        longest path """
+        tables = isolation.bitboard.knight_tables(5, 5)
+        masks = tables.neighbor_masks
+
+        def connected(nodes):
+            start = nodes & -nodes
+            seen = isolation.bitboard.reachable(masks, nodes, start.bit_length() - 1) | start
+            return seen == nodes
+
+        rng = random.Random(0)
+        for _ in range(300):
+            cell = rng.randrange(25)
+            blanks = rng.getrandbits(25) & ~(1 << cell)
+            chambers = isolation.chambers.find_chambers(masks, blanks, cell)
+            nodes = chambers.region | 1 << cell
+            expected = 0
+            if isolation.bitboard.popcount(nodes) > 2:
+                for i in isolation.bitboard.iter_bits(nodes):
+                    if not connected(nodes & ~(1 << i)):
+                        expected |= 1 << i
+            self.assertEqual(chambers.articulation, expected)
+            if isolation.bitboard.popcount(chambers.region) <= 12:
+                board = isolation.Board("p1", "p2", 5, 5)
+                board.__board_state__ = [[isolation.Board.BLANK if blanks >> tables.index[(r, c)] & 1
+                                          else 2 for c in range(5)] for r in range(5)]
+                board.__last_player_move__ = {"p1": tables.cells[cell], "p2": None}
+                self.assertLessEqual(longest_path(board, "p1"),
+                                     isolation.chambers.chamber_bound(chambers))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,372 @@
+"""
+Learned evaluator: a small NumPy network fitted to self-play outcomes.
+
+The input of a position, seen from the player to move, is three board
+planes (blank cells, the cell of the player to move, the cell of the other
+player) followed by the mobility features of `tuning.FEATURES` (without
+the bias). A stack of ReLU layers (none for a linear model) maps it to the
+logit of the player to move winning.
+
+`train()` fits the network to a corpus written by `tuning.py generate`,
+optionally augmented with the board symmetries, by minibatch Adam on the
+log-loss. An `Evaluator` holds the fitted weights: it stores them in and
+loads them from a small `.npz` file, evaluates a batch of corpus-format
+positions in a few matrix products, and scores a single `Board` through a
+path that skips the batch bookkeeping. The input standardization is folded
+into the first layer when the weights are loaded.
+
+An evaluator is tied to the board size it was trained on.
+
+Example:
+
+    python tuning.py generate --games 500 --out corpus.npz
+    python learned_eval.py corpus.npz --hidden 32 --out evaluator.npz
+    python profiler.py --evaluator evaluator.npz --heuristics custom learned
+
+    from learned_eval import Evaluator
+    agent = CustomPlayer(score_fn=Evaluator.load("evaluator.npz").score_function())
+"""
+
+import argparse
+import hashlib
+
+import numpy as np
+
+from isolation.bitboard import knight_tables
+from openings import board_symmetries
+from tuning import FEATURES
+from tuning import extract_features
+from tuning import fit_weights
+from tuning import load_corpus
+
+PLANES = ("blank", "own", "opponent")
+MOBILITY = FEATURES[1:]
+
+
+def input_features(blanks, locs):
+    """Compute the network input for a batch of positions.
+
+    Parameters
+    ----------
+    blanks : numpy.ndarray
+        (N, height, width) boolean array of blank cells.
+
+    locs : numpy.ndarray
+        (N, 2, 2) integer array with the locations of the player to move
+        and of the other player; (-1, -1) for a player that has not moved
+        yet, who may move to any blank cell.
+
+    Returns
+    ----------
+    numpy.ndarray
+        (N, 3 * height * width + len(MOBILITY)) float array: the `PLANES`
+        in row-major order, then the `MOBILITY` features.
+    """
+    n, height, width = blanks.shape
+    cells = height * width
+    locs = np.asarray(locs, dtype=np.intp)
+    placed = locs[:, :, 0] >= 0
+    rows = np.arange(n)
+
+    x = np.zeros((n, 3 * cells + len(MOBILITY)))
+    x[:, :cells] = blanks.reshape(n, cells)
+    for k in range(2):
+        flat = locs[placed[:, k], k, 0] * width + locs[placed[:, k], k, 1]
+        x[rows[placed[:, k]], (k + 1) * cells + flat] = 1.
+
+    # mobility of placed players, patched for the players that have not moved
+    mobility = extract_features(blanks, np.maximum(locs, 0))[:, 1:4]
+    own, opp, common = mobility.T
+    count = x[:, :cells].sum(axis=1)
+    own = np.where(placed[:, 0], own, count)
+    opp = np.where(placed[:, 1], opp, count)
+    common = np.where(~placed[:, 0], opp, np.where(~placed[:, 1], own, common))
+    free = count / cells
+    x[:, 3 * cells:] = np.column_stack([own, opp, common, free, own * free, opp * free])
+    return x
+
+
+def symmetric_images(blanks, locs, results, width, height):
+    """Return a corpus grown with the images of its positions under the
+    board symmetries (same outcomes)."""
+    all_blanks, all_locs = [], []
+    for transform in board_symmetries(width, height):
+        image = np.zeros((height, width, 2), dtype=np.intp)
+        for r in range(height):
+            for c in range(width):
+                image[r, c] = transform(r, c)
+        grids = np.empty_like(blanks)
+        grids[:, image[..., 0], image[..., 1]] = blanks
+        mapped = image[np.maximum(locs[..., 0], 0), np.maximum(locs[..., 1], 0)]
+        all_blanks.append(grids)
+        all_locs.append(np.where(locs[..., :1] >= 0, mapped, -1))
+    count = len(all_blanks)
+    return np.concatenate(all_blanks), np.concatenate(all_locs), np.tile(results, count)
+
+
+def _flush(array, tiny=1e-12):
+    """Return a float copy of an array with negligible entries set to 0."""
+    array = np.array(array, dtype=float)
+    array[np.abs(array) < tiny] = 0.
+    return array
+
+
+def _log_loss(logits, results):
+    """Mean negative log-likelihood of `results` given logits."""
+    return float(np.mean(np.logaddexp(0., logits) - results * logits))
+
+
+class Evaluator(object):
+    """
+    A fitted network.
+
+    Parameters
+    ----------
+    width, height : int
+        Dimensions of the boards the network evaluates.
+
+    layers : list<(numpy.ndarray, numpy.ndarray)>
+        Weights and biases of every layer; the last layer has one output.
+
+    mean, scale : numpy.ndarray
+        Standardization of the input: the network sees
+        (input_features() - mean) / scale.
+    """
+
+    def __init__(self, width, height, layers, mean, scale):
+        self.width = width
+        self.height = height
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        # weights of inputs that are constant in the corpus only decay during
+        # training and end up subnormal, which makes every product far slower
+        self.layers = [(_flush(w), _flush(b)) for w, b in layers]
+        # first layer applied to raw inputs
+        w, b = self.layers[0]
+        self._first = (w / self.scale[:, None], b - (self.mean / self.scale) @ w)
+
+        cells = width * height
+        tables = knight_tables(width, height)
+        # bit index (see isolation.bitboard) of every cell in row-major order
+        self._order = np.array([tables.index[(r, c)] for r in range(height)
+                                for c in range(width)], dtype=np.intp)
+        self._bytes = (cells + 7) // 8
+        self._cells = cells
+
+    @property
+    def hidden(self):
+        """Sizes of the hidden layers (empty for a linear model)."""
+        return tuple(len(b) for _, b in self.layers[:-1])
+
+    @property
+    def digest(self):
+        """Short hash of the weights, telling evaluators apart."""
+        sha = hashlib.sha1()
+        for array in [self.mean, self.scale] + [a for layer in self.layers for a in layer]:
+            sha.update(np.ascontiguousarray(array).tobytes())
+        return sha.hexdigest()[:12]
+
+    def save(self, path):
+        """Store the evaluator in a `.npz` file."""
+        arrays = {"size": np.array([self.width, self.height]),
+                  "mean": self.mean, "scale": self.scale}
+        for i, (w, b) in enumerate(self.layers):
+            arrays["w{}".format(i)] = w
+            arrays["b{}".format(i)] = b
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Load an evaluator stored with `save()`."""
+        with np.load(path) as data:
+            layers = []
+            while "w{}".format(len(layers)) in data:
+                i = len(layers)
+                layers.append((data["w{}".format(i)], data["b{}".format(i)]))
+            width, height = (int(x) for x in data["size"])
+            return cls(width, height, layers, data["mean"], data["scale"])
+
+    def _forward(self, x):
+        """Return the logits of raw input rows (or a single raw input)."""
+        w, b = self._first
+        for next_w, next_b in self.layers[1:]:
+            x = np.maximum(x @ w + b, 0.)
+            w, b = next_w, next_b
+        return x @ w + b
+
+    def evaluate(self, blanks, locs):
+        """Return the logits of the player to move winning for a batch of
+        positions in the format of `input_features()`."""
+        if blanks.shape[1:] != (self.height, self.width):
+            raise ValueError("The evaluator was trained on {}x{} boards".format(
+                self.width, self.height))
+        return self._forward(input_features(blanks, locs))[:, 0]
+
+    def board_input(self, game):
+        """Return the raw input of a `Board`, seen from the player to move;
+        equal to the `input_features()` row of the position."""
+        if (game.width, game.height) != (self.width, self.height):
+            raise ValueError("The evaluator was trained on {}x{} boards".format(
+                self.width, self.height))
+        cells = self._cells
+        x = np.zeros(3 * cells + len(MOBILITY))
+        bits = np.unpackbits(np.frombuffer(game.blank_mask().to_bytes(self._bytes, "little"),
+                                           dtype=np.uint8), bitorder="little")
+        x[:cells] = bits[self._order]
+        active, inactive = game.active_player, game.inactive_player
+        for k, player in enumerate((active, inactive)):
+            location = game.get_player_location(player)
+            if location is not None:
+                x[(k + 1) * cells + location[0] * self.width + location[1]] = 1.
+        own, opp = game.mobility(active), game.mobility(inactive)
+        opp_moves = game.get_legal_moves(inactive)
+        common = sum(1 for move in game.get_legal_moves(active) if move in opp_moves)
+        free = game.blank_count() / cells
+        x[3 * cells:] = (own, opp, common, free, own * free, opp * free)
+        return x
+
+    def score(self, game, player):
+        """Heuristic with the signature of `CustomPlayer.score`: the logit of
+        `player` winning (+inf or -inf once the game is decided)."""
+        utility = game.utility(player)
+        if utility != 0:
+            return utility
+        value = float(self._forward(self.board_input(game))[0])
+        return value if player == game.active_player else -value
+
+    def score_function(self):
+        """Return `score()` as a plain function named after the weights, so
+        that agents using different evaluators have different fingerprints."""
+        def score(game, player):
+            return self.score(game, player)
+        score.__name__ = score.__qualname__ = "learned_score_{}".format(self.digest)
+        return score
+
+
+def train(blanks, locs, results, hidden=(32,), epochs=30, batch_size=256,
+          learning_rate=3e-3, l2=1e-4, symmetries=True, seed=0):
+    """Fit an evaluator to a corpus.
+
+    Parameters
+    ----------
+    blanks, locs, results : numpy.ndarray
+        Positions and outcomes of a corpus (see `tuning.generate_corpus()`).
+
+    hidden : sequence<int> (optional)
+        Sizes of the hidden layers; empty for a linear model.
+
+    epochs : int (optional)
+        Passes over the (augmented) corpus.
+
+    batch_size : int (optional)
+        Positions per Adam step.
+
+    learning_rate : float (optional)
+        Adam step size.
+
+    l2 : float (optional)
+        Weight decay of the weight matrices.
+
+    symmetries : bool (optional)
+        Train on the images of the positions under the board symmetries too.
+
+    seed : int (optional)
+        Seed of the initialization and of the minibatch order.
+
+    Returns
+    ----------
+    `Evaluator`
+    """
+    _, height, width = blanks.shape
+    if symmetries:
+        blanks, locs, results = symmetric_images(blanks, locs, results, width, height)
+    x = input_features(blanks, locs)
+    mean = x.mean(axis=0)
+    scale = x.std(axis=0)
+    scale[scale == 0] = 1.
+    x = (x - mean) / scale
+
+    rng = np.random.default_rng(seed)
+    sizes = [x.shape[1]] + list(hidden) + [1]
+    params = []
+    for fan_in, fan_out in zip(sizes[:-1], sizes[1:]):
+        params += [rng.normal(0., np.sqrt(2. / fan_in), (fan_in, fan_out)), np.zeros(fan_out)]
+    moments = [np.zeros_like(p) for p in params]
+    squares = [np.zeros_like(p) for p in params]
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+
+    step = 0
+    for _ in range(epochs):
+        order = rng.permutation(len(x))
+        for start in range(0, len(x), batch_size):
+            batch = order[start:start + batch_size]
+            # forward, keeping the input of every layer
+            inputs = [x[batch]]
+            for i in range(0, len(params) - 2, 2):
+                inputs.append(np.maximum(inputs[-1] @ params[i] + params[i + 1], 0.))
+            logits = inputs[-1] @ params[-2] + params[-1]
+            # gradient of the mean log-loss, back through the layers
+            delta = (1. / (1. + np.exp(-logits[:, 0])) - results[batch])[:, None] / len(batch)
+            grads = [None] * len(params)
+            for i in range(len(params) - 2, -1, -2):
+                layer_input = inputs[i // 2]
+                grads[i] = layer_input.T @ delta + l2 * params[i]
+                grads[i + 1] = delta.sum(axis=0)
+                if i:
+                    delta = (delta @ params[i].T) * (layer_input > 0)
+            step += 1
+            for p, g, m, v in zip(params, grads, moments, squares):
+                m *= beta1
+                m += (1. - beta1) * g
+                v *= beta2
+                v += (1. - beta2) * g * g
+                p -= (learning_rate * (m / (1. - beta1 ** step))
+                      / (np.sqrt(v / (1. - beta2 ** step)) + eps))
+
+    layers = list(zip(params[::2], params[1::2]))
+    return Evaluator(width, height, layers, mean, scale)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("corpus", help="position corpus written by tuning.py")
+    parser.add_argument("--hidden", type=int, nargs="*", default=[32],
+                        help="hidden layer sizes (none for a linear model)")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--learning-rate", type=float, default=3e-3)
+    parser.add_argument("--l2", type=float, default=1e-4)
+    parser.add_argument("--no-symmetries", action="store_true")
+    parser.add_argument("--validation", type=float, default=0.1,
+                        help="share of the games held out")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="evaluator.npz")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    blanks, locs, results = corpus["blanks"], corpus["locs"], corpus["results"]
+    # whole games are held out: positions of one game share its outcome and
+    # neighboring plies are nearly identical
+    games = corpus["games"]
+    held_out = np.random.default_rng(args.seed).random(games.max() + 1)[games] < args.validation
+    evaluator = train(blanks[~held_out], locs[~held_out], results[~held_out], args.hidden,
+                      args.epochs, args.batch_size, args.learning_rate, args.l2,
+                      not args.no_symmetries, args.seed)
+    evaluator.save(args.out)
+
+    # the logistic model of tuning.py on the same split, for reference
+    features = extract_features(blanks, locs)
+    weights = fit_weights(features[~held_out], results[~held_out])
+    print("{:<12}{:>12}{:>12}{:>12}".format("model", "split", "log-loss", "accuracy"))
+    for name, logits in (("learned", evaluator.evaluate(blanks, locs)),
+                         ("tuning", features @ weights)):
+        for split, rows in (("train", ~held_out), ("validation", held_out)):
+            if rows.any():
+                print("{:<12}{:>12}{:>12.4f}{:>12.3f}".format(
+                    name, split, _log_loss(logits[rows], results[rows]),
+                    np.mean((logits[rows] > 0) == (results[rows] > 0.5))))
+    print("Stored the evaluator in {}".format(args.out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Test cases for the learned evaluator.
+"""
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+import learned_eval
+import tuning
+
+from isolation import Board
+
+
+def random_boards(count, width, height, seed):
+    """Boards after random moves, including positions in which a player
+    has not moved yet."""
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        game = Board("p1", "p2", width, height)
+        for _ in range(rng.randint(0, width * height)):
+            if not game.get_legal_moves():
+                break
+            game.apply_move(rng.choice(game.get_legal_moves()))
+        if game.get_legal_moves():
+            boards.append(game)
+    return boards
+
+
+def corpus_arrays(boards):
+    """Corpus-format blanks and locations of boards, seen from the player
+    to move."""
+    blanks = np.array([[[cell == Board.BLANK for cell in row] for row in game.__board_state__]
+                       for game in boards], dtype=bool)
+    locs = np.array([[game.get_player_location(p) or (-1, -1)
+                      for p in (game.active_player, game.inactive_player)]
+                     for game in boards])
+    return blanks, locs
+
+
+class LearnedEvaluatorTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        corpus = tuning.generate_corpus(4, width=5, height=5, seed=0)
+        cls.corpus = corpus
+        cls.evaluator = learned_eval.train(corpus["blanks"], corpus["locs"],
+                                           corpus["results"], hidden=(8,), epochs=3)
+
+    def test_board_input_matches_batch(self):
+        """ The single-board path computes the batch features, players that
+        have not moved included """
+        boards = random_boards(40, 5, 5, seed=1)
+        expected = learned_eval.input_features(*corpus_arrays(boards))
+        for game, row in zip(boards, expected):
+            np.testing.assert_allclose(self.evaluator.board_input(game), row)
+
+    def test_scores_match_batch(self):
+        """ Scores of single boards are the batch logits of the player to
+        move, negated for the other player """
+        boards = random_boards(20, 5, 5, seed=2)
+        logits = self.evaluator.evaluate(*corpus_arrays(boards))
+        for game, logit in zip(boards, logits):
+            self.assertAlmostEqual(self.evaluator.score(game, game.active_player), logit)
+            self.assertAlmostEqual(self.evaluator.score(game, game.inactive_player), -logit)
+        with self.assertRaises(ValueError):
+            self.evaluator.score(Board("p1", "p2"), "p1")
+
+    def test_save_and_load(self):
+        """ Stored weights evaluate the same, and name the score function """
+        path = os.path.join(tempfile.mkdtemp(), "evaluator.npz")
+        self.evaluator.save(path)
+        loaded = learned_eval.Evaluator.load(path)
+        self.assertEqual(loaded.hidden, (8,))
+        self.assertEqual(loaded.digest, self.evaluator.digest)
+        blanks, locs = self.corpus["blanks"], self.corpus["locs"]
+        np.testing.assert_allclose(loaded.evaluate(blanks, locs),
+                                   self.evaluator.evaluate(blanks, locs))
+        self.assertIn(loaded.digest, loaded.score_function().__qualname__)
+
+    def test_symmetric_images(self):
+        """ Symmetric images keep the mobility of the positions """
+        blanks, locs = self.corpus["blanks"][:10], self.corpus["locs"][:10]
+        images, image_locs, results = learned_eval.symmetric_images(
+            blanks, locs, self.corpus["results"][:10], 5, 5)
+        self.assertEqual(len(images), 80)
+        self.assertEqual(len(results), 80)
+        mobility = learned_eval.input_features(images, image_locs)[:, -len(learned_eval.MOBILITY):]
+        np.testing.assert_allclose(mobility, np.tile(mobility[:10], (8, 1)))
+        for grid, (active, inactive) in zip(images, image_locs):
+            self.assertFalse(grid[tuple(active)] or grid[tuple(inactive)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,308 @@
+"""
+Monte Carlo tree search agent for Isolation.
+
+`MCTSPlayer` grows a UCT search tree from the current position until the
+clock runs low (or a fixed number of playouts is done) and plays the most
+visited move. Positions inside the search are kept as a blank-cell bitmask
+and the bit indices of the two players (see `isolation.bitboard`), so random
+playouts only do integer arithmetic and never build `Board` objects.
+
+Optionally the tree uses rapid action value estimation (RAVE): every move a
+player makes later in a simulation also counts as an "all moves as first"
+sample for the same move at earlier nodes. Since a cell can be visited only
+once per game, the moves of each player in a simulation are a bitmask.
+
+The subtree under the position reached after the agent's move and the
+opponent's reply is kept for the next call to `get_move()`.
+
+Example (as an extra agent in tournament.py):
+
+    python tournament.py --mcts
+"""
+
+import gc
+import math
+import random
+
+from isolation.bitboard import knight_tables
+from isolation.bitboard import popcount
+
+NOT_MOVED = -1  # bit index of a player that has not been placed yet
+
+
+class _Node(object):
+    """
+    A position in the search tree, reached by `move` (a bit index) from its
+    parent. `wins` and `amaf_wins` count the simulations won by the player
+    who made `move` (fractions of a win for batch-evaluated leaves). Nodes
+    do not point back to their parent, so trees hold no reference cycles
+    and are freed as soon as they are dropped.
+    """
+    __slots__ = ("move", "children", "untried",
+                 "visits", "wins", "amaf_visits", "amaf_wins")
+
+    def __init__(self, move, untried):
+        self.move = move
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0
+        self.amaf_visits = 0
+        self.amaf_wins = 0
+
+
+class MCTSPlayer(object):
+    """Game-playing agent that chooses a move with Monte Carlo tree search.
+
+    Parameters
+    ----------
+    exploration : float (optional)
+        UCT exploration constant.
+
+    rave_equivalence : float (optional)
+        Number of visits at which the tree statistics and the RAVE
+        statistics of a move get the same weight. None disables RAVE.
+
+    playout_limit : int (optional)
+        Number of simulations per move. When set the search ignores the
+        clock; the limit must be small enough for the search to finish
+        within the game time limit.
+
+    reuse_tree : boolean (optional)
+        Keep the subtree of the reached position between moves.
+
+    leaf_playouts : int (optional)
+        Evaluate every new leaf with this many random games played at once
+        by `playouts.run_playouts()` (requires NumPy) instead of a single
+        Python playout. RAVE statistics then only cover the moves inside
+        the tree.
+
+    timeout : float (optional)
+        Time remaining (in milliseconds) when search is aborted.
+    """
+
+    def __init__(self, exploration=math.sqrt(2), rave_equivalence=None,
+                 playout_limit=None, reuse_tree=True, leaf_playouts=None,
+                 timeout=10.):
+        self.exploration = exploration
+        self.rave_equivalence = rave_equivalence
+        self.playout_limit = playout_limit
+        self.reuse_tree = reuse_tree
+        self.leaf_playouts = leaf_playouts
+        self._playouts = None
+        if leaf_playouts:
+            # NumPy is only needed for batch playouts
+            import playouts
+            self._playouts = playouts
+        self.TIMER_THRESHOLD = timeout
+        # statistics of the last call to get_move(): simulations run,
+        # simulations inherited from the previous tree, and speed
+        self.playouts = 0
+        self.reused_playouts = 0
+        self.playouts_per_second = 0.
+        # totals over the lifetime of the agent
+        self.total_playouts = 0
+        self.total_time = 0.
+        # subtree and position (blanks, player to move, other player) after
+        # the move returned by the last call to get_move()
+        self._tree = None
+        self._tree_state = None
+        self._masks = None
+        self._size = None
+
+    def get_move(self, game, legal_moves, time_left):
+        """Search for the best move from the available legal moves and return a
+        result before the time limit expires.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        legal_moves : list<(int, int)>
+            A list containing legal moves. Moves are encoded as tuples of pairs
+            of ints defining the next (row, col) for the agent to occupy.
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        ----------
+        (int, int)
+            Board coordinates corresponding to a legal move; may return
+            (-1, -1) if there are no available legal moves.
+        """
+        if not legal_moves:
+            return (-1, -1)
+        start = time_left()
+
+        tables = knight_tables(game.width, game.height)
+        self._masks = tables.neighbor_masks
+        self._size = (game.width, game.height)
+        state = self._game_state(game, tables)
+        root = self._reused_root(state)
+        if root is None:
+            root = _Node(None, self._moves(state[0], state[1]))
+            random.shuffle(root.untried)
+        self.reused_playouts = root.visits
+
+        # the tree is acyclic, so the cyclic garbage collector has nothing to
+        # collect; its full passes over a large tree could overrun the clock
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        playouts = 0
+        try:
+            if self.playout_limit is not None:
+                for _ in range(self.playout_limit):
+                    self._simulate(root, state)
+                playouts = self.playout_limit
+            else:
+                while time_left() > self.TIMER_THRESHOLD:
+                    self._simulate(root, state)
+                    playouts += 1
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        best = max(root.children, key=lambda child: child.visits) if root.children else None
+        if best is None:
+            # not even one simulation fitted in the time left
+            return legal_moves[0]
+
+        elapsed = max(start - time_left(), 1e-3)
+        self.playouts = playouts
+        self.playouts_per_second = 1000. * playouts / elapsed
+        self.total_playouts += playouts
+        self.total_time += elapsed / 1000.
+
+        blanks, here, there = state
+        self._tree = best if self.reuse_tree else None
+        self._tree_state = (blanks ^ (1 << best.move), there, best.move)
+        return tables.cells[best.move]
+
+    @staticmethod
+    def _game_state(game, tables):
+        """Return (blanks, player to move, other player) for a `Board`."""
+        def index(player):
+            location = game.get_player_location(player)
+            return NOT_MOVED if location is None else tables.index[location]
+        return (game.blank_mask(), index(game.active_player),
+                index(game.inactive_player))
+
+    def _reused_root(self, state):
+        """Return the node of the previous tree matching `state`, if any."""
+        tree, self._tree = self._tree, None
+        if tree is None:
+            return None
+        blanks, here, there = self._tree_state
+        for child in tree.children:
+            if (blanks ^ (1 << child.move), there, child.move) == state:
+                return child
+        return None
+
+    def _moves(self, blanks, here):
+        """Return the bit indices of the cells the player at `here` can move
+        to, as a list."""
+        options = blanks if here == NOT_MOVED else self._masks[here] & blanks
+        moves = []
+        while options:
+            low = options & -options
+            moves.append(low.bit_length() - 1)
+            options ^= low
+        return moves
+
+    def _select(self, node):
+        """Return the child of a fully expanded node with the best UCT (or
+        UCT-RAVE) value."""
+        log_visits = math.log(node.visits)
+        k = self.rave_equivalence
+        weight = 0. if k is None else math.sqrt(k / (3. * node.visits + k))
+        best, best_value = None, float("-inf")
+        for child in node.children:
+            value = child.wins / child.visits
+            if weight and child.amaf_visits:
+                value = (1. - weight) * value + weight * child.amaf_wins / child.amaf_visits
+            value += self.exploration * math.sqrt(log_visits / child.visits)
+            if value > best_value:
+                best, best_value = child, value
+        return best
+
+    def _simulate(self, root, state):
+        """Run one selection, expansion, playout and update from `root`."""
+        blanks, here, there = state
+        node = root
+        path = [root]
+        while not node.untried and node.children:
+            node = self._select(node)
+            blanks ^= 1 << node.move
+            here, there = there, node.move
+            path.append(node)
+        if node.untried:
+            move = node.untried.pop()
+            blanks ^= 1 << move
+            here, there = there, move
+            child = _Node(move, self._moves(blanks, here))
+            random.shuffle(child.untried)
+            node.children.append(child)
+            node = child
+            path.append(child)
+
+        if self._playouts is not None:
+            # share of the batch won by the player to move
+            mine, theirs = 0, 0
+            to_move_score = float(self._playouts.win_rates(
+                [(blanks, here, there)], self.leaf_playouts, *self._size,
+                seed=random.getrandbits(64))[0])
+        else:
+            to_move_won, mine, theirs = self._playout(blanks, here, there)
+            to_move_score = 1. if to_move_won else 0.
+
+        # walk back to the root; `mine` holds the cells the player to move at
+        # `node` occupied below it, `theirs` those of the other player
+        rave = self.rave_equivalence is not None
+        for node in reversed(path):
+            if rave:
+                for child in node.children:
+                    if mine >> child.move & 1:
+                        child.amaf_visits += 1
+                        child.amaf_wins += to_move_score
+            node.visits += 1
+            node.wins += 1. - to_move_score
+            if node.move is not None:
+                theirs |= 1 << node.move
+            mine, theirs = theirs, mine
+            to_move_score = 1. - to_move_score
+
+    def _playout(self, blanks, here, there):
+        """Play random moves until a player is stuck.
+
+        Returns
+        ----------
+        (bool, int, int)
+            Whether the player to move at the start won, and the cells
+            occupied by that player and by the other one as bitmasks.
+        """
+        masks = self._masks
+        rand = random.random
+        mine, theirs = 0, 0
+        plies = 0
+        while True:
+            options = blanks if here == NOT_MOVED else masks[here] & blanks
+            if not options:
+                break
+            # pick a uniformly random set bit without building a list
+            for _ in range(int(rand() * popcount(options))):
+                options &= options - 1
+            low = options & -options
+            blanks ^= low
+            mine |= low
+            here, there = there, low.bit_length() - 1
+            mine, theirs = theirs, mine
+            plies += 1
+        if plies % 2:
+            # the player to move when the playout ended is the other player
+            return True, theirs, mine
+        return False, mine, theirs
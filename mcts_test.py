@@ -0,0 +1,97 @@
+"""
+Test cases for the Monte Carlo tree search agent.
+"""
+import random
+import unittest
+
+import isolation
+import mcts
+
+
+def make_board(agent, loc1=(3, 3), loc2=(0, 0)):
+    """Create a 7x7 board with the agent to move from a fixed position."""
+    board = isolation.Board(agent, 'null_agent')
+    board.apply_move(loc1)
+    board.apply_move(loc2)
+    return board
+
+
+class MCTSPlayerTest(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+
+    def test_get_move_returns_legal_move(self):
+        """ A fixed number of playouts returns a legal move and counts the
+        playouts, on an empty board and as the second player """
+        for rave in (None, 300):
+            agent = mcts.MCTSPlayer(rave_equivalence=rave, playout_limit=200)
+            board = isolation.Board(agent, 'null_agent')
+            self.assertIn(agent.get_move(board, board.get_legal_moves(), lambda: 1e9),
+                          board.get_legal_moves())
+            board = isolation.Board('null_agent', agent)
+            board.apply_move((2, 3))
+            self.assertIn(agent.get_move(board, board.get_legal_moves(), lambda: 1e9),
+                          board.get_legal_moves())
+            self.assertEqual(agent.playouts, 200)
+            self.assertEqual(agent.total_playouts, 400)
+            self.assertGreater(agent.playouts_per_second, 0)
+
+    def test_finds_winning_move(self):
+        """ In random endgames where exactly one move leaves the opponent
+        stuck, the agent plays it """
+        found = 0
+        for seed in range(100):
+            rng = random.Random(seed)
+            agent = mcts.MCTSPlayer(playout_limit=500)
+            board = isolation.Board(agent, 'null_agent', 5, 5)
+            while board.blank_count() > 9 + seed % 2 * 2 and board.get_legal_moves():
+                board.apply_move(rng.choice(board.get_legal_moves()))
+            if board.active_player is not agent or len(board.get_legal_moves()) < 2:
+                continue
+            winning = [move for move in board.get_legal_moves()
+                       if not board.forecast_move(move).get_legal_moves()]
+            if len(winning) != 1:
+                continue
+            found += 1
+            self.assertEqual(agent.get_move(board, board.get_legal_moves(), lambda: 1e9),
+                             winning[0])
+        self.assertGreater(found, 0)
+
+    def test_tree_is_reused(self):
+        """ The subtree of the position after both replies is kept """
+        agent = mcts.MCTSPlayer(playout_limit=2000)
+        board = make_board(agent)
+        move = agent.get_move(board, board.get_legal_moves(), lambda: 1e9)
+        board.apply_move(move)
+        board.apply_move(board.get_legal_moves()[0])
+        agent.get_move(board, board.get_legal_moves(), lambda: 1e9)
+        self.assertGreater(agent.reused_playouts, 0)
+
+        agent = mcts.MCTSPlayer(playout_limit=2000, reuse_tree=False)
+        board = make_board(agent)
+        board.apply_move(agent.get_move(board, board.get_legal_moves(), lambda: 1e9))
+        board.apply_move(board.get_legal_moves()[0])
+        agent.get_move(board, board.get_legal_moves(), lambda: 1e9)
+        self.assertEqual(agent.reused_playouts, 0)
+
+    def test_batch_leaf_evaluation(self):
+        """ Leaves can be evaluated with NumPy batch playouts """
+        agent = mcts.MCTSPlayer(playout_limit=50, leaf_playouts=32, rave_equivalence=300)
+        board = make_board(agent)
+        self.assertIn(agent.get_move(board, board.get_legal_moves(), lambda: 1e9),
+                      board.get_legal_moves())
+        self.assertEqual(agent.playouts, 50)
+
+    def test_respects_clock(self):
+        """ Without a playout limit the search stops before the timeout """
+        agent = mcts.MCTSPlayer()
+        board = make_board(agent)
+        clock = iter(range(100, 0, -1))
+        move = agent.get_move(board, board.get_legal_moves(), lambda: next(clock))
+        self.assertIn(move, board.get_legal_moves())
+        self.assertLess(agent.playouts, 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+"""
+Generate and load a fixed suite of balanced opening positions.
+
+Random openings make tournament results noisy: a single lopsided opening can
+decide a match before either agent has searched anything.  The suite built
+here contains every opening of `plies` moves (up to board symmetry) whose
+alpha-beta value at a fixed search depth is close to even, sorted from the
+most to the least balanced.  `tournament.py` plays the openings in order,
+and every opening is played twice with the agents swapping colours.
+
+Example:
+
+    python openings.py --plies 2 --depth 7 --out openings.json
+"""
+
+import argparse
+import json
+import os
+import random
+
+from isolation import Board
+from game_agent import CustomPlayer
+from sample_players import improved_score
+
+OPENINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "openings.json")
+
+
+def board_symmetries(width, height):
+    """Return the coordinate transforms mapping the board onto itself.
+
+    Returns
+    ----------
+    list<callable>
+        Functions taking and returning a (row, column) pair; eight for
+        square boards (rotations and reflections), four otherwise.
+    """
+    transforms = [lambda r, c: (r, c),
+                  lambda r, c: (height - 1 - r, c),
+                  lambda r, c: (r, width - 1 - c),
+                  lambda r, c: (height - 1 - r, width - 1 - c)]
+    if width == height:
+        transforms += [lambda r, c: (c, r),
+                       lambda r, c: (width - 1 - c, r),
+                       lambda r, c: (c, height - 1 - r),
+                       lambda r, c: (width - 1 - c, height - 1 - r)]
+    return transforms
+
+
+def canonical_opening(moves, width=7, height=7):
+    """Return the smallest symmetric image of a sequence of moves."""
+    return min(tuple(t(*move) for move in moves)
+               for t in board_symmetries(width, height))
+
+
+def random_opening(game, plies=2):
+    """Return `plies` random moves starting from the position in `game`
+    (the board itself is not modified)."""
+    game = game.copy()
+    moves = []
+    for _ in range(plies):
+        move = random.choice(game.get_legal_moves())
+        game.apply_move(move)
+        moves.append(move)
+    return moves
+
+
+def opening_balance(moves, depth=7, width=7, height=7, score_fn=improved_score):
+    """Score an opening with a fixed-depth alpha-beta search from the point
+    of view of the player to move after the opening.
+    """
+    searcher = CustomPlayer(search_depth=depth, score_fn=score_fn,
+                            iterative=False, method='alphabeta')
+    searcher.time_left = lambda: float("inf")
+    players = (searcher, "opponent") if len(moves) % 2 == 0 else ("opponent", searcher)
+    game = Board(players[0], players[1], width, height)
+    for move in moves:
+        game.apply_move(move)
+    score, _ = searcher.alphabeta(game, depth)
+    return score
+
+
+def generate_openings(plies=2, depth=7, max_imbalance=0., width=7, height=7,
+                      score_fn=improved_score, seed=0):
+    """Build a balanced opening suite.
+
+    Parameters
+    ----------
+    plies : int (optional)
+        Number of moves in each opening. Must be even, so that player 1 holds
+        initiative when the agents take over (`Board.play()` expects this).
+
+    depth : int (optional)
+        Alpha-beta search depth used to judge the balance of an opening.
+
+    max_imbalance : float (optional)
+        Largest absolute search score an opening may have to be included.
+
+    width, height : int (optional)
+        Board dimensions.
+
+    score_fn : callable (optional)
+        Heuristic used at the leaves of the balance search.
+
+    seed : int (optional)
+        Seed used to shuffle equally balanced openings, so that any prefix
+        of the suite covers the whole board instead of a single corner.
+
+    Returns
+    ----------
+    list<list<(int, int)>>
+        The selected openings, most balanced first.
+    """
+    assert plies % 2 == 0, "Openings must have an even number of plies"
+
+    def sequences(game, remaining):
+        if remaining == 0:
+            yield []
+            return
+        for move in game.get_legal_moves():
+            for rest in sequences(game.forecast_move(move), remaining - 1):
+                yield [move] + rest
+
+    candidates = set(canonical_opening(moves, width, height) for moves in
+                     sequences(Board("p1", "p2", width, height), plies))
+
+    scored = []
+    for moves in sorted(candidates):
+        score = opening_balance(moves, depth, width, height, score_fn)
+        if abs(score) <= max_imbalance:
+            scored.append((abs(score), moves))
+
+    random.Random(seed).shuffle(scored)
+    scored.sort(key=lambda item: item[0])
+    return [list(moves) for _, moves in scored]
+
+
+def save_openings(path, openings):
+    """Store an opening suite as JSON."""
+    with open(path, "w") as f:
+        f.write("[\n" + ",\n".join(json.dumps([list(move) for move in moves])
+                                  for moves in openings) + "\n]\n")
+
+
+def load_openings(path=OPENINGS_FILE):
+    """Load an opening suite stored with `save_openings()`."""
+    with open(path) as f:
+        return [[tuple(move) for move in moves] for moves in json.load(f)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--plies", type=int, default=2)
+    parser.add_argument("--depth", type=int, default=7)
+    parser.add_argument("--max-imbalance", type=float, default=0.)
+    parser.add_argument("--out", default=OPENINGS_FILE)
+    args = parser.parse_args()
+
+    openings = generate_openings(args.plies, args.depth, args.max_imbalance)
+    save_openings(args.out, openings)
+    print("Stored {} openings in {}".format(len(openings), args.out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Walk-count heuristic with NumPy.
+
+`heuristics.get_drill_value` measures a player's room by enumerating its
+knight paths of up to five moves. This module counts walks instead, which
+may revisit cells, but is computed with a few vectorized steps: the number
+of walks of each length ending on every cell is a vector, and one more move
+is a sparse adjacency product (a gather through the padded knight-move
+table and a sum) masked by the blank cells. Positions are rows of the same
+arrays, so a whole batch is evaluated at once.
+
+Positions use the encoding of `playouts.game_state()`: the blank cells as a
+bitmask and the cells of the player to move and of the other player (-1 for
+a player that has not moved yet). Boards have at most 64 cells.
+
+Example:
+
+    from pathcount import walk_score
+    walk_score(game, player)  # like drilldown_score, from walk counts
+"""
+
+import numpy as np
+
+from isolation.bitboard import knight_tables
+from playouts import game_state
+
+DEPTH = 5
+
+
+def _neighbor_table(width, height):
+    """Return the knight-move table padded to 8 columns with the index of
+    an extra cell that never holds a walk."""
+    tables = knight_tables(width, height)
+    cells = len(tables.cells)
+    if cells > 64:
+        raise ValueError("Walk counts support boards of at most 64 cells")
+    neighbors = np.full((cells, 8), cells, dtype=np.int64)
+    for i, nbrs in enumerate(tables.neighbors):
+        neighbors[i, :len(nbrs)] = nbrs
+    return neighbors
+
+
+def blank_arrays(blanks, cells):
+    """Return the blank cells of bitmasks as a (N, cells) float array of
+    zeros and ones."""
+    blanks = np.array(blanks, dtype=np.uint64).reshape(-1, 1)
+    bits = (blanks >> np.arange(cells, dtype=np.uint64)) & np.uint64(1)
+    return bits.astype(np.float64)
+
+
+def walk_counts(blanks, locations, width=7, height=7, depth=DEPTH):
+    """Count the knight walks through blank cells from many positions.
+
+    Parameters
+    ----------
+    blanks : array-like
+        (N,) blank-cell bitmasks.
+
+    locations : array-like
+        (N,) cells (bit indices) the walks start from, or -1 for a player
+        that has not moved yet, whose first move may go to any blank cell.
+
+    width, height : int (optional)
+        Board dimensions.
+
+    depth : int (optional)
+        Longest walk counted.
+
+    Returns
+    ----------
+    numpy.ndarray
+        (N, depth) float array; column k holds the number of walks of k + 1
+        moves.
+    """
+    neighbors = _neighbor_table(width, height)
+    cells = len(neighbors)
+    open_cells = blank_arrays(blanks, cells)
+    locations = np.array(locations, dtype=np.int64).reshape(-1)
+    rows = np.arange(len(locations))
+    # walks ending on every cell, with one extra column that stays empty
+    walks = np.zeros((len(locations), cells + 1))
+    placed = locations >= 0
+    walks[rows[placed], locations[placed]] = 1.
+    counts = np.empty((len(locations), depth))
+    for k in range(depth):
+        step = walks[:, neighbors].sum(axis=2) * open_cells
+        if k == 0:
+            step[~placed] = open_cells[~placed]
+        walks[:, :cells] = step
+        counts[:, k] = step.sum(axis=1)
+    return counts
+
+
+def walk_values(blanks, locations, width=7, height=7, depth=DEPTH):
+    """Return the room of every position as the number of walks of each
+    length weighted by the length, as `get_drill_value` weighs paths."""
+    counts = walk_counts(blanks, locations, width, height, depth)
+    return counts @ np.arange(1, depth + 1, dtype=np.float64)
+
+
+def walk_scores(states, width=7, height=7, depth=DEPTH):
+    """Score many positions for the player to move.
+
+    Parameters
+    ----------
+    states : list<(int, int, int)>
+        Positions as (blanks, player to move, other player), e.g. from
+        `playouts.game_state()`.
+
+    Returns
+    ----------
+    numpy.ndarray
+        (len(states),) float array: the room of the player to move divided
+        by the room of the other player (+inf when the other player has no
+        room).
+    """
+    blanks = [s[0] for s in states] * 2
+    locations = [s[1] for s in states] + [s[2] for s in states]
+    values = walk_values(blanks, locations, width, height, depth)
+    mine, theirs = values[:len(states)], values[len(states):]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(theirs > 0, mine / np.where(theirs > 0, theirs, 1.), np.inf)
+
+
+def walk_score(game, player, depth=DEPTH):
+    """Heuristic with the signature of `CustomPlayer.score`: the ratio of
+    the rooms of the player and its opponent, like `drilldown_score`."""
+    if game.utility(player) != 0:
+        return game.utility(player)
+    score = float(walk_scores([game_state(game)], game.width, game.height, depth)[0])
+    if player == game.active_player:
+        return score
+    return 1. / score if score else float("inf")
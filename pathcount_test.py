@@ -0,0 +1,82 @@
+"""
+Test cases for the NumPy walk-count heuristic.
+"""
+import random
+import unittest
+
+import numpy as np
+
+import isolation
+import heuristics
+import pathcount
+import playouts
+
+from isolation.bitboard import iter_bits
+from isolation.bitboard import knight_tables
+
+
+def count_walks(blanks, location, width, height, depth):
+    """Reference implementation: enumerate the walks one by one."""
+    neighbors = knight_tables(width, height).neighbors
+    counts = [0] * depth
+
+    def extend(cell, length):
+        if length == depth:
+            return
+        for step in neighbors[cell]:
+            if blanks >> step & 1:
+                counts[length] += 1
+                extend(step, length + 1)
+
+    if location < 0:
+        for cell in iter_bits(blanks):
+            counts[0] += 1
+            extend(cell, 1)
+    else:
+        extend(location, 0)
+    return counts
+
+
+def random_games(count, width=7, height=7):
+    """Play a random number of random moves on `count` new boards."""
+    games = []
+    for seed in range(count):
+        rng = random.Random(seed)
+        game = isolation.Board('p1', 'p2', width, height)
+        for _ in range(rng.randrange(35)):
+            if not game.get_legal_moves():
+                break
+            game.apply_move(rng.choice(game.get_legal_moves()))
+        games.append(game)
+    return games
+
+
+class WalkCountTest(unittest.TestCase):
+
+    def test_counts_match_enumeration(self):
+        """ Walk counts equal an enumeration of the walks, for placed and
+        unplaced players and rectangular boards """
+        for width, height in ((7, 7), (5, 6)):
+            states = [playouts.game_state(game) for game in random_games(60, width, height)]
+            blanks = [s[0] for s in states] * 2
+            locations = [s[1] for s in states] + [s[2] for s in states]
+            counts = pathcount.walk_counts(blanks, locations, width, height, depth=4)
+            for row, mask, location in zip(counts, blanks, locations):
+                self.assertEqual(list(row), count_walks(mask, location, width, height, 4))
+
+    def test_batch_matches_single_positions(self):
+        """ A batch scores every position like the single-position heuristic,
+        from both points of view """
+        games = [g for g in random_games(40) if not g.is_terminal()]
+        scores = pathcount.walk_scores([playouts.game_state(g) for g in games])
+        for game, score in zip(games, scores):
+            self.assertEqual(pathcount.walk_score(game, game.active_player), score)
+            theirs = pathcount.walk_score(game, game.inactive_player)
+            if np.isfinite(score) and score > 0:
+                self.assertAlmostEqual(theirs, 1. / score)
+            self.assertEqual(heuristics.SCORE_FUNCTIONS["walk_count"](game, game.active_player),
+                             score)
+
+
+if __name__ == '__main__':
+    unittest.main()
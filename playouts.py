@@ -0,0 +1,209 @@
+"""
+Random playouts for many games at once with NumPy.
+
+Every game of a batch is a row of a few arrays: the blank cells as a 64-bit
+mask (bit layout of `isolation.bitboard`), the cell of the player to move
+and the cell of the other player (-1 for a player that has not moved yet).
+Each step moves the player to move of every unfinished game to a random
+legal cell, using vectorized lookups in the knight-move table, until every
+game is over. Boards therefore have at most 64 cells.
+
+Random numbers come from a SplitMix64 stream per game, derived from the
+batch seed and the index of the game in the batch, so results depend only on
+the seed and not on how many games are still running at each step.
+
+Example:
+
+    from playouts import win_rate
+    win_rate(game, 10000)  # share of random playouts won by the active player
+"""
+
+import numpy as np
+
+from isolation.bitboard import knight_tables
+
+NOT_MOVED = -1
+
+_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix(z):
+    """SplitMix64 output function."""
+    with np.errstate(over='ignore'):
+        z = (z ^ (z >> np.uint64(30))) * _MIX1
+        z = (z ^ (z >> np.uint64(27))) * _MIX2
+        return z ^ (z >> np.uint64(31))
+
+
+def splitmix64(state):
+    """Advance SplitMix64 generators and return their next outputs.
+
+    Parameters
+    ----------
+    state : numpy.ndarray
+        uint64 array of generator states, updated in place.
+
+    Returns
+    ----------
+    numpy.ndarray
+        uint64 array of random outputs, one per generator.
+    """
+    with np.errstate(over='ignore'):
+        state += _GAMMA
+    return _mix(state)
+
+
+def game_streams(seed, count):
+    """Return the initial SplitMix64 states of `count` games: game `i` starts
+    from the `i`-th output of a generator seeded with `seed`, so that the
+    streams of different games do not overlap."""
+    state = np.full(count, seed, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        state += _GAMMA * np.arange(1, count + 1, dtype=np.uint64)
+    return _mix(state)
+
+
+def _tables(width, height):
+    """Return the knight-move table padded to 8 columns with -1."""
+    tables = knight_tables(width, height)
+    if len(tables.cells) > 64:
+        raise ValueError("Batch playouts support boards of at most 64 cells")
+    neighbors = np.full((len(tables.cells), 8), -1, dtype=np.int64)
+    for i, cells in enumerate(tables.neighbors):
+        neighbors[i, :len(cells)] = cells
+    return neighbors
+
+
+def _pick(candidates, legal, random_bits):
+    """Return, for every row, a uniformly chosen candidate among the legal
+    ones (rows must have at least one)."""
+    counts = legal.sum(axis=1)
+    choice = (random_bits % counts.astype(np.uint64)).astype(np.int64)
+    column = np.argmax(np.cumsum(legal, axis=1) > choice[:, None], axis=1)
+    return candidates[np.arange(len(candidates)), column]
+
+
+def _next_bits(streams, index):
+    """Advance the generators at `index` of `streams` and return their
+    outputs."""
+    state = streams[index]
+    bits = splitmix64(state)
+    streams[index] = state
+    return bits
+
+
+def run_playouts(blanks, to_move, other, width=7, height=7, seed=0):
+    """Play one random game to the end from every given position.
+
+    Parameters
+    ----------
+    blanks : array-like
+        (N,) blank-cell bitmasks.
+
+    to_move, other : array-like
+        (N,) cells (bit indices) of the player to move and of the other
+        player, or -1 for a player that has not moved yet.
+
+    width, height : int (optional)
+        Board dimensions.
+
+    seed : int (optional)
+        Batch seed; game `i` uses the random stream `game_streams(seed, N)[i]`.
+
+    Returns
+    ----------
+    (numpy.ndarray, numpy.ndarray)
+        (N,) bool array, True where the player to move at the start won,
+        and (N,) int array with the number of moves played.
+    """
+    neighbors = _tables(width, height)
+    cells = np.arange(width * height, dtype=np.int64)
+    blanks = np.array(blanks, dtype=np.uint64).reshape(-1)
+    here = np.array(to_move, dtype=np.int64).reshape(-1)
+    there = np.array(other, dtype=np.int64).reshape(-1)
+    streams = game_streams(seed, len(blanks))
+    plies = np.zeros(len(blanks), dtype=np.int64)
+    alive = np.arange(len(blanks))
+
+    while len(alive):
+        pos = here[alive]
+        placed = pos >= 0
+        candidates = np.empty((len(alive), 8), dtype=np.int64)
+        candidates[placed] = neighbors[pos[placed]]
+        legal = np.zeros((len(alive), 8), dtype=bool)
+        rows = blanks[alive][placed]
+        valid = candidates[placed] >= 0
+        shifts = np.where(valid, candidates[placed], 0).astype(np.uint64)
+        legal[placed] = valid & ((rows[:, None] >> shifts) & np.uint64(1)).astype(bool)
+
+        # a player that has not moved yet may take any blank cell
+        unplaced = np.nonzero(~placed)[0]
+        moves = np.full(len(alive), -1, dtype=np.int64)
+        if len(unplaced):
+            rows = blanks[alive[unplaced]]
+            open_cells = ((rows[:, None] >> cells.astype(np.uint64)) & np.uint64(1)).astype(bool)
+            movable = open_cells.any(axis=1)
+            picked = _pick(np.broadcast_to(cells, open_cells.shape)[movable], open_cells[movable],
+                           _next_bits(streams, alive[unplaced[movable]]))
+            moves[unplaced[movable]] = picked
+
+        placed = np.nonzero(placed)[0]
+        movers = placed[legal[placed].any(axis=1)]
+        if len(movers):
+            moves[movers] = _pick(candidates[movers], legal[movers],
+                                  _next_bits(streams, alive[movers]))
+
+        # games whose player to move is stuck are over
+        moving = moves >= 0
+        games = alive[moving]
+        blanks[games] &= ~(np.uint64(1) << moves[moving].astype(np.uint64))
+        here[games], there[games] = there[games], moves[moving]
+        plies[games] += 1
+        alive = games
+
+    # the player stuck at the end is the starting player after an even
+    # number of moves
+    return plies % 2 == 1, plies
+
+
+def game_state(game):
+    """Return (blanks, player to move, other player) of a `Board` in the
+    encoding used by `run_playouts()`."""
+    tables = knight_tables(game.width, game.height)
+
+    def index(player):
+        location = game.get_player_location(player)
+        return NOT_MOVED if location is None else tables.index[location]
+
+    return game.blank_mask(), index(game.active_player), index(game.inactive_player)
+
+
+def win_rates(states, playouts_per_state, width=7, height=7, seed=0):
+    """Play `playouts_per_state` random games from every position and return
+    the share won by the player to move.
+
+    Parameters
+    ----------
+    states : list<(int, int, int)>
+        Positions as (blanks, player to move, other player), e.g. from
+        `game_state()`.
+
+    Returns
+    ----------
+    numpy.ndarray
+        (len(states),) float array of win rates.
+    """
+    blanks = np.repeat(np.array([s[0] for s in states], dtype=np.uint64), playouts_per_state)
+    to_move = np.repeat(np.array([s[1] for s in states], dtype=np.int64), playouts_per_state)
+    other = np.repeat(np.array([s[2] for s in states], dtype=np.int64), playouts_per_state)
+    wins, _ = run_playouts(blanks, to_move, other, width, height, seed)
+    return wins.reshape(len(states), playouts_per_state).mean(axis=1)
+
+
+def win_rate(game, num_playouts, seed=0):
+    """Return the share of `num_playouts` random games from the position of a
+    `Board` won by its active player."""
+    return float(win_rates([game_state(game)], num_playouts, game.width,
+                           game.height, seed)[0])
@@ -0,0 +1,73 @@
+"""
+Test cases for the NumPy batch playouts.
+"""
+import random
+import unittest
+
+import numpy as np
+
+import isolation
+import playouts
+
+
+class PlayoutsTest(unittest.TestCase):
+
+    def test_splitmix64_reference_output(self):
+        """ The generator matches the reference SplitMix64 sequence """
+        state = np.zeros(1, dtype=np.uint64)
+        self.assertEqual(int(playouts.splitmix64(state)[0]), 0xE220A8397B1DCDAF)
+        self.assertEqual(int(playouts.splitmix64(state)[0]), 0x6E789E6AA1B965F4)
+
+    def test_playouts_follow_the_rules(self):
+        """ Playouts never play more moves than there are blank cells, and
+        the winner follows from the parity of the number of moves """
+        board = isolation.Board('p1', 'p2')
+        board.apply_move((3, 3))
+        board.apply_move((0, 0))
+        state = playouts.game_state(board)
+        wins, plies = playouts.run_playouts([state[0]] * 500, [state[1]] * 500,
+                                            [state[2]] * 500, seed=3)
+        self.assertTrue(np.all(plies >= 1))
+        self.assertTrue(np.all(plies <= board.blank_count()))
+        self.assertTrue(np.array_equal(wins, plies % 2 == 1))
+
+    def test_results_depend_only_on_seed_and_index(self):
+        """ A game gives the same result in a larger batch, and different
+        seeds give different games """
+        board = isolation.Board('p1', 'p2', 5, 5)
+        state = playouts.game_state(board)
+        small = playouts.run_playouts([state[0]] * 10, [state[1]] * 10, [state[2]] * 10,
+                                      5, 5, seed=7)
+        large = playouts.run_playouts([state[0]] * 40, [state[1]] * 40, [state[2]] * 40,
+                                      5, 5, seed=7)
+        other = playouts.run_playouts([state[0]] * 10, [state[1]] * 10, [state[2]] * 10,
+                                      5, 5, seed=8)
+        self.assertTrue(np.array_equal(small[1], large[1][:10]))
+        self.assertFalse(np.array_equal(small[1], other[1]))
+
+    def test_win_rates_of_decided_positions(self):
+        """ A player with no legal move loses every playout; one whose only
+        move leaves the opponent stuck wins every playout """
+        rng = random.Random(0)
+        checked = 0
+        for _ in range(200):
+            board = isolation.Board('p1', 'p2', 5, 5)
+            while board.get_legal_moves() and rng.random() > 0.05:
+                board.apply_move(rng.choice(board.get_legal_moves()))
+            if board.move_count < 2:
+                continue
+            rate = playouts.win_rate(board, 50)
+            if not board.get_legal_moves():
+                self.assertEqual(rate, 0.)
+                checked += 1
+            elif all(not board.forecast_move(m).get_legal_moves()
+                     for m in board.get_legal_moves()):
+                self.assertEqual(rate, 1.)
+                checked += 1
+            else:
+                self.assertTrue(0. <= rate <= 1.)
+        self.assertGreater(checked, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+"""
+Cost and quality profile of the score functions.
+
+Tournament win rates mix up how good a heuristic is with how expensive it
+is. For every score function this profiler measures, over a corpus of
+positions:
+
+* the latency of one call (mean and 99th percentile);
+* how often a fixed-depth search with it plays a move that a deep reference
+  search rates as best ("agreement");
+* the depth iterative deepening reaches with it in a fixed time per move,
+  and how often the move it then plays is rated best.
+
+Positions are drawn by random play or taken from a corpus written by
+`tuning.py generate`. The reference searches every root move to a fixed
+depth with alpha-beta and `improved_score`; a move agrees when its
+reference score equals the best one.
+
+Example:
+
+    python profiler.py --positions 50 --budget 100
+    python profiler.py --corpus corpus.npz --heuristics improved custom territory
+    python profiler.py --evaluator evaluator.npz --heuristics custom learned
+"""
+
+import argparse
+import random
+import timeit
+
+from isolation import Board
+from game_agent import CustomPlayer
+from game_agent import custom_score
+from heuristics import SCORE_FUNCTIONS
+from sample_players import improved_score
+
+# registered heuristics plus the reference heuristics of the project
+PROFILED = dict(SCORE_FUNCTIONS, improved=improved_score, custom=custom_score)
+# too slow for open boards to be profiled by default
+SLOW = ("longest_path", "combined_v2", "random")
+
+REFERENCE_DEPTH = 6
+
+
+def random_positions(count, width=7, height=7, min_plies=4, max_plies=30, seed=0):
+    """Draw positions by random play, skipping finished games.
+
+    Returns
+    ----------
+    list<(frozenset, (int, int), (int, int))>
+        Positions as (blank cells, location of the player to move, location
+        of the other player).
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = Board("p1", "p2", width, height)
+        for _ in range(rng.randint(min_plies, max_plies)):
+            if not game.get_legal_moves():
+                break
+            game.apply_move(rng.choice(game.get_legal_moves()))
+        if game.get_legal_moves() and game.move_count >= 2:
+            positions.append((frozenset(game.iter_blanks()),
+                              game.get_player_location(game.active_player),
+                              game.get_player_location(game.inactive_player)))
+    return positions
+
+
+def corpus_positions(corpus, count=None, seed=0):
+    """Return (a random sample of) the positions of a `tuning` corpus in
+    the format of `random_positions()`, skipping finished games."""
+    blanks, locs = corpus["blanks"], corpus["locs"]
+    height, width = blanks.shape[1:]
+    positions = []
+    for grid, (active, inactive) in zip(blanks, locs):
+        cells = frozenset((r, c) for r in range(height) for c in range(width) if grid[r, c])
+        position = (cells, tuple(int(x) for x in active), tuple(int(x) for x in inactive))
+        if position_board(position, "p1", width, height).get_legal_moves():
+            positions.append(position)
+    if count is not None and count < len(positions):
+        positions = random.Random(seed).sample(positions, count)
+    return positions
+
+
+def position_board(position, player, width=7, height=7):
+    """Build a `Board` in which `player` is to move in a position."""
+    blanks, active, inactive = position
+    game = Board(player, "opponent", width, height)
+    # replacing the grid and the locations makes the board resynchronize
+    game.__board_state__ = [[Board.BLANK if (r, c) in blanks else 2 for c in range(width)]
+                            for r in range(height)]
+    game.__board_state__[active[0]][active[1]] = 1
+    game.__last_player_move__ = {player: active, "opponent": inactive}
+    game.move_count = width * height - len(blanks)
+    return game
+
+
+def reference_scores(position, depth=REFERENCE_DEPTH, width=7, height=7):
+    """Return the reference score of every legal move of a position, from
+    an alpha-beta search of `depth` plies in total with `improved_score`."""
+    agent = CustomPlayer(search_depth=depth, score_fn=improved_score, iterative=False,
+                         method='alphabeta', order_moves=True)
+    agent.time_left = lambda: float("inf")
+    game = position_board(position, agent, width, height)
+    return {move: agent.alphabeta(game.forecast_move(move), depth - 1, maximizing_player=False)[0]
+            for move in game.get_legal_moves()}
+
+
+def latency(score_fn, positions, width=7, height=7):
+    """Return the times (in microseconds) of one call of `score_fn` on a
+    fresh board of every position, after one call to warm up (e.g. lazy
+    imports)."""
+    times = []
+    clock = timeit.default_timer
+    score_fn(position_board(positions[0], "p1", width, height), "p1")
+    for position in positions:
+        game = position_board(position, "p1", width, height)
+        start = clock()
+        score_fn(game, "p1")
+        times.append((clock() - start) * 1e6)
+    return times
+
+
+def percentile(values, share):
+    """Return the value below which `share` of the sorted `values` lie."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def profile(score_fn, positions, references, depth=1, budget=None, width=7, height=7):
+    """Profile one score function.
+
+    Parameters
+    ----------
+    score_fn : callable
+        Heuristic with the `(game, player)` signature.
+
+    positions : list
+        Positions from `random_positions()` or `corpus_positions()`.
+
+    references : list<dict>
+        `reference_scores()` of every position.
+
+    depth : int (optional)
+        Depth of the fixed-depth search whose moves are compared.
+
+    budget : float (optional)
+        Milliseconds per move of the iterative deepening search; None skips
+        the timed search.
+
+    Returns
+    ----------
+    dict
+        "mean_us" and "p99_us": latency of one call; "agreement": share of
+        positions where the fixed-depth move is rated best by the
+        reference; "timed_depth" and "timed_agreement": mean depth reached
+        and agreement of the timed search (None without a budget).
+    """
+    times = latency(score_fn, positions, width, height)
+    result = {"mean_us": sum(times) / len(times), "p99_us": percentile(times, 0.99),
+              "timed_depth": None, "timed_agreement": None}
+
+    agree = 0
+    for position, scores in zip(positions, references):
+        agent = CustomPlayer(search_depth=depth, score_fn=score_fn, iterative=False,
+                             method='alphabeta')
+        agent.time_left = lambda: float("inf")
+        _, move = agent.alphabeta(position_board(position, agent, width, height), depth)
+        agree += scores.get(move) == max(scores.values())
+    result["agreement"] = agree / len(positions)
+
+    if budget is not None:
+        agree, depths = 0, 0
+        clock = timeit.default_timer
+        for position, scores in zip(positions, references):
+            agent = CustomPlayer(score_fn=score_fn, method='alphabeta', timeout=budget / 10.)
+            game = position_board(position, agent, width, height)
+            start = clock()
+            move = agent.get_move(game, game.get_legal_moves(),
+                                  lambda: budget - (clock() - start) * 1000)
+            depths += agent.completed_depth
+            agree += scores.get(move) == max(scores.values())
+        result["timed_depth"] = depths / len(positions)
+        result["timed_agreement"] = agree / len(positions)
+    return result
+
+
+def print_table(results):
+    """Print profiles as a table, fastest heuristic first."""
+    print("{:<16}{:>12}{:>12}{:>11}{:>13}{:>13}".format(
+        "heuristic", "mean (us)", "p99 (us)", "agreement", "timed depth", "timed agree"))
+    for name, r in sorted(results.items(), key=lambda item: item[1]["mean_us"]):
+        timed = ("{:>13.2f}{:>13.3f}".format(r["timed_depth"], r["timed_agreement"])
+                 if r["timed_depth"] is not None else "{:>13}{:>13}".format("-", "-"))
+        print("{:<16}{:>12.1f}{:>12.1f}{:>11.3f}".format(
+            name, r["mean_us"], r["p99_us"], r["agreement"]) + timed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--heuristics", nargs="*", choices=sorted(PROFILED) + ["learned"],
+                        default=sorted(name for name in PROFILED if name not in SLOW))
+    parser.add_argument("--positions", type=int, default=50)
+    parser.add_argument("--corpus", default=None,
+                        help="position corpus written by tuning.py (random play otherwise)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--depth", type=int, default=1,
+                        help="depth of the fixed-depth search")
+    parser.add_argument("--reference-depth", type=int, default=REFERENCE_DEPTH)
+    parser.add_argument("--budget", type=float, default=None,
+                        help="milliseconds per move of the timed search")
+    parser.add_argument("--evaluator", default=None,
+                        help="weights written by learned_eval.py, profiled as 'learned'")
+    args = parser.parse_args()
+    profiled = dict(PROFILED)
+    if args.evaluator is not None:
+        from learned_eval import Evaluator
+        profiled["learned"] = Evaluator.load(args.evaluator).score_function()
+    elif "learned" in args.heuristics:
+        parser.error("'learned' needs --evaluator")
+
+    if args.corpus is not None:
+        # NumPy is only needed to read a corpus
+        from tuning import load_corpus
+        corpus = load_corpus(args.corpus)
+        height, width = corpus["blanks"].shape[1:]
+        positions = corpus_positions(corpus, args.positions, args.seed)
+    else:
+        width = height = 7
+        positions = random_positions(args.positions, seed=args.seed)
+    references = [reference_scores(p, args.reference_depth, width, height) for p in positions]
+
+    results = {}
+    for name in args.heuristics:
+        results[name] = profile(profiled[name], positions, references, args.depth,
+                                args.budget, width, height)
+    print_table(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Test cases for the heuristic profiler.
+"""
+import unittest
+
+import profiler
+
+from sample_players import improved_score
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def test_position_boards(self):
+        """ Positions rebuild boards with the given player to move """
+        positions = profiler.random_positions(10, 5, 5, seed=1)
+        for blanks, active, inactive in positions:
+            game = profiler.position_board((blanks, active, inactive), "me", 5, 5)
+            self.assertIs(game.active_player, "me")
+            self.assertEqual(set(game.get_blank_spaces()), blanks)
+            self.assertEqual(game.get_player_location("opponent"), inactive)
+            self.assertTrue(game.get_legal_moves())
+
+    def test_profile(self):
+        """ A profile reports latencies, agreements between 0 and 1 and the
+        depth of the timed search; the reference heuristic searched as deep
+        as the reference always agrees """
+        positions = profiler.random_positions(4, 5, 5, seed=2)
+        references = [profiler.reference_scores(p, 3, 5, 5) for p in positions]
+        for scores, position in zip(references, positions):
+            game = profiler.position_board(position, "me", 5, 5)
+            self.assertEqual(set(scores), set(game.get_legal_moves()))
+        result = profiler.profile(improved_score, positions, references, depth=3,
+                                  budget=20, width=5, height=5)
+        self.assertGreater(result["mean_us"], 0)
+        self.assertGreaterEqual(result["p99_us"], result["mean_us"] / len(positions))
+        self.assertEqual(result["agreement"], 1.)
+        self.assertTrue(0 <= result["timed_agreement"] <= 1)
+        self.assertGreaterEqual(result["timed_depth"], 1)
+        self.assertEqual(profiler.percentile([3, 1, 2], 0.99), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
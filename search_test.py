@@ -0,0 +1,324 @@
+"""
+Test cases for the search options of CustomPlayer that go beyond the
+project requirements covered in agent_test.py.
+"""
+import random
+import timeit
+import unittest
+
+from unittest import mock
+
+import isolation
+import game_agent
+
+from sample_players import improved_score
+
+
+def make_board(agent, loc1=(3, 3), loc2=(0, 0)):
+    """Create a 7x7 board with the agent to move from a fixed position."""
+    board = isolation.Board(agent, 'null_agent')
+    board.apply_move(loc1)
+    board.apply_move(loc2)
+    return board
+
+
+def endgame_board(agent, seed, blanks=13):
+    """Play random moves on a 5x5 board until `blanks` cells are left, and
+    return the board if the agent is to move and can still move."""
+    rng = random.Random(seed)
+    board = isolation.Board(agent, 'null_agent', 5, 5)
+    while board.blank_count() > blanks and board.get_legal_moves():
+        board.apply_move(rng.choice(board.get_legal_moves()))
+    if board.active_player is agent and board.get_legal_moves():
+        return board
+    return None
+
+
+class SearchOptionsTest(unittest.TestCase):
+
+    def test_node_limit_ignores_clock(self):
+        """ A node-limited search returns the same move with or without time
+        left on the clock, and never expands more than its budget """
+        moves = []
+        for clock in (lambda: 1e9, lambda: -1.):
+            agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                            method='alphabeta', node_limit=500)
+            board = make_board(agent)
+            moves.append(agent.get_move(board, board.get_legal_moves(), clock))
+            self.assertLessEqual(agent.nodes, 501)
+            self.assertEqual(agent.search_timeouts, 0)
+        self.assertEqual(moves[0], moves[1])
+        self.assertIn(moves[0], make_board(agent).get_legal_moves())
+
+    def test_depth_limit_is_deterministic(self):
+        """ Iterative deepening stops at depth_limit without the clock """
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method='alphabeta', depth_limit=3)
+        self.assertTrue(agent.is_deterministic)
+        board = make_board(agent)
+        move = agent.get_move(board, board.get_legal_moves(), lambda: -1.)
+        self.assertIn(move, board.get_legal_moves())
+
+    def test_fingerprint_follows_score_code(self):
+        """ Fingerprints change when the code of the score function or of a
+        helper it calls changes, but not between equal definitions """
+        def define(helper_body):
+            namespace = {}
+            exec("def helper(game, player):\n    return {}\n\n"
+                 "def score(game, player):\n    return helper(game, player)\n".format(helper_body),
+                 namespace)
+            return game_agent.CustomPlayer(score_fn=namespace["score"]).fingerprint()
+
+        self.assertEqual(define("1."), define("1."))
+        self.assertNotEqual(define("1."), define("2."))
+        self.assertNotEqual(define("1."), define("len(game.get_legal_moves(player))"))
+
+    def test_fingerprint_follows_search_code(self):
+        """ Fingerprints change when a search method of the agent class
+        changes, but not between equal definitions """
+        def define(body):
+            namespace = {"CustomPlayer": game_agent.CustomPlayer}
+            exec("class Player(CustomPlayer):\n"
+                 "    def alphabeta(self, game, depth, *args, **kwargs):\n"
+                 "        {}\n"
+                 "        return CustomPlayer.alphabeta(self, game, depth, *args, **kwargs)\n".format(body),
+                 namespace)
+            fingerprint = namespace["Player"](score_fn=improved_score).fingerprint()
+            return fingerprint.replace("Player(", "", 1)
+
+        self.assertEqual(define("pass"), define("pass"))
+        self.assertNotEqual(define("pass"), define("depth = max(1, depth - 1)"))
+        self.assertNotEqual(define("pass"), game_agent.CustomPlayer(
+            score_fn=improved_score).fingerprint().replace("CustomPlayer(", "", 1))
+
+    def test_auto_poll_interval_reads_clock_less_often(self):
+        """ With poll_interval='auto' the clock is read far less often than
+        once per node and the search still returns before the deadline """
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method='alphabeta', poll_interval='auto')
+        board = make_board(agent)
+        reads = []
+        deadline = 1000 * timeit.default_timer() + 100
+
+        def time_left():
+            reads.append(1)
+            return deadline - 1000 * timeit.default_timer()
+
+        move = agent.get_move(board, board.get_legal_moves(), time_left)
+        self.assertIn(move, board.get_legal_moves())
+        self.assertGreater(time_left(), 0)
+        self.assertLess(len(reads), agent.nodes / 2)
+
+    def test_auto_poll_interval_is_capped(self):
+        """ However fast the search was, the clock is read again within
+        MAX_POLL_INTERVAL nodes """
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method='alphabeta', poll_interval='auto')
+        agent.time_left = lambda: 1e6
+        agent._nodes_per_ms = 1e9
+        agent._max_ms_per_node = 1e-9
+        agent._last_poll_interval = game_agent.MAX_POLL_INTERVAL
+        agent._poll_clock()
+        self.assertEqual(agent._next_poll - agent.nodes, game_agent.MAX_POLL_INTERVAL)
+
+    def test_auto_poll_interval_follows_slowest_nodes(self):
+        """ The interval grows at most twofold between reads, the speed is
+        not carried over to the next move, and the slowest node cost seen
+        limits the interval near the deadline """
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method='alphabeta', poll_interval='auto')
+        clock = [1000.]
+        agent.time_left = lambda: clock[0]
+        intervals = []
+        for _ in range(4):
+            agent._poll_clock()
+            intervals.append(agent._next_poll - agent.nodes)
+            agent.nodes = agent._next_poll
+            clock[0] -= 0.001
+        self.assertEqual(intervals, [1, 2, 4, 8])
+
+        # 8 nodes took 20 ms: with 30 ms left, the clock is read again after
+        # the 6 nodes that take half of it at that cost
+        clock[0] = 30. + agent.TIMER_THRESHOLD
+        agent._last_poll_time = clock[0] + 20.
+        agent._last_poll_nodes = agent.nodes - 8
+        agent._poll_clock()
+        self.assertEqual(agent._next_poll - agent.nodes, 6)
+
+        board = make_board(agent)
+        agent.get_move(board, board.get_legal_moves(), lambda: -1.)
+        self.assertIsNone(agent._nodes_per_ms)
+
+    def test_eval_cache_survives_moves_and_clears_between_games(self):
+        """ The evaluation cache returns the same moves as an uncached search,
+        is reused on the next turn and is emptied for a new game """
+        plain = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta',
+                                        depth_limit=4)
+        cached = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta',
+                                         depth_limit=4, eval_cache_size=100000)
+        board, plain_board = make_board(cached), make_board(plain)
+        move = cached.get_move(board, board.get_legal_moves(), lambda: 1e9)
+        self.assertEqual(move, plain.get_move(plain_board, plain_board.get_legal_moves(),
+                                              lambda: 1e9))
+        self.assertEqual(cached.eval_cache_hits, 0)
+        self.assertEqual(cached.eval_cache_misses, len(cached.eval_cache))
+
+        # leaves of the previous search are evaluated again on the next turn
+        board.apply_move(move)
+        board.apply_move(board.get_legal_moves()[0])
+        cached.get_move(board, board.get_legal_moves(), lambda: 1e9)
+        self.assertGreater(cached.eval_cache_hits, 0)
+
+        # a new game (lower move count) starts from an empty cache
+        misses = cached.eval_cache_misses
+        cached.get_move(make_board(cached), make_board(cached).get_legal_moves(), lambda: 1e9)
+        self.assertEqual(cached.eval_cache_misses - misses, len(cached.eval_cache))
+
+    def test_eval_cache_is_bounded(self):
+        """ The least recently used evaluations are evicted from a full cache """
+        agent = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta',
+                                        depth_limit=3, eval_cache_size=50)
+        board = make_board(agent)
+        agent.get_move(board, board.get_legal_moves(), lambda: 1e9)
+        self.assertEqual(len(agent.eval_cache), 50)
+        self.assertEqual(agent.eval_cache_evictions, agent.eval_cache_misses - 50)
+
+    def test_reductions_and_futility_search_fewer_nodes(self):
+        """ Move ordering, late move reductions and futility pruning each
+        return a legal move while expanding fewer nodes than plain alphabeta """
+        def search(**kwargs):
+            agent = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta',
+                                            depth_limit=5, **kwargs)
+            board = make_board(agent)
+            move = agent.get_move(board, board.get_legal_moves(), lambda: 1e9)
+            self.assertIn(move, board.get_legal_moves())
+            return agent.nodes
+
+        plain = search()
+        self.assertLess(search(order_moves=True), plain)
+        self.assertLess(search(late_move_reduction=1), plain)
+        self.assertLess(search(futility_margin=1.), plain)
+
+    def test_proven_result_stops_deepening(self):
+        """ Iterative deepening stops as soon as the root is proven, and the
+        score counts the moves to the end of the game """
+        for seed in range(5):
+            agent = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta')
+            board = endgame_board(agent, seed)
+            if board is None:
+                continue
+            move = agent.get_move(board, board.get_legal_moves(), lambda: 1e9)
+            self.assertIn(move, board.get_legal_moves())
+            self.assertLess(agent.completed_depth, board.blank_count())
+            score, _ = agent.alphabeta(board, agent.completed_depth)
+            self.assertTrue(agent.is_proven(score))
+            # a deeper search finds the same forced result
+            self.assertEqual(agent.alphabeta(board, agent.completed_depth + 2)[0], score)
+            moves_to_end = game_agent.WIN_SCORE - abs(score) - board.move_count
+            self.assertTrue(0 < moves_to_end <= agent.completed_depth)
+
+    def test_proven_cache_is_reused_on_later_turns(self):
+        """ Proven positions are looked up instead of searched again, within
+        a game, and do not change the chosen moves """
+        reused = False
+        for seed in range(5):
+            cached = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta',
+                                             proven_cache=True)
+            plain = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta')
+            board, plain_board = endgame_board(cached, seed), endgame_board(plain, seed)
+            if board is None:
+                continue
+            hits = 0
+            while board.get_legal_moves():
+                if board.active_player is cached:
+                    move = cached.get_move(board, board.get_legal_moves(), lambda: 1e9)
+                    self.assertEqual(move, plain.get_move(plain_board, plain_board.get_legal_moves(),
+                                                          lambda: 1e9))
+                    self.assertTrue(cached.proven_cache)
+                    reused = reused or cached.proven_cache_hits > hits
+                    hits = cached.proven_cache_hits
+                else:
+                    move = board.get_legal_moves()[0]
+                board.apply_move(move)
+                plain_board.apply_move(move)
+        self.assertTrue(reused)
+
+    def test_move_bounds_cut_off_decided_endgames(self):
+        """ Positions decided by the move bounds are not searched, and the
+        proven result agrees with an exhaustive search """
+        cutoffs = 0
+        for seed in range(40):
+            agent = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta',
+                                            move_bounds=True)
+            plain = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta')
+            agent.time_left = plain.time_left = lambda: float("inf")
+            board, plain_board = endgame_board(agent, seed), endgame_board(plain, seed)
+            if board is None:
+                continue
+            depth = board.blank_count()
+            score, move = agent.alphabeta(board, depth)
+            expected, _ = plain.alphabeta(plain_board, depth)
+            self.assertTrue(agent.is_proven(score))
+            self.assertEqual(score > 0, expected > 0)
+            self.assertIn(move, board.get_legal_moves())
+            if expected > 0:
+                # the chosen move keeps the win
+                self.assertGreater(plain.alphabeta(plain_board.forecast_move(move), depth,
+                                                   maximizing_player=False)[0], 0)
+            self.assertLessEqual(agent.nodes, plain.nodes)
+            cutoffs += agent.bounds_cutoffs
+        self.assertGreater(cutoffs, 0)
+
+    def test_move_bound_scores_are_cached_as_bounds(self):
+        """ Proven scores resting on move-bound cutoffs are cached as bounds
+        that hold for the exact values, even when the upper bounds are
+        loose """
+        move_bounds = isolation.Board.move_bounds
+
+        def loose_bounds(board, player):
+            lower, upper = move_bounds(board, player)
+            return lower, upper + 2
+
+        with mock.patch.object(isolation.Board, "move_bounds", loose_bounds):
+            self._check_cached_bounds()
+
+    def _check_cached_bounds(self):
+        """Compare the cache entries one and two plies below endgame roots
+        with exhaustive searches."""
+        checked = 0
+        for seed in range(40):
+            agent = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta',
+                                            move_bounds=True, proven_cache=True)
+            plain = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta')
+            agent.time_left = plain.time_left = lambda: float("inf")
+            board, plain_board = endgame_board(agent, seed), endgame_board(plain, seed)
+            if board is None:
+                continue
+            depth = board.blank_count()
+            agent.alphabeta(board, depth)
+            # the positions one and two plies below the root
+            lines = [[m] for m in board.get_legal_moves()]
+            lines += [[m, reply] for m in board.get_legal_moves()
+                      for reply in board.forecast_move(m).get_legal_moves()]
+            for line in lines:
+                position, plain_position = board, plain_board
+                for move in line:
+                    position = position.forecast_move(move)
+                    plain_position = plain_position.forecast_move(move)
+                to_move = position.active_player is agent
+                entry = agent.proven_cache.get((position.hash_key(), to_move))
+                if entry is None:
+                    continue
+                exact, _ = plain.alphabeta(plain_position, depth, maximizing_player=to_move)
+                value, bound, _ = entry
+                if bound == game_agent.EXACT:
+                    self.assertEqual(value, exact)
+                elif bound == game_agent.LOWER:
+                    self.assertGreaterEqual(exact, value)
+                else:
+                    self.assertLessEqual(exact, value)
+                checked += 1
+        self.assertGreater(checked, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,358 @@
+"""
+Exhaustive solver for Isolation on small boards.
+
+Positions are encoded as integers: the blank cells as a bitmask (layout of
+`isolation.bitboard`) and the cells of the player to move and of the other
+player (0 for a player that has not moved yet, cell + 1 otherwise). Every
+position is reduced to the smallest code among its images under the board
+symmetries before it is looked up or stored.
+
+The value of a position is the number of plies until the game ends with
+best play: the player to move wins when it is odd and loses when it is even
+(0 means it has no legal move). The winner ends the game as fast as
+possible, the loser as late as possible.
+
+`solve_position()` is a memoized depth-first search. `solve_board()` splits
+the game tree after the opening moves, solves the parts on several cores
+and merges the results; `save_solution()` stores every solved position in
+the sorted record format of `tablebase.write_records()`, and `Solution`
+looks positions up without loading the file. `grade_heuristic()` measures
+how often a heuristic picks a move that keeps the true result.
+
+Boards are limited to 44 cells (e.g. 6x6) so that codes fit in a record.
+
+Example:
+
+    python solver.py --width 5 --height 5 --out solution_5x5.bin
+    python solver.py --width 6 --height 6 --opening 2 2 3 4
+    python solver.py --width 4 --height 5 --out solution_4x5.bin --grade territory
+"""
+
+import argparse
+import multiprocessing
+import random
+
+from heuristics import SCORE_FUNCTIONS
+from isolation import Board
+from isolation.bitboard import knight_tables
+from openings import board_symmetries
+from tablebase import RecordFile
+from tablebase import write_records
+
+MAGIC = b"ISOSOLVE"
+MAX_CELLS = 44
+
+
+class Encoder(object):
+    """
+    Position codes and their symmetry reduction for one board size.
+
+    Parameters
+    ----------
+    width, height : int
+        Board dimensions.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.tables = knight_tables(width, height)
+        self.cells = len(self.tables.cells)
+        if self.cells > MAX_CELLS:
+            raise ValueError("Boards of more than {0} cells are not supported".format(MAX_CELLS))
+        index = self.tables.index
+        # cell permutation of every symmetry, and the image of every byte of
+        # a blank mask so that a mask is transformed a byte at a time
+        self.permutations = [[index[transform(r, c)] for r, c in self.tables.cells]
+                             for transform in board_symmetries(width, height)]
+        self.byte_images = []
+        for permutation in self.permutations:
+            chunks = []
+            for start in range(0, self.cells, 8):
+                images = []
+                for byte in range(256):
+                    image = 0
+                    for bit in range(8):
+                        if byte >> bit & 1 and start + bit < self.cells:
+                            image |= 1 << permutation[start + bit]
+                    images.append(image)
+                chunks.append(images)
+            self.byte_images.append(chunks)
+
+    def encode(self, blanks, here, there):
+        """Return the code of a position (cells are -1 when not moved)."""
+        return ((blanks << 6 | here + 1) << 6) | there + 1
+
+    def decode(self, code):
+        """Return (blanks, player to move, other player) of a code."""
+        return code >> 12, (code >> 6 & 63) - 1, (code & 63) - 1
+
+    def canonical(self, blanks, here, there):
+        """Return the smallest code among the symmetric images of a position."""
+        best = None
+        for permutation, chunks in zip(self.permutations, self.byte_images):
+            image = 0
+            mask = blanks
+            for images in chunks:
+                image |= images[mask & 0xFF]
+                mask >>= 8
+            code = self.encode(image,
+                               -1 if here < 0 else permutation[here],
+                               -1 if there < 0 else permutation[there])
+            if best is None or code < best:
+                best = code
+        return best
+
+    def state(self, game):
+        """Return (blanks, player to move, other player) of a `Board`."""
+        def index(player):
+            location = game.get_player_location(player)
+            return -1 if location is None else self.tables.index[location]
+        return game.blank_mask(), index(game.active_player), index(game.inactive_player)
+
+    def moves(self, blanks, here):
+        """Return the cells the player at `here` can move to."""
+        options = blanks if here < 0 else self.tables.neighbor_masks[here] & blanks
+        cells = []
+        while options:
+            low = options & -options
+            cells.append(low.bit_length() - 1)
+            options ^= low
+        return cells
+
+
+def solve_position(encoder, blanks, here, there, memo):
+    """Return the value of a position, solving and storing (in `memo`, a
+    dict from canonical codes to values) every position below it. All moves
+    are searched even after a win is found, so the table covers every
+    reachable position."""
+    code = encoder.canonical(blanks, here, there)
+    value = memo.get(code)
+    if value is not None:
+        return value
+    best_win, best_loss = None, None
+    for move in encoder.moves(blanks, here):
+        child = solve_position(encoder, blanks & ~(1 << move), there, move, memo)
+        if child % 2 == 0:
+            # the opponent loses: win as fast as possible
+            if best_win is None or child + 1 < best_win:
+                best_win = child + 1
+        elif best_loss is None or child + 1 > best_loss:
+            best_loss = child + 1
+    if best_win is not None:
+        value = best_win
+    else:
+        value = 0 if best_loss is None else best_loss
+    memo[code] = value
+    return value
+
+
+def _solve_subtree(args):
+    """Pool worker: solve one position and return all solved positions."""
+    width, height, state = args
+    memo = {}
+    solve_position(Encoder(width, height), *state, memo=memo)
+    return memo
+
+
+def solve_board(width, height, opening=(), split_plies=2, processes=None):
+    """Solve every position reachable from a position on several cores.
+
+    Parameters
+    ----------
+    width, height : int
+        Board dimensions.
+
+    opening : sequence<(int, int)> (optional)
+        Moves leading to the position to solve; the empty board by default.
+        A partial solve of a larger board starts from a longer opening.
+
+    split_plies : int (optional)
+        Depth below the position at which the tree is split into tasks.
+
+    processes : int (optional)
+        Number of worker processes; defaults to the number of cores. 1 runs
+        everything in this process.
+
+    Returns
+    ----------
+    (int, dict<int, int>)
+        The value of the position and the values of all solved positions
+        keyed by canonical code.
+    """
+    encoder = Encoder(width, height)
+    game = Board("p1", "p2", width, height)
+    for move in opening:
+        game.apply_move(move)
+    root = encoder.state(game)
+
+    # distinct positions at the split depth, up to symmetry
+    frontier = {encoder.canonical(*root): root}
+    for _ in range(split_plies):
+        following = {}
+        for blanks, here, there in frontier.values():
+            for move in encoder.moves(blanks, here):
+                child = (blanks & ~(1 << move), there, move)
+                following.setdefault(encoder.canonical(*child), child)
+        if not following:
+            break
+        frontier = following
+
+    tasks = [(width, height, state) for state in frontier.values()]
+    memo = {}
+    if processes == 1:
+        for result in map(_solve_subtree, tasks):
+            memo.update(result)
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            for result in pool.imap_unordered(_solve_subtree, tasks):
+                memo.update(result)
+    value = solve_position(encoder, *root, memo=memo)
+    return value, memo
+
+
+def save_solution(path, width, height, memo):
+    """Store solved positions in the record format of `tablebase`."""
+    write_records(path, MAGIC, width, height, 0, memo.items())
+
+
+class Solution(RecordFile):
+    """
+    Solved positions stored by `save_solution()`.
+
+    Parameters
+    ----------
+    path : str
+        File to open.
+    """
+
+    def __init__(self, path):
+        super(Solution, self).__init__(path, MAGIC)
+        self.encoder = Encoder(self.width, self.height)
+
+    def value(self, game):
+        """Return the value of the position in a `Board` (plies to the end;
+        odd when the player to move wins), or None if it is not stored."""
+        if (game.width, game.height) != (self.width, self.height):
+            return None
+        return self.lookup(self.encoder.canonical(*self.encoder.state(game)))
+
+    def positions(self):
+        """Iterate over (blanks, player to move, other player, value) of all
+        stored positions."""
+        for i in range(self.count):
+            code, value = self.record(i)
+            yield self.encoder.decode(code) + (value,)
+
+
+def board_from_state(encoder, blanks, here, there, player_1="p1", player_2="p2"):
+    """Build a `Board` with `player_1` to move from a decoded position."""
+    game = Board(player_1, player_2, encoder.width, encoder.height)
+    # filled cells carry the symbol of the second player; only the blank
+    # cells and the locations matter to the game
+    state = [[Board.BLANK if blanks >> encoder.tables.index[(r, c)] & 1 else 2
+              for c in range(encoder.width)] for r in range(encoder.height)]
+    cells = encoder.tables.cells
+    if here >= 0:
+        state[cells[here][0]][cells[here][1]] = 1
+    locations = {player_1: None if here < 0 else cells[here],
+                 player_2: None if there < 0 else cells[there]}
+    # replacing the grid and the locations makes the board resynchronize
+    game.__board_state__ = state
+    game.__last_player_move__ = locations
+    game.move_count = encoder.cells - bin(blanks).count("1")
+    return game
+
+
+def grade_heuristic(solution, score_fn, samples=1000, seed=0):
+    """Compare a heuristic with the true values of solved positions.
+
+    In the positions of a random sample where the player to move has a
+    choice, the heuristic picks the move with the best score for the player
+    to move (a one-ply search).
+
+    Parameters
+    ----------
+    solution : `Solution`
+        Solved positions.
+
+    score_fn : callable
+        Heuristic with the signature of `CustomPlayer.score`.
+
+    samples : int (optional)
+        Number of stored positions drawn.
+
+    seed : int (optional)
+        Seed of the sample.
+
+    Returns
+    ----------
+    dict
+        "move_accuracy": share of positions where the picked move keeps the
+        best result (a win stays a win); "outcome_accuracy": share of
+        decided positions where the sign of the heuristic score of the
+        position predicts the winner; "positions": number of positions used.
+    """
+    rng = random.Random(seed)
+    encoder = solution.encoder
+    indices = rng.sample(range(solution.count), min(samples, solution.count))
+    kept, predicted, decided, used = 0, 0, 0, 0
+    for i in indices:
+        code, value = solution.record(i)
+        blanks, here, there = encoder.decode(code)
+        game = board_from_state(encoder, blanks, here, there)
+        player = game.active_player
+        moves = game.get_legal_moves()
+        if len(moves) < 2:
+            continue
+        used += 1
+        move = max(moves, key=lambda m: score_fn(game.forecast_move(m), player))
+        child = solution.value(game.forecast_move(move))
+        if child is not None and (child % 2 == 0) == (value % 2 == 1):
+            kept += 1
+        score = score_fn(game, player)
+        if score != 0:
+            decided += 1
+            if (score > 0) == (value % 2 == 1):
+                predicted += 1
+    return {"move_accuracy": kept / used if used else 0.,
+            "outcome_accuracy": predicted / decided if decided else 0.,
+            "positions": used}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--width", type=int, default=5)
+    parser.add_argument("--height", type=int, default=5)
+    parser.add_argument("--opening", type=int, nargs="*", default=[],
+                        help="moves (row col pairs) leading to the position to solve")
+    parser.add_argument("--split-plies", type=int, default=2)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--grade", nargs="*", default=[], choices=sorted(SCORE_FUNCTIONS),
+                        help="heuristics to grade against the stored solution")
+    parser.add_argument("--samples", type=int, default=1000)
+    args = parser.parse_args()
+    if args.grade and args.out is None:
+        parser.error("--grade needs --out")
+
+    opening = list(zip(args.opening[::2], args.opening[1::2]))
+    value, memo = solve_board(args.width, args.height, opening, args.split_plies,
+                              args.processes)
+    print("{}x{} after {}: player to move {} in {} plies ({} positions)".format(
+        args.width, args.height, opening or "no moves", "wins" if value % 2 else "loses",
+        value, len(memo)))
+    if args.out is not None:
+        save_solution(args.out, args.width, args.height, memo)
+        print("Stored the solution in {}".format(args.out))
+    if args.grade:
+        solution = Solution(args.out)
+        for name in args.grade:
+            grades = grade_heuristic(solution, SCORE_FUNCTIONS[name], args.samples)
+            print("{:<16} move accuracy {:.3f}, outcome accuracy {:.3f} ({} positions)".format(
+                name, grades["move_accuracy"], grades["outcome_accuracy"], grades["positions"]))
+        solution.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Test cases for the exhaustive solver.
+"""
+import os
+import random
+import tempfile
+import unittest
+
+import isolation
+import solver
+
+from sample_players import improved_score
+
+
+def negamax(game):
+    """Plies to the end of a `Board` with best play (odd when the player to
+    move wins), by plain search without symmetry or memo."""
+    wins, losses = [], []
+    for move in game.get_legal_moves():
+        child = negamax(game.forecast_move(move))
+        (wins if child % 2 == 0 else losses).append(child + 1)
+    if wins:
+        return min(wins)
+    return max(losses) if losses else 0
+
+
+class SolverTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.value, cls.memo = solver.solve_board(4, 4, processes=1)
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "solution.bin")
+        solver.save_solution(cls.path, 4, 4, cls.memo)
+        cls.solution = solver.Solution(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.solution.close()
+        cls.directory.cleanup()
+
+    def test_symmetric_positions_share_a_code(self):
+        """ Rotated and reflected positions have the same canonical code """
+        encoder = solver.Encoder(4, 4)
+        game = isolation.Board('p1', 'p2', 4, 4)
+        for move in [(0, 1), (3, 3), (2, 2)]:
+            game.apply_move(move)
+        mirrored = isolation.Board('p1', 'p2', 4, 4)
+        for row, col in [(0, 1), (3, 3), (2, 2)]:
+            mirrored.apply_move((col, 3 - row))
+        self.assertEqual(encoder.canonical(*encoder.state(game)),
+                         encoder.canonical(*encoder.state(mirrored)))
+        code = encoder.canonical(*encoder.state(game))
+        self.assertEqual(encoder.canonical(*encoder.decode(code)), code)
+
+    def test_values_match_plain_search(self):
+        """ Stored values equal a search without memo on random positions """
+        checked = 0
+        for seed in range(40):
+            rng = random.Random(seed)
+            game = isolation.Board('p1', 'p2', 4, 4)
+            while game.blank_count() > 9 and game.get_legal_moves():
+                game.apply_move(rng.choice(game.get_legal_moves()))
+            self.assertEqual(self.solution.value(game), negamax(game))
+            checked += 1
+        self.assertEqual(checked, 40)
+
+    def test_parallel_solve_and_partial_solve(self):
+        """ Worker processes give the same result, and a solve from an
+        opening only stores positions below it """
+        value, memo = solver.solve_board(4, 4, processes=2)
+        self.assertEqual((value, memo), (self.value, self.memo))
+        game = isolation.Board('p1', 'p2', 4, 4)
+        game.apply_move((0, 0))
+        game.apply_move((1, 1))
+        value, memo = solver.solve_board(4, 4, [(0, 0), (1, 1)], processes=1)
+        self.assertEqual(value, self.solution.value(game))
+        self.assertLess(len(memo), len(self.memo))
+        self.assertIsNone(self.solution.value(isolation.Board('p1', 'p2', 5, 5)))
+
+    def test_board_from_state_and_grading(self):
+        """ Decoded positions rebuild equivalent boards, and grading reports
+        shares between 0 and 1 """
+        encoder = self.solution.encoder
+        for blanks, here, there, value in list(self.solution.positions())[::997]:
+            game = solver.board_from_state(encoder, blanks, here, there)
+            self.assertEqual(game.blank_mask(), blanks)
+            self.assertEqual(self.solution.value(game), value)
+        grades = solver.grade_heuristic(self.solution, improved_score, samples=200)
+        self.assertGreater(grades["positions"], 0)
+        for key in ("move_accuracy", "outcome_accuracy"):
+            self.assertTrue(0 <= grades[key] <= 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+"""
+Endgame tablebase of longest knight paths in small regions.
+
+Late in a game a player can often reach only a small set of blank cells,
+and its future depends only on the longest knight path through them. The
+generator enumerates every connected set of at most `max_cells` blank cells
+of the knight graph together with every cell a knight can enter it from,
+computes the exact longest path from that cell by dynamic programming over
+smaller regions, and stores the results on disk.
+
+The file is a header followed by sorted fixed-size records (see
+`write_records()`), read through `mmap` and searched by bisection, so only
+the pages that are actually probed are loaded. Regions are bitmasks in the
+layout of `isolation.bitboard`; since a region only contains cells of the
+board it was built for, a table built for 7x7 answers queries for any
+board whose cells fit inside 7x7.
+
+`load_tablebase()` returns the default table if it was generated, and None
+otherwise; `heuristics.longest_path_value` and `CustomPlayer(tablebase=...)`
+use it when a region is small enough.
+
+Example:
+
+    python tablebase.py --max-cells 6
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+
+from isolation.bitboard import iter_bits
+from isolation.bitboard import knight_tables
+from isolation.bitboard import reachable
+
+TABLEBASE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "tablebase.bin")
+MAX_CELLS = 5  # default size of the largest region in the table
+
+# header: magic, board width and height, table parameter, record count;
+# records: little-endian uint64 (key << 8 | value), sorted by key
+MAGIC = b"ISOTABLE"
+HEADER = struct.Struct("<8sHHHxxQ")
+RECORD = struct.Struct("<Q")
+
+
+def write_records(path, magic, width, height, param, records):
+    """Store (key, value) pairs as a sorted record file.
+
+    Parameters
+    ----------
+    path : str
+        Output file.
+
+    magic : bytes
+        Eight bytes identifying the kind of table.
+
+    width, height : int
+        Dimensions of the board the keys refer to.
+
+    param : int
+        Table-specific parameter stored in the header (e.g. the largest
+        region size).
+
+    records : iterable<(int, int)>
+        Keys below 2**56 and values in range(256).
+    """
+    records = sorted(records)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(magic, width, height, param, len(records)))
+        for key, value in records:
+            f.write(RECORD.pack(key << 8 | value))
+
+
+class RecordFile(object):
+    """
+    Read-only view of a file written by `write_records()`.
+
+    Parameters
+    ----------
+    path : str
+        File to open.
+
+    magic : bytes (optional)
+        Expected kind of table; a ValueError is raised on a mismatch.
+    """
+
+    def __init__(self, path, magic=None):
+        self.path = path
+        self._digest = None
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        found, self.width, self.height, self.param, self.count = \
+            HEADER.unpack_from(self._map, 0)
+        if magic is not None and found != magic:
+            self._map.close()
+            raise ValueError("{0} is not a {1} file".format(path, magic.decode()))
+
+    def record(self, i):
+        """Return the `i`-th record as a (key, value) pair."""
+        record, = RECORD.unpack_from(self._map, HEADER.size + RECORD.size * i)
+        return record >> 8, record & 0xFF
+
+    def lookup(self, key):
+        """Return the value stored for `key`, or None."""
+        lo, hi = 0, self.count
+        data = self._map
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record, = RECORD.unpack_from(data, HEADER.size + RECORD.size * mid)
+            if record >> 8 < key:
+                lo = mid + 1
+            elif record >> 8 > key:
+                hi = mid
+            else:
+                return record & 0xFF
+        return None
+
+    def digest(self):
+        """Return a short hash of the file contents (computed once)."""
+        if self._digest is None:
+            self._digest = hashlib.sha1(self._map).hexdigest()[:12]
+        return self._digest
+
+    def close(self):
+        """Release the memory map."""
+        self._map.close()
+
+
+class Tablebase(RecordFile):
+    """
+    Longest knight paths from an entry cell through a small region.
+
+    Parameters
+    ----------
+    path : str (optional)
+        Table generated by `generate_table()`.
+    """
+
+    def __init__(self, path=TABLEBASE_FILE):
+        super(Tablebase, self).__init__(path, MAGIC)
+        self.max_cells = self.param
+        self.tables = knight_tables(self.width, self.height)
+
+    def longest_path_mask(self, cell, blanks):
+        """Return the number of moves of the longest knight path from the
+        bit index `cell` through the cells of the bitmask `blanks` (in the
+        table's layout), or None when the reachable region is too large.
+        """
+        region = reachable(self.tables.neighbor_masks, blanks, cell, self.max_cells)
+        if region is None:
+            return None
+        if not region:
+            return 0
+        return self.lookup(cell << len(self.tables.cells) | region)
+
+    def longest_path(self, loc, blanks):
+        """Same as `longest_path_mask()` for a (row, col) location and an
+        iterable of blank (row, col) cells. Returns None when a cell lies
+        outside the table's board or the region is too large.
+        """
+        index = self.tables.index
+        if loc not in index:
+            return None
+        mask = 0
+        for cell in blanks:
+            i = index.get(cell)
+            if i is None:
+                return None
+            mask |= 1 << i
+        return self.longest_path_mask(index[loc], mask)
+
+
+def connected_sets(neighbor_masks, max_size):
+    """Yield, by increasing size, every connected set of at most `max_size`
+    cells of the knight graph as a bitmask."""
+    level = set(1 << i for i in range(len(neighbor_masks)))
+    for size in range(1, max_size + 1):
+        for cells in sorted(level):
+            yield cells
+        if size == max_size:
+            break
+        grown = set()
+        for cells in level:
+            border = 0
+            for i in iter_bits(cells):
+                border |= neighbor_masks[i]
+            for i in iter_bits(border & ~cells):
+                grown.add(cells | 1 << i)
+        level = grown
+
+
+def generate_table(width=7, height=7, max_cells=MAX_CELLS):
+    """Compute the longest path from every entry cell of every region of at
+    most `max_cells` cells.
+
+    Returns
+    ----------
+    dict<int, int>
+        Maps `entry << (width * height) | region` to the path length.
+    """
+    tables = knight_tables(width, height)
+    masks = tables.neighbor_masks
+    shift = len(tables.cells)
+    if (shift - 1).bit_length() + shift > 56:
+        raise ValueError("Keys of a {0}x{1} board do not fit in a record".format(width, height))
+    paths = {}
+    # a region with its entry cell is a connected set of one more cell; the
+    # regions left after each first move are smaller, so they are known
+    for cells in connected_sets(masks, max_cells + 1):
+        if cells & (cells - 1) == 0:
+            continue
+        for entry in iter_bits(cells):
+            region = cells & ~(1 << entry)
+            best = 0
+            for step in iter_bits(masks[entry] & region):
+                rest = reachable(masks, region & ~(1 << step), step)
+                length = 1 + (paths[step << shift | rest] if rest else 0)
+                if length > best:
+                    best = length
+            paths[entry << shift | region] = best
+    return paths
+
+
+def generate(path=TABLEBASE_FILE, width=7, height=7, max_cells=MAX_CELLS):
+    """Generate a table and store it in `path`. Returns the record count."""
+    paths = generate_table(width, height, max_cells)
+    write_records(path, MAGIC, width, height, max_cells, paths.items())
+    return len(paths)
+
+
+_loaded = {}
+
+
+def load_tablebase(path=TABLEBASE_FILE):
+    """Return the `Tablebase` stored in `path` (opened once), or None if it
+    has not been generated."""
+    if path not in _loaded:
+        _loaded[path] = Tablebase(path) if os.path.exists(path) else None
+    return _loaded[path]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--width", type=int, default=7)
+    parser.add_argument("--height", type=int, default=7)
+    parser.add_argument("--max-cells", type=int, default=MAX_CELLS)
+    parser.add_argument("--out", default=TABLEBASE_FILE)
+    args = parser.parse_args()
+
+    count = generate(args.out, args.width, args.height, args.max_cells)
+    print("Stored {} regions in {}".format(count, args.out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Test cases for the endgame tablebase.
+"""
+import os
+import random
+import tempfile
+import unittest
+
+from unittest import mock
+
+import isolation
+import game_agent
+import heuristics
+import tablebase
+
+from isolation.bitboard import knight_tables
+from sample_players import improved_score
+
+
+def brute_force_path(neighbor_masks, cell, blanks):
+    """Longest knight path from `cell` through the bitmask `blanks`."""
+    best = 0
+    options = neighbor_masks[cell] & blanks
+    while options:
+        low = options & -options
+        options ^= low
+        step = low.bit_length() - 1
+        best = max(best, 1 + brute_force_path(neighbor_masks, step, blanks & ~low))
+    return best
+
+
+class TablebaseTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "tablebase.bin")
+        tablebase.generate(cls.path, 5, 5, max_cells=6)
+        cls.table = tablebase.Tablebase(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.table.close()
+        cls.directory.cleanup()
+
+    def test_paths_match_brute_force(self):
+        """ Stored paths equal an exhaustive search on random regions """
+        masks = knight_tables(5, 5).neighbor_masks
+        rng = random.Random(0)
+        checked = 0
+        while checked < 300:
+            blanks = rng.getrandbits(25)
+            cell = rng.randrange(25)
+            blanks &= ~(1 << cell)
+            value = self.table.longest_path_mask(cell, blanks)
+            region = isolation.bitboard.reachable(masks, blanks, cell)
+            if bin(region).count("1") > 6:
+                self.assertIsNone(value)
+                continue
+            self.assertEqual(value, brute_force_path(masks, cell, blanks))
+            checked += 1
+
+    def test_lookup_of_missing_key(self):
+        """ Unknown keys and foreign files are rejected """
+        self.assertIsNone(self.table.lookup(1))
+        self.assertIsNone(self.table.longest_path((9, 9), []))
+        with tempfile.NamedTemporaryFile(suffix=".bin", delete=False) as f:
+            other = f.name
+        try:
+            tablebase.write_records(other, b"OTHERTAB", 5, 5, 0, [(1, 2)])
+            self.assertEqual(tablebase.RecordFile(other).lookup(1), 2)
+            with self.assertRaises(ValueError):
+                tablebase.Tablebase(other)
+        finally:
+            os.remove(other)
+
+    def test_heuristic_uses_table(self):
+        """ longest_path_value gives the same values with and without the
+        table """
+        rng = random.Random(1)
+        cells = [(r, c) for r in range(5) for c in range(5)]
+        for _ in range(50):
+            blanks = set(rng.sample(cells, 9))
+            loc = rng.choice([c for c in cells if c not in blanks])
+            with mock.patch.dict(tablebase._loaded, {tablebase.TABLEBASE_FILE: None}):
+                expected = heuristics.longest_path_value(loc, blanks)
+            with mock.patch.dict(tablebase._loaded, {tablebase.TABLEBASE_FILE: self.table}):
+                self.assertEqual(heuristics.longest_path_value(loc, blanks), expected)
+
+    def test_fingerprint_identifies_table(self):
+        """ Agents with a proven cache or with different tables have
+        different fingerprints, since both change the chosen moves """
+        def fingerprint(**kwargs):
+            return game_agent.CustomPlayer(score_fn=improved_score, node_limit=2000,
+                                           **kwargs).fingerprint()
+
+        other_path = os.path.join(self.directory.name, "small.bin")
+        tablebase.generate(other_path, 5, 5, max_cells=4)
+        other = tablebase.Tablebase(other_path)
+        try:
+            fingerprints = [fingerprint(), fingerprint(proven_cache=True),
+                            fingerprint(tablebase=self.table), fingerprint(tablebase=other)]
+            self.assertEqual(len(set(fingerprints)), 4)
+            self.assertEqual(fingerprint(tablebase=self.table),
+                             fingerprint(tablebase=tablebase.Tablebase(self.path)))
+
+            # the same file regenerated with other contents
+            other.close()
+            tablebase.generate(other_path, 5, 5, max_cells=3)
+            other = tablebase.Tablebase(other_path)
+            self.assertNotIn(fingerprint(tablebase=other), fingerprints)
+        finally:
+            other.close()
+
+    def test_search_with_table_finds_same_result(self):
+        """ In separated endgames the tablebase gives the same proven score
+        and a move as good as the full search """
+        found = 0
+        for seed in range(60):
+            rng = random.Random(seed)
+            agent = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta',
+                                            tablebase=self.table)
+            plain = game_agent.CustomPlayer(score_fn=improved_score, method='alphabeta')
+            agent.time_left = plain.time_left = lambda: float("inf")
+            board = isolation.Board(agent, 'null_agent', 5, 5)
+            plain_board = isolation.Board(plain, 'null_agent', 5, 5)
+            while board.blank_count() > 11 and board.get_legal_moves():
+                move = rng.choice(board.get_legal_moves())
+                board.apply_move(move)
+                plain_board.apply_move(move)
+            if board.active_player is not agent or not board.get_legal_moves():
+                continue
+            solved = agent._probe_tablebase(board)
+            if solved is None:
+                continue
+            found += 1
+            score, move = solved
+            depth = board.blank_count()
+            expected, _ = plain.alphabeta(plain_board, depth)
+            self.assertEqual(score, expected)
+            self.assertEqual(agent.alphabeta(board, depth)[0], expected)
+            self.assertEqual(plain.alphabeta(plain_board.forecast_move(move), depth,
+                                             maximizing_player=False)[0], expected)
+        self.assertGreater(found, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,10 +7,11 @@ implementation, so any errors present in that class will affect the outcome
 here.
 
 The student agent plays a fixed number of "fair" matches against each test
-agent. The matches are fair because the board is initialized randomly for both
-players, and the players play each match twice -- switching the player order
-between games. This helps to correct for imbalances in the game due to both
-starting position and initiative.
+agent. The matches are fair because the board is initialized with the same
+opening for both players (taken in order from the balanced suite in
+openings.json, or chosen randomly), and the players play each match twice --
+switching the player order between games. This helps to correct for
+imbalances in the game due to both starting position and initiative.
 
 For example, if the random moves chosen for initialization are (5, 2) and
 (1, 3), then the first match will place agentA at (5, 2) as player 1 and
@@ -19,11 +20,17 @@ initiative in the second match with agentB at (5, 2) as player 1 and agentA at
 (1, 3) as player 2.
 """
 
+import argparse
 import itertools
+import json
+import math
+import os
 import random
 import warnings
+import zlib
 
 from collections import namedtuple
+from statistics import NormalDist
 
 from isolation import Board
 from sample_players import RandomPlayer
@@ -32,9 +39,20 @@ from sample_players import open_move_score
 from sample_players import improved_score
 from game_agent import CustomPlayer
 from game_agent import custom_score
+from mcts import MCTSPlayer
+from openings import OPENINGS_FILE
+from openings import load_openings
+from openings import random_opening
 
 NUM_MATCHES = 5  # number of matches against each opponent
 TIME_LIMIT = 150  # number of milliseconds before timeout
+RESULT_CACHE = "tournament_cache.jsonl"  # outcomes of deterministic games
+COMPARE_DEPTH = 6  # depth of the searches compared by compare_search()
+
+# search options of the ID_Improved_Pruned agent (see CustomPlayer); the
+# futility margin is in legal moves, the scale of improved_score
+PRUNING_ARGS = {"order_moves": True, "late_move_reduction": 2, "futility_margin": 2.}
+RAVE_EQUIVALENCE = 300  # RAVE setting of the MCTS_RAVE agent
 
 TIMEOUT_WARNING = "One or more agents lost a match this round due to " + \
                   "timeout. The get_move() function must return before " + \
@@ -56,28 +74,228 @@ same opponents.
 
 Agent = namedtuple("Agent", ["player", "name"])
 
+# A single match of a round: the names of the agents moving first and second
+# in the first game, the opening moves and the seed for the `random` module.
+MatchJob = namedtuple("MatchJob", ["first", "second", "opening", "seed"])
+
+# Sequential probability ratio test settings: H0 says the agent under test is
+# `elo0` stronger than its opponent, H1 says it is `elo1` stronger; `alpha`
+# and `beta` are the accepted false positive and false negative rates.
+SPRT = namedtuple("SPRT", ["elo0", "elo1", "alpha", "beta"])
+
+
+def elo_to_score(elo):
+    """Return the expected score of a player `elo` points stronger."""
+    return 1. / (1. + 10. ** (-elo / 400.))
+
+
+def score_to_elo(score):
+    """Return the Elo difference corresponding to an expected score."""
+    if score <= 0.:
+        return float("-inf")
+    if score >= 1.:
+        return float("inf")
+    return -400. * math.log10(1. / score - 1.)
+
+
+def elo_estimate(wins, losses, confidence=0.95):
+    """Estimate the Elo difference from a win/loss record.
+
+    Returns
+    ----------
+    (float, float, float)
+        The Elo estimate and the lower and upper bounds of its confidence
+        interval. The interval is the Wilson score interval, which keeps a
+        sensible width for records with few (or no) wins or losses, and the
+        estimate is its center, so that a perfect record gives a finite
+        estimate and lower bound.
+    """
+    games = wins + losses
+    if games == 0:
+        return 0., float("-inf"), float("inf")
+    score = wins / games
+    z = NormalDist().inv_cdf(0.5 + confidence / 2.)
+    center = (score + z * z / (2. * games)) / (1. + z * z / games)
+    margin = (z / (1. + z * z / games)
+              * math.sqrt(score * (1. - score) / games + z * z / (4. * games * games)))
+    return (score_to_elo(center), score_to_elo(center - margin),
+            score_to_elo(center + margin))
+
+
+def sprt_llr(wins, losses, elo0, elo1):
+    """Log-likelihood ratio of H1 (`elo1`) against H0 (`elo0`) for a win/loss
+    record. Isolation has no draws, so the binomial model is exact.
+    """
+    p0, p1 = elo_to_score(elo0), elo_to_score(elo1)
+    return wins * math.log(p1 / p0) + losses * math.log((1. - p1) / (1. - p0))
+
+
+def sprt_decision(wins, losses, sprt):
+    """Return "H0" or "H1" once the SPRT accepts a hypothesis, else None."""
+    llr = sprt_llr(wins, losses, sprt.elo0, sprt.elo1)
+    if llr <= math.log(sprt.beta / (1. - sprt.alpha)):
+        return "H0"
+    if llr >= math.log((1. - sprt.beta) / sprt.alpha):
+        return "H1"
+    return None
+
+
+def agent_fingerprint(player):
+    """
+    Return the fingerprint of an agent that declares itself deterministic
+    (see `CustomPlayer.is_deterministic`), or None for any other agent.
+    """
+    if not getattr(player, "is_deterministic", False):
+        return None
+    return player.fingerprint()
+
 
-def play_match(player1, player2):
+def read_json_lines(path):
+    """
+    Return the entries of a JSON lines file. A last line cut short when a
+    previous run was killed is removed from the file, so that new entries
+    are appended on a line of their own; other unreadable lines are skipped.
+    """
+    entries = []
+    with open(path, "rb+") as f:
+        offset = 0
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                if not line.endswith(b"\n"):
+                    f.truncate(offset)
+                    break
+            offset += len(line)
+        else:
+            if offset and not line.endswith(b"\n"):
+                # complete entry without its newline
+                f.write(b"\n")
+    return entries
+
+
+class ResultCache(object):
+    """
+    Outcomes of games between deterministic agents, keyed by the agent
+    fingerprints and the opening. Entries are appended to a JSON lines file
+    as they are recorded, so later tournaments can skip replaying them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.results = {}
+        if os.path.exists(path):
+            for entry in read_json_lines(path):
+                self.results[entry["key"]] = (entry["winner"], entry["termination"])
+
+    @staticmethod
+    def key(player1, player2, opening):
+        """Return the cache key of a game, or None if it is not cacheable."""
+        fingerprints = agent_fingerprint(player1), agent_fingerprint(player2)
+        if None in fingerprints:
+            return None
+        return json.dumps([fingerprints, [list(move) for move in opening]])
+
+    def lookup(self, key):
+        """Return (winner index, termination) for a cached game, or None."""
+        return self.results.get(key)
+
+    def store(self, key, winner_index, termination):
+        """Record the outcome of a game; `winner_index` is 1 or 2."""
+        self.results[key] = (winner_index, termination)
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"key": key, "winner": winner_index,
+                                "termination": termination}) + "\n")
+
+
+def derive_seed(seed, pairing, match_id):
+    """Derive a reproducible seed for one match of a round."""
+    return zlib.crc32(json.dumps([seed, list(pairing), match_id]).encode())
+
+
+class ResultsLog(object):
+    """
+    Finished matches appended to a JSON lines file as soon as they complete,
+    keyed by (pairing, opening, seed). With `resume=True` the entries of an
+    existing log are loaded so an interrupted tournament can skip them;
+    otherwise the log is started from scratch.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.matches = {}
+        if resume and os.path.exists(path):
+            # drops a line cut short when the previous run was killed, so
+            # that new records do not get appended to it
+            for entry in read_json_lines(path):
+                self.matches[entry["key"]] = tuple(entry["scores"])
+        else:
+            open(path, "w").close()
+
+    @staticmethod
+    def key(pairing, opening, seed):
+        """Return the log key of a match."""
+        return json.dumps([list(pairing), [list(move) for move in opening], seed])
+
+    def lookup(self, key):
+        """Return the scores of a logged match, or None."""
+        return self.matches.get(key)
+
+    def record(self, key, scores):
+        """Append the scores of a finished match to the log."""
+        self.matches[key] = tuple(scores)
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"key": key, "scores": list(scores)}) + "\n")
+
+
+def play_game(player1, player2, opening, cache=None):
+    """
+    Play a single game from the given opening and return the winner and the
+    reason the game ended. Games between deterministic agents are looked up
+    in (and added to) `cache` when one is given.
+    """
+    key = ResultCache.key(player1, player2, opening) if cache is not None else None
+    if key is not None and cache.lookup(key) is not None:
+        winner_index, termination = cache.lookup(key)
+        return (player1 if winner_index == 1 else player2), termination
+
+    game = Board(player1, player2)
+    for move in opening:
+        game.apply_move(move)
+
+    timeouts = [getattr(p, "search_timeouts", 0) for p in (player1, player2)]
+    winner, _, termination = game.play(time_limit=TIME_LIMIT)
+
+    # a search aborted by the timer makes the outcome depend on the machine
+    aborted = timeouts != [getattr(p, "search_timeouts", 0) for p in (player1, player2)]
+    if key is not None and termination != "timeout" and not aborted:
+        cache.store(key, 1 if winner == player1 else 2, termination)
+
+    return winner, termination
+
+
+def play_match(player1, player2, opening=None, cache=None):
     """
     Play a "fair" set of matches between two agents by playing two games
-    between the players, forcing each agent to play from randomly selected
-    positions. This should control for differences in outcome resulting from
+    between the players, forcing each agent to play from the same opening
+    position. This should control for differences in outcome resulting from
     advantage due to starting position on the board.
+
+    `opening` is a sequence of an even number of moves applied to both games
+    before the agents take over; when omitted, a random move and response
+    are used. `cache` is an optional `ResultCache`.
     """
     num_wins = {player1: 0, player2: 0}
     num_timeouts = {player1: 0, player2: 0}
     num_invalid_moves = {player1: 0, player2: 0}
-    games = [Board(player1, player2), Board(player2, player1)]
 
-    # initialize both games with a random move and response
-    for _ in range(2):
-        move = random.choice(games[0].get_legal_moves())
-        games[0].apply_move(move)
-        games[1].apply_move(move)
+    # initialize both games with the opening moves
+    if opening is None:
+        opening = random_opening(Board(player1, player2))
 
     # play both games and tally the results
-    for game in games:
-        winner, _, termination = game.play(time_limit=TIME_LIMIT)
+    for first, second in ((player1, player2), (player2, player1)):
+        winner, termination = play_game(first, second, opening, cache)
 
         if player1 == winner:
             num_wins[player1] += 1
@@ -102,9 +320,64 @@ def play_match(player1, player2):
     return num_wins[player1], num_wins[player2]
 
 
-def play_round(agents, num_matches):
+def pairing_jobs(agent_1, agent_2, num_matches, openings=None, seed=0):
+    """
+    Return the matches of one pairing as `MatchJob` tuples, in the order in
+    which they are played. Each player takes a turn going first, and every
+    match gets a seed derived from `seed`, the pairing and the match number.
+    """
+    jobs = []
+    opening_ids = itertools.count()
+    for match_id in range(num_matches):
+        for first, second in itertools.permutations((agent_1.name, agent_2.name)):
+            match_seed = derive_seed(seed, [first, second], match_id)
+            if openings:
+                opening = openings[next(opening_ids) % len(openings)]
+            else:
+                random.seed(match_seed)
+                opening = random_opening(Board(first, second))
+            jobs.append(MatchJob(first, second, [tuple(m) for m in opening], match_seed))
+    return jobs
+
+
+def run_job(job, players, cache=None):
+    """
+    Play the match described by `job`; `players` maps agent names to player
+    objects. Returns the scores of the first and the second agent.
+    """
+    random.seed(job.seed)
+    return play_match(players[job.first], players[job.second], job.opening, cache)
+
+
+def print_result(score_1, score_2, sprt=None, decision=None):
+    """Print the result, the Elo estimate and the SPRT decision of a pairing."""
+    elo, lower, upper = elo_estimate(score_1, score_2)
+    print("\tResult: {} to {}".format(int(score_1), int(score_2)), end=' ')
+    print("\tElo: {:+.0f} [{:+.0f}, {:+.0f}]".format(elo, lower, upper), end=' ')
+    if sprt is not None:
+        print("\tSPRT: {}".format(decision or "inconclusive"), end='')
+    print()
+
+
+def play_round(agents, num_matches, sprt=None, openings=None, cache=None,
+               log=None, seed=0):
     """
     Play one round (i.e., a single match between each pair of opponents)
+
+    When `sprt` is given, `num_matches` becomes an upper bound and each
+    pairing stops as soon as the sequential probability ratio test accepts
+    either hypothesis.
+
+    When `openings` is given, every pairing walks through the opening suite
+    in order (wrapping around if needed) instead of using random openings.
+
+    When `cache` (a `ResultCache`) is given, games between deterministic
+    agents are only played if their outcome is not cached yet.
+
+    Every match seeds the `random` module with a value derived from `seed`,
+    the pairing and the match number, so a round is reproducible. When `log`
+    (a `ResultsLog`) is given, finished matches are appended to it and
+    matches already in it are not played again.
     """
     agent_1 = agents[-1]
     wins = 0.
@@ -115,34 +388,96 @@ def play_round(agents, num_matches):
 
     for idx, agent_2 in enumerate(agents[:-1]):
 
-        counts = {agent_1.player: 0., agent_2.player: 0.}
+        counts = {agent_1.name: 0., agent_2.name: 0.}
+        players = {agent_1.name: agent_1.player, agent_2.name: agent_2.player}
         names = [agent_1.name, agent_2.name]
         print("  Match {}: {!s:^11} vs {!s:^11}".format(idx + 1, *names), end=' ')
 
-        # Each player takes a turn going first
-        for p1, p2 in itertools.permutations((agent_1.player, agent_2.player)):
-            for _ in range(num_matches):
-                score_1, score_2 = play_match(p1, p2)
-                counts[p1] += score_1
-                counts[p2] += score_2
-                total += score_1 + score_2
+        decision = None
+        jobs = pairing_jobs(agent_1, agent_2, num_matches, openings, seed)
+        for job_id, job in enumerate(jobs):
+            key = ResultsLog.key([job.first, job.second], job.opening, job.seed)
+            scores = log.lookup(key) if log is not None else None
+            if scores is None:
+                scores = run_job(job, players, cache)
+                if log is not None:
+                    log.record(key, scores)
+            score_1, score_2 = scores
+            counts[job.first] += score_1
+            counts[job.second] += score_2
+            total += score_1 + score_2
+
+            # both players have gone first in the current match number
+            if sprt is not None and job_id % 2 == 1:
+                decision = sprt_decision(counts[agent_1.name],
+                                         counts[agent_2.name], sprt)
+                if decision is not None:
+                    break
+
+        wins += counts[agent_1.name]
+        print_result(counts[agent_1.name], counts[agent_2.name], sprt, decision)
 
-        wins += counts[agent_1.player]
+    return 100. * wins / total
 
-        print("\tResult: {} to {}".format(int(counts[agent_1.player]),
-                                          int(counts[agent_2.player])))
 
-    return 100. * wins / total
+def compare_search(configs, openings, depth=COMPARE_DEPTH, score_fn=improved_score):
+    """
+    Search the position after every opening to a fixed depth with one
+    alpha-beta agent per entry of `configs` (a list of (name, CustomPlayer
+    keyword arguments) pairs) and print the mean number of nodes expanded
+    and how often each agent picks the same move as the first one.
 
+    Returns a dict mapping names to (mean nodes, agreement) pairs.
+    """
+    moves = {}
+    nodes = {}
+    for name, kwargs in configs:
+        moves[name], nodes[name] = [], []
+        for opening in openings:
+            player = CustomPlayer(score_fn=score_fn, method='alphabeta',
+                                  depth_limit=depth, **kwargs)
+            game = Board(player, "opponent")
+            for move in opening:
+                game.apply_move(move)
+            moves[name].append(player.get_move(game, game.get_legal_moves(),
+                                               lambda: float("inf")))
+            nodes[name].append(player.nodes)
+
+    reference = moves[configs[0][0]]
+    summary = {}
+    print("\nSearch comparison (depth {}, {} positions):".format(depth, len(openings)))
+    print("----------")
+    for name, _ in configs:
+        mean_nodes = sum(nodes[name]) / len(nodes[name])
+        agreement = sum(a == b for a, b in zip(moves[name], reference)) / len(reference)
+        summary[name] = (mean_nodes, agreement)
+        print("  {!s:<20}{:>10.0f} nodes/move{:>8.0f}% same move".format(
+            name, mean_nodes, 100. * agreement))
+    return summary
 
-def main():
 
+def build_agents(node_limit=None, pruning=False, mcts=False):
+    """
+    Return the opponent agents and the agents under test used by `main()`.
+    Agent names are unique, so remote workers can rebuild the same agents
+    and look them up by name. With `node_limit`, the agents under test search
+    a fixed number of nodes per move instead of racing the clock, which
+    makes their games reproducible (and cacheable). With `pruning`, an
+    ID_Improved agent using late move reductions and futility pruning
+    (`PRUNING_ARGS`) is tested as well. With `mcts`, Monte Carlo tree search
+    agents with and without RAVE are tested too.
+    """
     HEURISTICS = [("Null", null_score),
                   ("Open", open_move_score),
                   ("Improved", improved_score)]
-    AB_ARGS = {"search_depth": 5, "method": 'alphabeta', "iterative": False}
-    MM_ARGS = {"search_depth": 3, "method": 'minimax', "iterative": False}
-    CUSTOM_ARGS = {"method": 'alphabeta', 'iterative': True}
+    # the depth limits make the fixed-depth searches ignore the clock (they
+    # take a few milliseconds per move), so their games can be cached
+    AB_ARGS = {"search_depth": 5, "method": 'alphabeta', "iterative": False, "depth_limit": 5}
+    MM_ARGS = {"search_depth": 3, "method": 'minimax', "iterative": False, "depth_limit": 3}
+    # the clock is read at every node: with poll_interval='auto' the Student
+    # still loses on time when custom_score switches to its expensive
+    # evaluator in the middle of a search
+    CUSTOM_ARGS = {"method": 'alphabeta', 'iterative': True, 'node_limit': node_limit}
 
     # Create a collection of CPU agents using fixed-depth minimax or alpha beta
     # search, or random selection.  The agent names encode the search method
@@ -163,20 +498,84 @@ def main():
     
     test_agents = [Agent(CustomPlayer(score_fn=improved_score, **CUSTOM_ARGS), "ID_Improved"),
                    Agent(CustomPlayer(score_fn=custom_score, **CUSTOM_ARGS), "Student")]
+    if pruning:
+        test_agents.insert(1, Agent(CustomPlayer(score_fn=improved_score, **CUSTOM_ARGS,
+                                                 **PRUNING_ARGS), "ID_Improved_Pruned"))
+    if mcts:
+        test_agents += [Agent(MCTSPlayer(), "MCTS"),
+                        Agent(MCTSPlayer(rave_equivalence=RAVE_EQUIVALENCE), "MCTS_RAVE")]
     
     #test_agents = 5*[Agent(CustomPlayer(score_fn=custom_score, **CUSTOM_ARGS), "Student")]
     
     #test_agents = [Agent(CustomPlayer(score_fn=improved_score, **CUSTOM_ARGS), "ID_Improved")]
 
+    return random_agents + mm_agents + ab_agents, test_agents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--matches", type=int, default=NUM_MATCHES,
+                        help="number of matches against each opponent "
+                             "(maximum when --sprt is used)")
+    parser.add_argument("--sprt", action="store_true",
+                        help="stop each pairing once the SPRT is conclusive")
+    parser.add_argument("--elo0", type=float, default=0.,
+                        help="Elo difference under the null hypothesis")
+    parser.add_argument("--elo1", type=float, default=100.,
+                        help="Elo difference under the alternative hypothesis")
+    parser.add_argument("--alpha", type=float, default=0.05,
+                        help="false positive rate of the SPRT")
+    parser.add_argument("--beta", type=float, default=0.05,
+                        help="false negative rate of the SPRT")
+    parser.add_argument("--openings", default=OPENINGS_FILE,
+                        help="opening suite to play (see openings.py)")
+    parser.add_argument("--random-openings", action="store_true",
+                        help="use random openings instead of the suite")
+    parser.add_argument("--cache", default=RESULT_CACHE,
+                        help="file caching games between deterministic agents")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="replay every game instead of using the cache")
+    parser.add_argument("--log", default=None,
+                        help="append every finished match to this file")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip the matches already recorded in --log")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed from which every match seed is derived")
+    parser.add_argument("--node-limit", type=int, default=None,
+                        help="search this many nodes per move instead of "
+                             "racing the clock (agents under test)")
+    parser.add_argument("--pruning", action="store_true",
+                        help="also test ID_Improved with late move reductions "
+                             "and futility pruning, and compare node counts")
+    parser.add_argument("--mcts", action="store_true",
+                        help="also test Monte Carlo tree search agents")
+    args = parser.parse_args()
+    sprt = SPRT(args.elo0, args.elo1, args.alpha, args.beta) if args.sprt else None
+    openings = None if args.random_openings else load_openings(args.openings)
+    cache = None if args.no_cache else ResultCache(args.cache)
+    log = None if args.log is None else ResultsLog(args.log, args.resume)
+
+    opponents, test_agents = build_agents(args.node_limit, args.pruning, args.mcts)
+    if cache is not None:
+        for agent in test_agents:
+            if not agent_fingerprint(agent.player):
+                warnings.warn("{} searches on the clock, so none of its games are cached; "
+                              "use --node-limit to make them reproducible".format(agent.name))
+
     print(DESCRIPTION)
+    if args.pruning:
+        positions = openings or [random_opening(Board("p1", "p2")) for _ in range(20)]
+        compare_search([("ID_Improved", {}), ("ID_Improved_Pruned", PRUNING_ARGS)],
+                       positions)
     for agentUT in test_agents:
         print("")
         print("*************************")
         print("{:^25}".format("Evaluating: " + agentUT.name))
         print("*************************")
 
-        agents = random_agents + mm_agents + ab_agents + [agentUT]
-        win_ratio = play_round(agents, NUM_MATCHES)
+        agents = opponents + [agentUT]
+        win_ratio = play_round(agents, args.matches, sprt, openings, cache,
+                               log, args.seed)
 
         print("\n\nResults:")
         print("----------")
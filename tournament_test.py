@@ -0,0 +1,221 @@
+"""
+Test cases for the tournament helpers: Elo estimates, sequential probability
+ratio testing and match bookkeeping.
+"""
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+from unittest import mock
+
+import distributed
+import tournament
+
+from game_agent import CustomPlayer
+from heuristics import random_score
+from sample_players import RandomPlayer
+from sample_players import improved_score
+
+
+class TournamentTest(unittest.TestCase):
+
+    def test_build_agents_names_are_unique(self):
+        """ Remote workers look agents up by name, so names must be unique """
+        opponents, test_agents = tournament.build_agents()
+        names = [agent.name for agent in opponents + test_agents]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertIn("Student", names)
+        _, test_agents = tournament.build_agents(pruning=True, mcts=True)
+        names = [agent.name for agent in opponents + test_agents]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertIn("ID_Improved_Pruned", names)
+        self.assertIn("MCTS_RAVE", names)
+
+    def test_compare_search(self):
+        """ Identical configurations agree on every move and expand the same
+        number of nodes """
+        openings = tournament.load_openings()[:3]
+        summary = tournament.compare_search([("A", {}), ("B", {}),
+                                             ("Pruned", tournament.PRUNING_ARGS)],
+                                            openings, depth=3)
+        self.assertEqual(summary["A"], summary["B"])
+        self.assertEqual(summary["A"][1], 1.)
+        self.assertLessEqual(summary["Pruned"][0], summary["A"][0])
+
+    def test_elo_roundtrip(self):
+        """ Elo differences and expected scores are inverse functions """
+        for elo in (-300., -50., 0., 50., 300.):
+            score = tournament.elo_to_score(elo)
+            self.assertAlmostEqual(tournament.score_to_elo(score), elo)
+        self.assertEqual(tournament.score_to_elo(1.), float("inf"))
+
+    def test_elo_estimate_interval(self):
+        """ The confidence interval brackets the estimate and shrinks with
+        more games """
+        elo, lower, upper = tournament.elo_estimate(30, 10)
+        self.assertTrue(lower < elo < upper)
+        _, lower_big, upper_big = tournament.elo_estimate(300, 100)
+        self.assertLess(upper_big - lower_big, upper - lower)
+
+    def test_elo_estimate_perfect_record(self):
+        """ A perfect record has a finite estimate and lower bound, and a
+        record with one loss a wide interval """
+        elo, lower, upper = tournament.elo_estimate(10, 0)
+        self.assertTrue(0. < lower < elo < float("inf"))
+        self.assertEqual(upper, float("inf"))
+        elo, lower, upper = tournament.elo_estimate(0, 10)
+        self.assertTrue(float("-inf") < elo < upper < 0.)
+        elo, lower, upper = tournament.elo_estimate(19, 1)
+        self.assertTrue(lower < elo < upper)
+        self.assertGreater(upper - lower, 300.)
+
+    def test_sprt_decision(self):
+        """ The SPRT accepts H1 for a lopsided record, H0 for an even one,
+        and stays inconclusive for a short one """
+        sprt = tournament.SPRT(0., 100., 0.05, 0.05)
+        self.assertEqual(tournament.sprt_decision(40, 2, sprt), "H1")
+        self.assertEqual(tournament.sprt_decision(100, 100, sprt), "H0")
+        self.assertIsNone(tournament.sprt_decision(3, 2, sprt))
+
+    def test_play_round_sprt_stops_early(self):
+        """ play_round stops a clear pairing before the match limit """
+        agents = [tournament.Agent(RandomPlayer(), "Random"),
+                  tournament.Agent(RandomPlayer(), "Random2")]
+        sprt = tournament.SPRT(0., 1000., 0.5, 0.5)
+        with mock.patch("tournament.play_match",
+                        wraps=tournament.play_match) as play_match:
+            ratio = tournament.play_round(agents, 50, sprt)
+        self.assertEqual(play_match.call_count, 2)
+        self.assertTrue(0. <= ratio <= 100.)
+
+    def test_play_round_walks_opening_suite(self):
+        """ play_round plays the opening suite in order """
+        agents = [tournament.Agent(RandomPlayer(), "Random"),
+                  tournament.Agent(RandomPlayer(), "Random2")]
+        openings = [[(0, 0), (3, 3)], [(1, 2), (4, 4)], [(6, 6), (2, 2)]]
+        with mock.patch("tournament.play_match",
+                        wraps=tournament.play_match) as play_match:
+            tournament.play_round(agents, 2, openings=openings)
+        used = [call[0][2] for call in play_match.call_args_list]
+        self.assertEqual(used, openings + openings[:1])
+
+    def test_result_cache_skips_deterministic_replays(self):
+        """ Games between clock-free agents are replayed from the cache,
+        games involving a random agent are always played """
+        player1 = CustomPlayer(2, improved_score, iterative=False, method='alphabeta',
+                               depth_limit=2)
+        player2 = CustomPlayer(1, improved_score, iterative=False, method='alphabeta',
+                               depth_limit=1)
+        opening = [(3, 3), (0, 0)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.jsonl")
+            first = tournament.play_game(player1, player2, opening,
+                                         tournament.ResultCache(path))
+            with mock.patch("isolation.Board.play") as play:
+                second = tournament.play_game(player1, player2, opening,
+                                              tournament.ResultCache(path))
+            self.assertFalse(play.called)
+            self.assertEqual(first, second)
+
+            random_player = RandomPlayer()
+            cache = tournament.ResultCache(path)
+            tournament.play_game(player1, random_player, opening, cache)
+            self.assertIsNone(tournament.ResultCache.key(player1, random_player, opening))
+            self.assertEqual(len(cache.results), 1)
+
+    def test_clock_and_random_agents_are_not_cached(self):
+        """ Searches on the clock and random heuristics are not cacheable """
+        cases = [(CustomPlayer(2, improved_score, iterative=False), False),
+                 (CustomPlayer(score_fn=improved_score), False),
+                 (CustomPlayer(2, random_score, iterative=False, depth_limit=2), False),
+                 (CustomPlayer(2, improved_score, iterative=False, depth_limit=2), True),
+                 (CustomPlayer(score_fn=improved_score, node_limit=100), True)]
+        for player, cacheable in cases:
+            self.assertEqual(tournament.agent_fingerprint(player) is not None, cacheable)
+
+    def test_result_cache_survives_truncated_line(self):
+        """ A last line cut short by a killed run is dropped, and entries
+        stored afterwards are read back """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.jsonl")
+            cache = tournament.ResultCache(path)
+            cache.store("a", 1, "no moves")
+            with open(path, "a") as f:
+                f.write('{"key": "b", "win')
+            cache = tournament.ResultCache(path)
+            self.assertEqual(set(cache.results), {"a"})
+            cache.store("c", 2, "no moves")
+            self.assertEqual(tournament.ResultCache(path).results,
+                             {"a": (1, "no moves"), "c": (2, "no moves")})
+
+    def test_play_round_resumes_from_log(self):
+        """ A resumed round replays no logged match and reports the same
+        result as the original run """
+        agents = [tournament.Agent(RandomPlayer(), "Random"),
+                  tournament.Agent(RandomPlayer(), "Random2")]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "log.jsonl")
+            ratio = tournament.play_round(agents, 2, log=tournament.ResultsLog(path))
+            with open(path) as f:
+                self.assertEqual(len(f.readlines()), 4)
+
+            with mock.patch("tournament.play_match") as play_match:
+                resumed = tournament.play_round(
+                    agents, 2, log=tournament.ResultsLog(path, resume=True))
+            self.assertFalse(play_match.called)
+            self.assertEqual(ratio, resumed)
+
+    def test_resumed_log_drops_partial_line(self):
+        """ Records appended after resuming from a killed run are read back """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "log.jsonl")
+            log = tournament.ResultsLog(path)
+            log.record("a", (1, 1))
+            with open(path, "a") as f:
+                f.write('{"key": "b", "sco')
+            log = tournament.ResultsLog(path, resume=True)
+            self.assertEqual(log.matches, {"a": (1, 1)})
+            log.record("c", (2, 0))
+            self.assertEqual(tournament.ResultsLog(path, resume=True).matches,
+                             {"a": (1, 1), "c": (2, 0)})
+
+
+class DistributedTest(unittest.TestCase):
+
+    def test_distributed_round_matches_local_round(self):
+        """ A round played by a remote worker gives the same result as a
+        local round, even when another worker drops a match """
+        agents = [tournament.Agent(RandomPlayer(), "Random"),
+                  tournament.Agent(RandomPlayer(), "Random2"),
+                  tournament.Agent(RandomPlayer(), "Random3")]
+        local = tournament.play_round(agents, 2)
+
+        coordinator = distributed.Coordinator(("localhost", 0), heartbeat_timeout=5.)
+        address = coordinator.server_address
+        try:
+            # a worker that takes a match and disappears without an answer
+            rogue = socket.create_connection(address)
+            distributed.send_message(rogue, {"type": "ready"})
+            worker = threading.Thread(target=distributed.run_worker,
+                                      args=(address, agents), daemon=True)
+
+            def start_worker_after_rogue():
+                json.loads(rogue.makefile("rb").readline().decode())
+                rogue.close()
+                worker.start()
+
+            threading.Thread(target=start_worker_after_rogue, daemon=True).start()
+            remote = distributed.play_round(coordinator, agents, 2)
+        finally:
+            coordinator.close()
+        worker.join(timeout=5)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(local, remote)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,359 @@
+"""
+Fit heuristic weights against game outcomes instead of tournament rounds.
+
+The pipeline has three steps:
+
+1. `generate_corpus()` plays self-play games and records every position in
+   which both players have moved, together with the final result from the
+   point of view of the player holding initiative.  The corpus is stored as
+   a set of NumPy arrays (`np.savez_compressed`).
+
+2. `extract_features()` computes the mobility features used by
+   `custom_score`, `openmove_div_score` and `improved_score` for the whole
+   corpus at once using vectorized NumPy indexing.
+
+3. `fit_weights()` fits a logistic ("Texel-style") model that maps feature
+   vectors to the probability of winning, and `fit_cutover()` searches the
+   free-board threshold at which `custom_score` should switch evaluators.
+
+The fitted weights can be turned back into a regular score function with
+`make_linear_score()` and plugged into `CustomPlayer`.
+
+Example:
+
+    python tuning.py generate --games 200 --out corpus.npz
+    python tuning.py fit corpus.npz
+"""
+
+import argparse
+import random
+
+import numpy as np
+
+from isolation import Board
+from game_agent import CustomPlayer
+from sample_players import improved_score
+
+DIRECTIONS = np.array([(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                       (1, -2), (1, 2), (2, -1), (2, 1)])
+
+FEATURES = ("bias", "own_moves", "opp_moves", "common_moves",
+            "free", "own_moves_free", "opp_moves_free")
+
+
+def _record_positions(width, height, moves, winner, players):
+    """Replay the moves of a finished game and return the positions seen
+    along the way.
+
+    Returns a list of (blanks, active_loc, inactive_loc, active_won) tuples
+    for every position in which both players have already moved.
+    """
+    game = Board(players[0], players[1], width, height)
+    positions = []
+    for move in moves:
+        if move not in game.get_legal_moves():
+            break
+        active, inactive = game.active_player, game.inactive_player
+        if game.move_count >= 2:
+            blanks = np.array([[cell == Board.BLANK for cell in row]
+                               for row in game.__board_state__], dtype=bool)
+            positions.append((blanks,
+                              game.get_player_location(active),
+                              game.get_player_location(inactive),
+                              active == winner))
+        game.apply_move(move)
+    return positions
+
+
+def generate_corpus(num_games, players=None, random_plies=2, width=7,
+                    height=7, seed=None):
+    """Play self-play games and collect labelled positions.
+
+    Parameters
+    ----------
+    num_games : int
+        Number of games to play.
+
+    players : (object, object) (optional)
+        Two agents used for self-play. Defaults to a pair of fixed-depth
+        alpha-beta agents using `improved_score`.
+
+    random_plies : int (optional)
+        Number of random opening moves applied before the agents take over,
+        so that the corpus covers a variety of positions. Must be even,
+        because `Board.play()` expects player 1 to hold initiative.
+
+    width, height : int (optional)
+        Board dimensions.
+
+    seed : int (optional)
+        Seed for the random opening moves.
+
+    Returns
+    ----------
+    dict
+        Arrays `blanks` (N, height, width) bool, `locs` (N, 2, 2) int with
+        the active and inactive player locations, `results` (N,) float
+        equal to 1 when the player holding initiative won the game, and
+        `games` (N,) int, the index of the game of every position (so that
+        positions of one game can be kept on one side of a validation split).
+    """
+    rng = random.Random(seed)
+    if players is None:
+        players = tuple(CustomPlayer(search_depth=3, score_fn=improved_score,
+                                     iterative=False, method='alphabeta')
+                        for _ in range(2))
+
+    blanks, locs, results, games = [], [], [], []
+    for index in range(num_games):
+        game = Board(players[0], players[1], width, height)
+        opening = []
+        for _ in range(random_plies):
+            move = rng.choice(game.get_legal_moves())
+            game.apply_move(move)
+            opening.append(move)
+
+        winner, history, _ = game.play(time_limit=float("inf"))
+        moves = opening + [m for turn in history for m in turn]
+        for b, active_loc, inactive_loc, won in _record_positions(
+                width, height, moves, winner, players):
+            blanks.append(b)
+            locs.append((active_loc, inactive_loc))
+            results.append(1. if won else 0.)
+            games.append(index)
+
+    return {"blanks": np.array(blanks, dtype=bool).reshape(-1, height, width),
+            "locs": np.array(locs, dtype=np.int8).reshape(-1, 2, 2),
+            "results": np.array(results, dtype=float),
+            "games": np.array(games, dtype=np.int32)}
+
+
+def save_corpus(path, corpus):
+    """Store a corpus produced by `generate_corpus()` on disk."""
+    np.savez_compressed(path, **corpus)
+
+
+def load_corpus(path):
+    """Load a corpus previously stored with `save_corpus()`. Game indices
+    are rebuilt for corpora stored without them."""
+    with np.load(path) as data:
+        corpus = {key: data[key] for key in ("blanks", "locs", "results")}
+        corpus["games"] = data["games"] if "games" in data else game_indices(corpus["blanks"])
+    return corpus
+
+
+def game_indices(blanks):
+    """Return the game index of every position of a corpus, from the order
+    in which `generate_corpus()` records them: the number of blank cells
+    decreases within a game, so a position with at least as many blank
+    cells as the previous one starts a new game."""
+    counts = blanks.reshape(len(blanks), -1).sum(axis=1)
+    return np.cumsum(np.concatenate([[0], counts[1:] >= counts[:-1]]))
+
+
+def _targets(blanks, locs):
+    """Return (N, 8) flat cell indices of knight targets from `locs` and a
+    mask of the targets that are on the board and still blank.
+    """
+    n, height, width = blanks.shape
+    rows = locs[:, 0, None] + DIRECTIONS[:, 0]
+    cols = locs[:, 1, None] + DIRECTIONS[:, 1]
+    on_board = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    rows, cols = np.clip(rows, 0, height - 1), np.clip(cols, 0, width - 1)
+    legal = on_board & blanks[np.arange(n)[:, None], rows, cols]
+    return rows * width + cols, legal
+
+
+def extract_features(blanks, locs):
+    """Compute the feature matrix for a batch of positions.
+
+    Parameters
+    ----------
+    blanks : numpy.ndarray
+        (N, height, width) boolean array of blank cells.
+
+    locs : numpy.ndarray
+        (N, 2, 2) integer array with the locations of the active and the
+        inactive player.
+
+    Returns
+    ----------
+    numpy.ndarray
+        (N, len(FEATURES)) float array; columns follow `FEATURES`.
+    """
+    n, height, width = blanks.shape
+    locs = locs.astype(np.intp)
+    own_cells, own_legal = _targets(blanks, locs[:, 0])
+    opp_cells, opp_legal = _targets(blanks, locs[:, 1])
+
+    own = own_legal.sum(axis=1)
+    opp = opp_legal.sum(axis=1)
+    shared = ((own_cells[:, :, None] == opp_cells[:, None, :])
+              & own_legal[:, :, None] & opp_legal[:, None, :])
+    common = shared.any(axis=2).sum(axis=1)
+    free = blanks.reshape(n, -1).sum(axis=1) / (width * height)
+
+    return np.column_stack([np.ones(n), own, opp, common,
+                            free, own * free, opp * free]).astype(float)
+
+
+def _log_loss(features, results, weights):
+    """Mean negative log-likelihood of `results` under a logistic model."""
+    z = features @ weights
+    return float(np.mean(np.logaddexp(0., z) - results * z))
+
+
+def fit_weights(features, results, l2=1e-3, max_iter=50, tol=1e-8):
+    """Fit logistic regression weights with Newton's method.
+
+    Parameters
+    ----------
+    features : numpy.ndarray
+        (N, K) feature matrix, e.g. from `extract_features()`.
+
+    results : numpy.ndarray
+        (N,) array of game outcomes (1 for a win, 0 for a loss).
+
+    l2 : float (optional)
+        L2 regularization strength; keeps the fit stable when a feature is
+        (nearly) constant in the corpus.
+
+    max_iter : int (optional)
+        Maximum number of Newton iterations.
+
+    tol : float (optional)
+        Stop when the largest weight update is smaller than this value.
+
+    Returns
+    ----------
+    numpy.ndarray
+        (K,) weight vector.
+    """
+    n, k = features.shape
+    weights = np.zeros(k)
+    penalty = l2 * n * np.eye(k)
+    for _ in range(max_iter):
+        p = 1. / (1. + np.exp(-(features @ weights)))
+        gradient = features.T @ (p - results) + penalty @ weights
+        hessian = (features * (p * (1. - p))[:, None]).T @ features + penalty
+        step = np.linalg.solve(hessian, gradient)
+        weights -= step
+        if np.max(np.abs(step)) < tol:
+            break
+    return weights
+
+
+def fit_cutover(features, results, thresholds=np.arange(0.3, 0.85, 0.05),
+                **kwargs):
+    """Find the free-board fraction at which to switch evaluators.
+
+    A separate model is fitted for positions above and below every
+    candidate threshold; the threshold with the lowest combined log-loss is
+    returned.
+
+    Returns
+    ----------
+    (float, numpy.ndarray, numpy.ndarray, float)
+        The threshold, the weights used at or above it, the weights used
+        below it, and the combined log-loss.
+    """
+    free = features[:, FEATURES.index("free")]
+    best = None
+    for threshold in thresholds:
+        upper, lower = free >= threshold, free < threshold
+        if upper.sum() < len(FEATURES) or lower.sum() < len(FEATURES):
+            continue
+        w_upper = fit_weights(features[upper], results[upper], **kwargs)
+        w_lower = fit_weights(features[lower], results[lower], **kwargs)
+        loss = (_log_loss(features[upper], results[upper], w_upper) * upper.sum() +
+                _log_loss(features[lower], results[lower], w_lower) * lower.sum()
+                ) / len(results)
+        if best is None or loss < best[3]:
+            best = (float(threshold), w_upper, w_lower, loss)
+    return best
+
+
+def make_linear_score(weights, cutover=None, lower_weights=None):
+    """Build a `(game, player)` score function from fitted weights.
+
+    Parameters
+    ----------
+    weights : sequence of float
+        Weights in `FEATURES` order; used for all positions, or only for
+        positions at or above `cutover` when it is given.
+
+    cutover : float (optional)
+        Free-board fraction below which `lower_weights` are used instead.
+
+    lower_weights : sequence of float (optional)
+        Weights for positions below `cutover`.
+
+    Returns
+    ----------
+    callable
+        A heuristic function with the standard `(game, player)` signature.
+        Values are the fitted logit of winning for `player`.
+    """
+    weights = [float(w) for w in weights]
+    lower_weights = weights if lower_weights is None else [float(w) for w in lower_weights]
+
+    def linear_score(game, player):
+        if game.utility(player) != 0:
+            return game.utility(player)
+        # features describe the player holding initiative, as in the corpus
+        own_moves = game.get_legal_moves(game.active_player)
+        opp_moves = game.get_legal_moves(game.inactive_player)
+        own, opp = len(own_moves), len(opp_moves)
+        common = len([m for m in own_moves if m in opp_moves])
+        free = game.blank_count() / (game.width * game.height)
+        row = (1., own, opp, common, free, own * free, opp * free)
+        w = weights if cutover is None or free >= cutover else lower_weights
+        value = sum(wi * xi for wi, xi in zip(w, row))
+        return float(value if player == game.active_player else -value)
+
+    return linear_score
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command")
+
+    generate = commands.add_parser("generate", help="record a position corpus")
+    generate.add_argument("--games", type=int, default=100)
+    generate.add_argument("--random-plies", type=int, default=2)
+    generate.add_argument("--seed", type=int, default=None)
+    generate.add_argument("--out", default="corpus.npz")
+
+    fit = commands.add_parser("fit", help="fit weights to a stored corpus")
+    fit.add_argument("corpus")
+    fit.add_argument("--l2", type=float, default=1e-3)
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        corpus = generate_corpus(args.games, random_plies=args.random_plies,
+                                 seed=args.seed)
+        save_corpus(args.out, corpus)
+        print("Stored {} positions in {}".format(len(corpus["results"]), args.out))
+    elif args.command == "fit":
+        corpus = load_corpus(args.corpus)
+        features = extract_features(corpus["blanks"], corpus["locs"])
+        results = corpus["results"]
+
+        weights = fit_weights(features, results, l2=args.l2)
+        print("Single model (log-loss {:.4f}):".format(
+            _log_loss(features, results, weights)))
+        for name, w in zip(FEATURES, weights):
+            print("  {:<16}{:>10.4f}".format(name, w))
+
+        cutover = fit_cutover(features, results, l2=args.l2)
+        if cutover is not None:
+            threshold, w_upper, w_lower, loss = cutover
+            print("\nBest cutover at {:.2f} free (log-loss {:.4f}):".format(threshold, loss))
+            for name, wu, wl in zip(FEATURES, w_upper, w_lower):
+                print("  {:<16}{:>10.4f}{:>10.4f}".format(name, wu, wl))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
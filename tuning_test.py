@@ -0,0 +1,79 @@
+"""
+Test cases for the weight fitting pipeline.
+"""
+import random
+import unittest
+
+import numpy as np
+
+import tuning
+
+from isolation import Board
+
+
+class TuningTest(unittest.TestCase):
+
+    def test_extract_features_match_boards(self):
+        """ Vectorized features equal the counts of the boards they come
+        from """
+        rng = random.Random(0)
+        boards = []
+        while len(boards) < 30:
+            game = Board("p1", "p2")
+            for _ in range(rng.randint(2, 40)):
+                if not game.get_legal_moves():
+                    break
+                game.apply_move(rng.choice(game.get_legal_moves()))
+            if game.get_legal_moves():
+                boards.append(game)
+        blanks = np.array([[[cell == Board.BLANK for cell in row] for row in game.__board_state__]
+                           for game in boards], dtype=bool)
+        locs = np.array([[game.get_player_location(game.active_player),
+                          game.get_player_location(game.inactive_player)] for game in boards])
+        features = tuning.extract_features(blanks, locs)
+        for game, row in zip(boards, features):
+            own = game.get_legal_moves(game.active_player)
+            opp = game.get_legal_moves(game.inactive_player)
+            free = game.blank_count() / 49.
+            expected = (1., len(own), len(opp), len([m for m in own if m in opp]),
+                        free, len(own) * free, len(opp) * free)
+            np.testing.assert_allclose(row, expected)
+
+    def test_game_indices_match_generated_games(self):
+        """ Game indices rebuilt from the position order equal the stored
+        ones """
+        corpus = tuning.generate_corpus(4, width=5, height=5, seed=0)
+        self.assertEqual(corpus["games"].max(), 3)
+        np.testing.assert_array_equal(tuning.game_indices(corpus["blanks"]), corpus["games"])
+
+    def test_fit_weights_recovers_weights(self):
+        """ Logistic regression recovers the weights that generated the
+        outcomes """
+        rng = np.random.default_rng(0)
+        features = np.column_stack([np.ones(20000), rng.normal(size=(20000, 2))])
+        true_weights = np.array([0.5, 1.5, -1.])
+        p = 1. / (1. + np.exp(-(features @ true_weights)))
+        results = (rng.random(20000) < p).astype(float)
+        weights = tuning.fit_weights(features, results, l2=0.)
+        np.testing.assert_allclose(weights, true_weights, atol=0.1)
+
+    def test_linear_score_is_zero_sum(self):
+        """ Scores of both players are opposite, with or without a cutover """
+        rng = random.Random(1)
+        scores = [tuning.make_linear_score((0, 1, -1, 0, 0, 0, 0)),
+                  tuning.make_linear_score((0.3, 0.5, -0.7, 0.2, 1., 0.1, -0.2), cutover=0.5,
+                                           lower_weights=(-0.1, 1., -1., 0.5, 0., 0.3, 0.))]
+        game = Board("p1", "p2")
+        game.apply_move((3, 3))
+        game.apply_move((0, 0))
+        for _ in range(30):
+            for score in scores:
+                self.assertEqual(score(game, "p1"), -score(game, "p2"))
+            if not game.get_legal_moves():
+                break
+            game.apply_move(rng.choice(game.get_legal_moves()))
+        self.assertEqual(scores[0](game, "p1"), -scores[0](game, "p2"))
+
+
+if __name__ == '__main__':
+    unittest.main()